@@ -28,6 +28,64 @@ class Settings(BaseSettings):
     api_port: int = 8000
     debug: bool = False
 
+    # Embedding Model
+    embedding_backend: str = "vertex"  # "vertex" or "local" (offline feature hashing, no GCP access)
+    embedding_dimension: int = 768  # Vector size of the local backend (match the vector index)
+    embedding_max_tokens: int = 2048  # Input limit of text-embedding-004
+    embedding_max_concurrency: int = 8  # Embedding model requests in flight per worker
+    embedding_timeout_seconds: float = 30.0  # Deadline of each embedding request
+    embedding_batch_concurrency: int = 4  # Requests of one embed_batch call in flight at once
+    embedding_retries: int = 3  # Retries of a failed embedding request (exponential backoff)
+    embedding_coalesce_window_ms: float = 5.0  # Wait for concurrent embed() calls to batch (0 disables)
+    embedding_coalesce_max_batch: int = 32  # Texts per coalesced request
+    embedding_cache_max_entries: int = 10_000  # Query embeddings cached in memory (0 disables)
+    embedding_cache_ttl_seconds: float = 7 * 24 * 3600.0
+    embedding_cache_path: str | None = None  # SQLite file to persist the cache across restarts
+
+    # Compliance Audit
+    audit_content_max_tokens: int = 32000  # Content included in the audit prompt
+    audit_reference_limit: int = 10  # Provisions cited by the context pulled in (0 disables)
+    audit_reference_max_chunks: int = 20  # Chunks of referenced provisions added to the context
+
+    # Ingestion Pipeline
+    ingest_embed_batch_size: int = 100
+    ingest_embed_batch_max_tokens: int = 18_000  # Under the ~20k tokens per text-embedding-004 request
+    ingest_embed_concurrency: int = 4
+    ingest_bulk_writes: bool = True
+    ingest_spool_dir: str | None = None
+    ingest_dedupe: bool = True
+    ingest_job_progress_interval_seconds: float = 2.0
+    ingest_bulk_max_file_bytes: int = 200 * 1024 * 1024  # Per file in a ZIP upload
+
+    # Near-Duplicate Detection (MinHash/LSH over word shingles)
+    near_dedupe_action: str = "off"  # "off", "flag" (store and mark) or "skip" (link to the existing chunk)
+    near_dedupe_threshold: float = 0.9  # Minimum estimated Jaccard similarity
+    near_dedupe_bands: int = 16  # With 8 rows: ~95% recall at 0.8 similarity, ~6% candidates at 0.5
+    near_dedupe_rows: int = 8
+    near_dedupe_shingle_size: int = 3
+    near_dedupe_min_shingles: int = 8
+
+    # URL Ingestion (shared HTTP client)
+    url_fetch_timeout_seconds: float = 30.0
+    url_fetch_max_connections: int = 20
+    url_fetch_max_bytes: int = 100 * 1024 * 1024
+    url_fetch_user_agent: str = "nprocess-ingest/0.1"
+    url_fetch_allow_private: bool = False  # Allow private/loopback hosts (local testing)
+
+    # PDF Extraction (process pool)
+    pdf_extract_workers: int = 0  # 0 = one per CPU
+    pdf_pages_per_task: int = 16
+    pdf_extract_timeout_seconds: float = 300.0
+
+    # Firestore Bulk Writes
+    firestore_batch_size: int = 500
+    firestore_write_concurrency: int = 8
+    firestore_write_retries: int = 3
+
+    # Observability
+    metrics_enabled: bool = False  # Serve Prometheus metrics at /metrics
+    metrics_token: str = ""  # If set, /metrics requires "Authorization: Bearer <token>"
+
     # CORS Configuration
     cors_origins: str = "http://localhost:3000,https://nprocess-web-1040576944774.us-central1.run.app"
 
@@ -0,0 +1,172 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms are kept in memory per process and rendered by
+the `/metrics` endpoint in the Prometheus text format, so they can be
+scraped without an extra dependency. `log_event` emits the same data as
+structured (JSON) log lines for log-based analysis.
+"""
+
+import json
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Iterable
+
+_registry: list["_Metric"] = []
+_registry_lock = threading.Lock()
+
+# Default buckets for durations in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Buckets for sizes (bytes, chunks, tokens)
+SIZE_BUCKETS = tuple(float(4 ** i) for i in range(1, 15))
+
+
+class _Metric(ABC):
+    """Base class for labelled metrics."""
+
+    kind = ""
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        """Get the label values of a sample, in label name order."""
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _format_labels(self, key: tuple[str, ...], extra: dict[str, str] | None = None) -> str:
+        """Format label values as a Prometheus label set."""
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def render(self) -> list[str]:
+        """Render the metric in the Prometheus text format."""
+
+
+class Counter(_Metric):
+    """A monotonically increasing count, per label set."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increase the counter of a label set."""
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """Get the current value of a label set."""
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, per label set."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DURATION_BUCKETS,
+    ):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Label values -> [non-cumulative bucket counts, [count, sum]]
+        self._values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Record an observation for a label set."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.setdefault(key, [[0] * len(self.buckets), [0, 0.0]])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            total[0] += 1
+            total[1] += value
+
+    def count(self, **labels) -> int:
+        """Get the number of observations of a label set."""
+        values = self._values.get(self._key(labels))
+        return values[1][0] if values else 0
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, ([*counts], [*total])) for key, (counts, total) in self._values.items())
+
+        lines = []
+        for key, (counts, (count, total)) in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self._format_labels(key, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_bucket{self._format_labels(key, {'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+
+def render_prometheus() -> str:
+    """Render all registered metrics in the Prometheus text format."""
+    with _registry_lock:
+        metrics = list(_registry)
+
+    lines = []
+    for metric in metrics:
+        lines.append(f"# HELP {metric.name} {metric.description}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def log_event(logger: logging.Logger, event: str, **fields) -> None:
+    """
+    Log a structured event as a single JSON line.
+
+    Args:
+        logger: Logger to write to
+        event: Event name (e.g. "ingest.completed")
+        **fields: Event fields (must be JSON-serializable or str()-able)
+    """
+    logger.info(json.dumps({"event": event, **fields}, default=str, ensure_ascii=False))
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value (integers without a decimal point)."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -18,6 +18,9 @@ from app.routers.process import router as process_router
 from app.routers.compliance import router as compliance_router
 from app.routers.documents import router as documents_router
 from app.routers.mcp import router as mcp_router
+from app.services.ai.embedding import shutdown_embedding_executor
+from app.services.ingestion.extraction import shutdown_pdf_executor
+from app.services.ingestion.fetch import close_http_client
 
 # Configure logging
 logging.basicConfig(
@@ -35,6 +38,9 @@ async def lifespan(app: FastAPI):
     logger.info(f"Debug mode: {settings.debug}")
     yield
     logger.info("n.process Backend shutting down...")
+    shutdown_pdf_executor()
+    shutdown_embedding_executor()
+    await close_http_client()
 
 
 # Create FastAPI application with security scheme for Swagger UI
@@ -75,9 +75,15 @@ async def audit_compliance(
             summary=result.get("summary", ""),
             frameworks=result.get("frameworks", []),
             context_chunks_used=result.get("context_chunks_used", 0),
+            referenced_chunks_used=result.get("referenced_chunks_used", 0),
             created_at=result["created_at"],
         )
         
+    except TimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e),
+        )
     except Exception as e:
         logger.error(f"Compliance audit failed: {e}")
         raise HTTPException(
@@ -1,6 +1,13 @@
-"""Health check endpoint."""
+"""Health check and metrics endpoints."""
 
-from fastapi import APIRouter
+import secrets
+from typing import Annotated
+
+from fastapi import APIRouter, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.metrics import render_prometheus
 
 router = APIRouter(tags=["Health"])
 
@@ -20,6 +27,29 @@ async def health_check() -> dict:
     }
 
 
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(
+    authorization: Annotated[str | None, Header()] = None,
+) -> PlainTextResponse:
+    """
+    Metrics endpoint for Prometheus scraping.
+    
+    Disabled unless `metrics_enabled` is set. When `metrics_token` is set,
+    scrapers must send it as a bearer token.
+    
+    Returns:
+        Process metrics (e.g. ingestion stage histograms) in the
+        Prometheus text exposition format.
+    """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics are disabled")
+    if settings.metrics_token and not secrets.compare_digest(
+        authorization or "", f"Bearer {settings.metrics_token}"
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/")
 async def root() -> dict:
     """Root endpoint with service information."""
@@ -2,36 +2,62 @@
 Knowledge API endpoints.
 
 Provides REST API for knowledge base operations:
-- Ingest documents
+- Ingest documents (synchronously or as background jobs)
 - Semantic search
-- List and delete documents
+- List, update and delete documents
 """
 
+import asyncio
+import json
 import logging
-from typing import Annotated
+import os
+import uuid
+import zipfile
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status, File, Form, UploadFile
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, File, Form, UploadFile
+from fastapi.responses import StreamingResponse
+from firebase_admin import firestore
 
+from app.core.config import settings
 from app.core.deps import get_current_user
 from app.schemas.auth import CurrentUser
 from app.schemas.knowledge import (
     IngestRequest,
     IngestResponse,
+    IngestJob,
+    IngestJobProgress,
+    IngestUrlRequest,
     SearchRequest,
     SearchResponse,
     SearchResult,
     ListDocumentsResponse,
     DocumentSummary,
     DeleteDocumentResponse,
+    UpdateDocumentRequest,
+    UpdateDocumentResponse,
 )
 from app.services.ai.embedding import get_embedding_service
 from app.services.knowledge.service import get_knowledge_service
+from app.services.ingestion.bulk import iter_ndjson_items, iter_zip_items
+from app.services.ingestion.extraction import BLOCK_SIZE, SpooledFile, spool_to_disk
+from app.services.ingestion.pipeline import IngestProgress
 from app.services.ingestion.service import IngestionService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/v1/knowledge", tags=["Knowledge Store"])
 
+JOB_COLLECTION = "jobs"
+INGEST_JOB_TYPES = ("knowledge_ingest", "knowledge_ingest_file")
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+# Running ingestion jobs (keeps a reference so tasks are not garbage collected)
+_ingest_tasks: set[asyncio.Task] = set()
+
 
 def get_ingestion_service() -> IngestionService:
     """Get configured ingestion service."""
@@ -41,6 +67,146 @@ def get_ingestion_service() -> IngestionService:
     )
 
 
+def get_db():
+    """Get Firestore client."""
+    return firestore.client()
+
+
+async def _iter_upload(file: UploadFile):
+    """Read an upload in fixed-size blocks."""
+    while block := await file.read(BLOCK_SIZE):
+        yield block
+
+
+async def _iter_file(path: str):
+    """Read a local file in fixed-size blocks without blocking the event loop."""
+    with open(path, "rb") as f:
+        while block := await asyncio.to_thread(f.read, BLOCK_SIZE):
+            yield block
+
+
+def _check_ingest_access(doc_type: str, current_user: CurrentUser) -> None:
+    """Check that the user may ingest documents of this type."""
+    if doc_type == "marketplace" and not current_user.is_super_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super_admin can create marketplace documents",
+        )
+    
+    if doc_type == "private" and not current_user.org_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must belong to an organization to create private documents",
+        )
+
+
+def _parse_metadata(metadata: str | None) -> dict:
+    """Parse the JSON metadata form field of a file upload."""
+    if not metadata:
+        return {}
+    try:
+        return json.loads(metadata)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid metadata JSON",
+        )
+
+
+async def _report_progress(job_ref, progress: IngestProgress) -> None:
+    """Periodically write the progress counters of a running job."""
+    last = None
+    while True:
+        await asyncio.sleep(settings.ingest_job_progress_interval_seconds)
+        current = progress.as_dict()
+        if current != last:
+            await asyncio.to_thread(
+                job_ref.update, {"progress": current, "updated_at": datetime.utcnow()}
+            )
+            last = current
+
+
+async def _run_ingest_job(
+    job_id: str,
+    ingest: Callable[[IngestProgress], Awaitable[dict]],
+) -> None:
+    """Run an ingestion job and update its status and progress."""
+    job_ref = get_db().collection(JOB_COLLECTION).document(job_id)
+    progress = IngestProgress()
+    
+    await asyncio.to_thread(
+        job_ref.update, {"status": "processing", "updated_at": datetime.utcnow()}
+    )
+    reporter = asyncio.create_task(_report_progress(job_ref, progress))
+    
+    try:
+        result = await ingest(progress)
+        update = {
+            "status": "completed",
+            "result": IngestResponse(**result).model_dump(),
+        }
+    except asyncio.CancelledError:
+        # E.g. the server shutting down: don't leave the job "processing"
+        logger.warning(f"Ingest job {job_id} cancelled")
+        reporter.cancel()
+        await asyncio.to_thread(job_ref.update, {
+            "status": "failed",
+            "error": "Job cancelled before completion",
+            "progress": progress.as_dict(),
+            "updated_at": datetime.utcnow(),
+        })
+        raise
+    except Exception as exc:
+        logger.error(f"Ingest job {job_id} failed: {exc}")
+        update = {"status": "failed", "error": str(exc)}
+    finally:
+        reporter.cancel()
+    
+    update.update({"progress": progress.as_dict(), "updated_at": datetime.utcnow()})
+    await asyncio.to_thread(job_ref.update, update)
+
+
+async def _start_ingest_job(
+    job_type: str,
+    tenant_id: str | None,
+    request: dict,
+    ingest: Callable[[IngestProgress], Awaitable[dict]],
+) -> IngestJob:
+    """
+    Record a pending ingestion job and run it in the background.
+    
+    Jobs run in this process rather than through Cloud Tasks: the payload
+    (request text or spooled upload) only exists on this instance and can
+    be larger than a Firestore document.
+    """
+    job_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+    job_data = {
+        "job_id": job_id,
+        "type": job_type,
+        "status": "pending",
+        "tenant_id": tenant_id,
+        "request": request,
+        "progress": IngestProgress().as_dict(),
+        "created_at": now,
+        "updated_at": now,
+    }
+    
+    db = get_db()
+    await asyncio.to_thread(db.collection(JOB_COLLECTION).document(job_id).set, job_data)
+    
+    task = asyncio.create_task(_run_ingest_job(job_id, ingest))
+    _ingest_tasks.add(task)
+    task.add_done_callback(_ingest_tasks.discard)
+    
+    return IngestJob(
+        job_id=job_id,
+        status="pending",
+        created_at=now,
+        updated_at=now,
+    )
+
+
 @router.post("/ingest", response_model=IngestResponse)
 async def ingest_document(
     request: IngestRequest,
@@ -105,10 +271,10 @@ async def ingest_document_file(
     
     Accepts multipart/form-data.
     Metadata should be a JSON string.
-    """
-    import json
-    from fastapi import File, Form, UploadFile
     
+    The upload is spooled to disk and ingested in streaming mode, so
+    memory usage does not depend on the file size.
+    """
     # Check permissions
     if doc_type == "marketplace" and not current_user.is_super_admin:
         raise HTTPException(
@@ -124,28 +290,27 @@ async def ingest_document_file(
     
     tenant_id = current_user.org_id or "system"
     
-    # Parse metadata
-    parsed_metadata = {}
-    if metadata:
-        try:
-            parsed_metadata = json.loads(metadata)
-        except json.JSONDecodeError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid metadata JSON",
-            )
+    parsed_metadata = _parse_metadata(metadata)
             
     ingestion_service = get_ingestion_service()
     
+    filename = file.filename or "unknown"
+    spooled = None
+    
     try:
-        content = await file.read()
-        result = await ingestion_service.ingest_file(
-            file_content=content,
-            filename=file.filename or "unknown",
+        spooled = await spool_to_disk(
+            _iter_upload(file),
+            suffix=os.path.splitext(filename)[1],
+            spool_dir=settings.ingest_spool_dir,
+        )
+        result = await ingestion_service.ingest_file_path(
+            path=spooled.path,
+            filename=filename,
             tenant_id=tenant_id,
             strategy=strategy,
             doc_type=doc_type,
             metadata=parsed_metadata,
+            file_hash=spooled.sha256,
         )
         
         return IngestResponse(**result)
@@ -155,12 +320,272 @@ async def ingest_document_file(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
+    except TimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e),
+        )
     except Exception as e:
         logger.error(f"File ingestion failed: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to ingest file: {str(e)}",
         )
+    finally:
+        if spooled:
+            spooled.remove()
+
+
+@router.post("/ingest/url", response_model=IngestResponse)
+async def ingest_document_url(
+    request: IngestUrlRequest,
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+) -> IngestResponse:
+    """
+    Ingest a document published at a URL (PDF, HTML or text).
+    
+    Fetching is conditional: calling this again for the same URL skips
+    the source entirely if it did not change (`unchanged` is true), and
+    updates the existing document in place if it did. Use it to re-sync
+    regulations published on government portals on a schedule.
+    """
+    _check_ingest_access(request.doc_type, current_user)
+    
+    ingestion_service = get_ingestion_service()
+    
+    try:
+        result = await ingestion_service.ingest_url(
+            url=request.url,
+            tenant_id=current_user.org_id or "system",
+            strategy=request.strategy,
+            doc_type=request.doc_type,
+            metadata=request.metadata,
+        )
+        
+        return IngestResponse(**result)
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    except (TimeoutError, httpx.TimeoutException) as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e) or "Timed out fetching URL",
+        )
+    except httpx.HTTPError as e:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail=f"Failed to fetch URL: {str(e)}",
+        )
+    except Exception as e:
+        logger.error(f"URL ingestion failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to ingest URL: {str(e)}",
+        )
+
+
+@router.post("/ingest/async", response_model=IngestJob)
+async def ingest_document_async(
+    request: IngestRequest,
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+) -> IngestJob:
+    """
+    Queue a document for ingestion and return a job ID right away.
+    
+    Poll `GET /v1/knowledge/jobs/{job_id}` for progress and the result.
+    """
+    _check_ingest_access(request.doc_type, current_user)
+    
+    tenant_id = current_user.org_id or "system"
+    ingestion_service = get_ingestion_service()
+    
+    async def ingest(progress: IngestProgress) -> dict:
+        return await ingestion_service.ingest_text(
+            content=request.content,
+            tenant_id=tenant_id,
+            strategy=request.strategy,
+            doc_type=request.doc_type,
+            metadata=request.metadata,
+            progress=progress,
+        )
+    
+    return await _start_ingest_job(
+        job_type="knowledge_ingest",
+        tenant_id=current_user.org_id,
+        request={
+            "strategy": request.strategy,
+            "doc_type": request.doc_type,
+            "metadata": request.metadata,
+            "content_length": len(request.content),
+        },
+        ingest=ingest,
+    )
+
+
+@router.post("/ingest/file/async", response_model=IngestJob)
+async def ingest_document_file_async(
+    file: Annotated[UploadFile, File()],
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    doc_type: Annotated[str, Form()] = "private",
+    strategy: Annotated[str, Form()] = "default",
+    metadata: Annotated[str | None, Form()] = None,
+) -> IngestJob:
+    """
+    Queue a file (PDF/Text) for ingestion and return a job ID right away.
+    
+    The upload is spooled to disk before the job is created; extraction,
+    chunking, embedding and storage run in the background. Poll
+    `GET /v1/knowledge/jobs/{job_id}` for progress and the result.
+    """
+    _check_ingest_access(doc_type, current_user)
+    parsed_metadata = _parse_metadata(metadata)
+    
+    tenant_id = current_user.org_id or "system"
+    ingestion_service = get_ingestion_service()
+    filename = file.filename or "unknown"
+    
+    spooled: SpooledFile = await spool_to_disk(
+        _iter_upload(file),
+        suffix=os.path.splitext(filename)[1],
+        spool_dir=settings.ingest_spool_dir,
+    )
+    
+    async def ingest(progress: IngestProgress) -> dict:
+        try:
+            return await ingestion_service.ingest_file_path(
+                path=spooled.path,
+                filename=filename,
+                tenant_id=tenant_id,
+                strategy=strategy,
+                doc_type=doc_type,
+                metadata=parsed_metadata,
+                file_hash=spooled.sha256,
+                progress=progress,
+            )
+        finally:
+            spooled.remove()
+    
+    try:
+        return await _start_ingest_job(
+            job_type="knowledge_ingest_file",
+            tenant_id=current_user.org_id,
+            request={
+                "strategy": strategy,
+                "doc_type": doc_type,
+                "metadata": parsed_metadata,
+                "filename": filename,
+                "size": spooled.size,
+            },
+            ingest=ingest,
+        )
+    except BaseException:
+        spooled.remove()
+        raise
+
+
+@router.get("/jobs/{job_id}", response_model=IngestJob)
+async def get_ingest_job(
+    job_id: str,
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+) -> IngestJob:
+    """Check status and progress of an async ingestion job."""
+    db = get_db()
+    job_doc = await asyncio.to_thread(db.collection(JOB_COLLECTION).document(job_id).get)
+    
+    if not job_doc.exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    
+    job_data = job_doc.to_dict()
+    if job_data.get("type") not in INGEST_JOB_TYPES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    if job_data.get("tenant_id") != current_user.org_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+    
+    result = job_data.get("result")
+    
+    return IngestJob(
+        job_id=job_data.get("job_id", job_id),
+        status=job_data.get("status", "pending"),
+        progress=IngestJobProgress(**job_data.get("progress", {})),
+        result=IngestResponse(**result) if result else None,
+        error=job_data.get("error"),
+        created_at=job_data.get("created_at"),
+        updated_at=job_data.get("updated_at"),
+    )
+
+
+@router.post("/ingest/bulk")
+async def ingest_bulk(
+    request: Request,
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+    doc_type: Literal["private", "marketplace"] = "private",
+    strategy: Literal["default", "legal"] = "default",
+    metadata: str | None = None,
+) -> StreamingResponse:
+    """
+    Ingest many documents in one upload.
+    
+    The request body is either:
+    - **NDJSON** (`application/x-ndjson`): one `{"content", "metadata",
+      "strategy", "name"}` record per line
+    - **ZIP** (`application/zip`): PDF/text files, all chunked with `strategy`
+    
+    All documents go through one shared pipeline, so embeddings are batched
+    and writes are grouped across documents. The response is an NDJSON
+    stream with one result per document (`status` is `completed` or
+    `failed`), followed by a `summary` line.
+    
+    `metadata` is an optional JSON object applied to every document.
+    """
+    _check_ingest_access(doc_type, current_user)
+    parsed_metadata = _parse_metadata(metadata)
+    
+    tenant_id = current_user.org_id or "system"
+    ingestion_service = get_ingestion_service()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    
+    # The body is spooled before responding: the response streams while the
+    # documents are processed, and the request body cannot be read then
+    is_zip = content_type in ZIP_CONTENT_TYPES
+    spooled = await spool_to_disk(
+        request.stream(),
+        suffix=".zip" if is_zip else ".ndjson",
+        spool_dir=settings.ingest_spool_dir,
+    )
+    if is_zip and not zipfile.is_zipfile(spooled.path):
+        spooled.remove()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid ZIP file",
+        )
+    
+    if is_zip:
+        items = iter_zip_items(
+            spooled.path,
+            strategy=strategy,
+            metadata=parsed_metadata,
+            spool_dir=settings.ingest_spool_dir,
+            max_file_bytes=settings.ingest_bulk_max_file_bytes,
+        )
+    else:
+        items = iter_ndjson_items(
+            _iter_file(spooled.path), strategy=strategy, metadata=parsed_metadata
+        )
+    
+    async def results():
+        try:
+            async for result in ingestion_service.ingest_bulk(items, tenant_id, doc_type):
+                yield json.dumps(result, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"Bulk ingestion failed: {e}")
+            yield json.dumps({"error": f"Bulk ingestion failed: {str(e)}"}) + "\n"
+        finally:
+            spooled.remove()
+    
+    return StreamingResponse(results(), media_type="application/x-ndjson")
 
 
 @router.post("/search", response_model=SearchResponse)
@@ -204,6 +629,11 @@ async def search_knowledge(
             count=len(results),
         )
         
+    except TimeoutError as e:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail=str(e),
+        )
     except Exception as e:
         logger.error(f"Search failed: {e}")
         raise HTTPException(
@@ -216,12 +646,14 @@ async def search_knowledge(
 async def list_documents(
     current_user: Annotated[CurrentUser, Depends(get_current_user)],
     doc_type: str = "private",
-    limit: int = 100,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+    cursor: str | None = None,
 ) -> ListDocumentsResponse:
     """
     List documents in the knowledge base.
     
-    Returns summaries of documents owned by the user's organization.
+    Returns summaries of documents owned by the user's organization,
+    newest first. Pass `next_cursor` back as `cursor` to get the next page.
     """
     if not current_user.org_id:
         raise HTTPException(
@@ -232,17 +664,31 @@ async def list_documents(
     knowledge_service = get_knowledge_service()
     
     try:
-        docs = await knowledge_service.get_documents(
-            tenant_id=current_user.org_id,
-            doc_type=doc_type,
-            limit=limit,
+        (docs, next_cursor), total = await asyncio.gather(
+            knowledge_service.get_documents(
+                tenant_id=current_user.org_id,
+                doc_type=doc_type,
+                limit=limit,
+                cursor=cursor,
+            ),
+            knowledge_service.count_documents(
+                tenant_id=current_user.org_id,
+                doc_type=doc_type,
+            ),
         )
         
         return ListDocumentsResponse(
             documents=[DocumentSummary(**d) for d in docs],
             count=len(docs),
+            total=total,
+            next_cursor=next_cursor,
         )
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
     except Exception as e:
         logger.error(f"List documents failed: {e}")
         raise HTTPException(
@@ -251,6 +697,58 @@ async def list_documents(
         )
 
 
+@router.put("/documents/{doc_id}", response_model=UpdateDocumentResponse)
+async def update_document(
+    doc_id: str,
+    request: UpdateDocumentRequest,
+    current_user: Annotated[CurrentUser, Depends(get_current_user)],
+) -> UpdateDocumentResponse:
+    """
+    Update a document in place with a new version of its text.
+    
+    Only chunks whose content changed are re-embedded and written; chunks
+    that disappeared are tombstoned. Use this for amendments to large
+    regulations instead of deleting and re-ingesting.
+    """
+    if request.doc_type == "marketplace" and not current_user.is_super_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only super_admin can update marketplace documents",
+        )
+    
+    if request.doc_type == "private" and not current_user.org_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User must belong to an organization",
+        )
+    
+    ingestion_service = get_ingestion_service()
+    
+    try:
+        result = await ingestion_service.update_document(
+            doc_id=doc_id,
+            content=request.content,
+            tenant_id=current_user.org_id or "system",
+            strategy=request.strategy,
+            doc_type=request.doc_type,
+            metadata=request.metadata,
+        )
+        
+        return UpdateDocumentResponse(**result)
+        
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document {doc_id} not found or access denied",
+        )
+    except Exception as e:
+        logger.error(f"Update document failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update document: {str(e)}",
+        )
+
+
 @router.delete("/documents/{doc_id}", response_model=DeleteDocumentResponse)
 async def delete_document(
     doc_id: str,
@@ -275,19 +773,16 @@ async def delete_document(
             tenant_id=current_user.org_id,
         )
         
-        if deleted == 0:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Document {doc_id} not found or access denied",
-            )
-        
         return DeleteDocumentResponse(
             doc_id=doc_id,
             chunks_deleted=deleted,
         )
         
-    except HTTPException:
-        raise
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Document {doc_id} not found or access denied",
+        )
     except Exception as e:
         logger.error(f"Delete document failed: {e}")
         raise HTTPException(
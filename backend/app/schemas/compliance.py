@@ -43,4 +43,7 @@ class AuditResponse(BaseModel):
     summary: str = Field(..., description="Executive summary")
     frameworks: list[str] = Field(default_factory=list, description="Frameworks analyzed")
     context_chunks_used: int = Field(..., description="Number of legal context chunks used")
+    referenced_chunks_used: int = Field(
+        0, description="Context chunks pulled in because other context chunks cite them"
+    )
     created_at: str = Field(..., description="ISO timestamp")
@@ -28,6 +28,24 @@ class IngestRequest(BaseModel):
     )
 
 
+class IngestUrlRequest(BaseModel):
+    """Request to ingest a document published at a URL."""
+    
+    url: str = Field(..., description="http(s) URL of a PDF, HTML or text document")
+    strategy: Literal["default", "legal"] = Field(
+        default="default",
+        description="Chunking strategy: 'default' (sliding window) or 'legal' (preserves legal structure)"
+    )
+    doc_type: Literal["private", "marketplace"] = Field(
+        default="private",
+        description="Document type: 'private' (tenant-specific) or 'marketplace' (public)"
+    )
+    metadata: dict | None = Field(
+        default=None,
+        description="Optional metadata to attach to the document"
+    )
+
+
 class IngestResponse(BaseModel):
     """Response after document ingestion."""
     
@@ -37,6 +55,79 @@ class IngestResponse(BaseModel):
     doc_type: str = Field(..., description="Document type")
     tenant_id: str | None = Field(None, description="Owner tenant ID (for private docs)")
     created_at: str = Field(..., description="ISO timestamp of ingestion")
+    chunks_reused: int = Field(0, description="Chunks whose embedding was reused from stored content")
+    chunks_new: int = Field(0, description="Chunks embedded during this ingestion")
+    chunks_near_duplicate: int = Field(
+        0, description="Chunks nearly duplicating stored chunks of other documents (flagged or skipped)"
+    )
+    near_duplicate_of: dict | None = Field(
+        None, description="Stored document this one nearly duplicates ({doc_id, similarity})"
+    )
+    file_duplicate: bool = Field(False, description="True if the same file was already ingested")
+    source_url: str | None = Field(None, description="Source URL (URL ingestion only)")
+    unchanged: bool = Field(False, description="True if the URL was not modified since the last fetch")
+    timings: dict[str, float] | None = Field(
+        None,
+        description=(
+            "Per-stage timings in milliseconds (fetch, extraction, chunking, embedding, storage, "
+            "near_dedupe, pipeline, total) and sizes (bytes_in, pages, chunks, embedding_calls, "
+            "embedding_tokens, writes, near_duplicates)"
+        ),
+    )
+
+
+class IngestJobProgress(BaseModel):
+    """Progress counters of an async ingestion job."""
+    
+    pages_extracted: int = Field(0, description="PDF pages extracted so far")
+    chunks_created: int = Field(0, description="Chunks produced by the chunker so far")
+    chunks_embedded: int = Field(0, description="Chunks with an embedding so far")
+    chunks_stored: int = Field(0, description="Chunks written to the knowledge store so far")
+
+
+class IngestJob(BaseModel):
+    """Status of an async ingestion job."""
+    
+    job_id: str = Field(..., description="Unique job ID")
+    status: str = Field(..., description="pending | processing | completed | failed")
+    progress: IngestJobProgress = Field(default_factory=IngestJobProgress, description="Progress counters")
+    result: IngestResponse | None = Field(None, description="Result if completed")
+    error: str | None = Field(None, description="Error message if failed")
+    created_at: datetime
+    updated_at: datetime | None = None
+
+
+class UpdateDocumentRequest(BaseModel):
+    """Request to update a document in place with a new version of its text."""
+    
+    content: str = Field(..., description="Full new text content of the document")
+    strategy: Literal["default", "legal"] = Field(
+        default="default",
+        description="Chunking strategy (should match the one used at ingestion)"
+    )
+    doc_type: Literal["private", "marketplace"] = Field(
+        default="private",
+        description="Document type: 'private' (tenant-specific) or 'marketplace' (public)"
+    )
+    metadata: dict | None = Field(
+        default=None,
+        description="Optional metadata to attach to the document"
+    )
+
+
+class UpdateDocumentResponse(BaseModel):
+    """Response after an incremental document update."""
+    
+    doc_id: str = Field(..., description="Document ID")
+    chunk_count: int = Field(..., description="Number of chunks in the new version")
+    chunks_unchanged: int = Field(..., description="Chunks kept as they were")
+    chunks_moved: int = Field(..., description="Chunks kept with a new position or metadata")
+    chunks_added: int = Field(..., description="Chunks embedded and written")
+    chunks_removed: int = Field(..., description="Chunks tombstoned")
+    strategy: str = Field(..., description="Chunking strategy used")
+    doc_type: str = Field(..., description="Document type")
+    updated_at: str = Field(..., description="ISO timestamp of the update")
+    timings: dict[str, float] | None = Field(None, description="Per-stage timings in milliseconds")
 
 
 class SearchRequest(BaseModel):
@@ -73,8 +164,12 @@ class DocumentSummary(BaseModel):
     
     doc_id: str = Field(..., description="Document ID")
     type: str = Field(..., description="Document type")
+    strategy: str | None = Field(None, description="Chunking strategy used")
     chunk_count: int = Field(..., description="Number of chunks")
+    content_chars: int = Field(0, description="Total characters of chunk content")
+    original_size: int | None = Field(None, description="Size of the source file in bytes")
     created_at: datetime | None = Field(None, description="Ingestion timestamp")
+    updated_at: datetime | None = Field(None, description="Last update timestamp")
     metadata: dict = Field(default_factory=dict, description="Document metadata")
 
 
@@ -82,7 +177,9 @@ class ListDocumentsResponse(BaseModel):
     """Response listing documents in the knowledge base."""
     
     documents: list[DocumentSummary]
-    count: int
+    count: int = Field(..., description="Number of documents in this page")
+    total: int = Field(..., description="Number of documents matching the filter")
+    next_cursor: str | None = Field(None, description="Cursor of the next page (None on the last page)")
 
 
 class DeleteDocumentResponse(BaseModel):
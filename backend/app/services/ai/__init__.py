@@ -1,5 +1,11 @@
 """AI services package."""
 
+from app.services.ai.backends import EmbeddingBackend, HashingEmbeddingBackend, VertexEmbeddingBackend
 from app.services.ai.embedding import EmbeddingService
 
-__all__ = ["EmbeddingService"]
+__all__ = [
+    "EmbeddingBackend",
+    "HashingEmbeddingBackend",
+    "VertexEmbeddingBackend",
+    "EmbeddingService",
+]
@@ -0,0 +1,222 @@
+"""
+Embedding backends.
+
+A backend turns a batch of texts (each within the token budget) into
+vectors with one blocking call; `EmbeddingService` adds the rest (window
+splitting, thread pool, deadlines, coalescing, caching). The backend is
+chosen by the `embedding_backend` setting:
+
+- "vertex": Vertex AI text-embedding-004 (production)
+- "local": deterministic feature hashing on the CPU, with no network
+  access, for dev, CI and load tests. Vectors preserve lexical overlap
+  only, so search quality is not representative, but every ingest and
+  search code path runs unchanged.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBackend(ABC):
+    """Interface of embedding model backends."""
+
+    # Most texts accepted by one `embed_texts` call
+    max_batch: int = 250
+
+    # Most estimated tokens accepted by one `embed_texts` call (None = no limit)
+    max_batch_tokens: int | None = None
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        """Model name (part of cache keys, so vectors of different models never mix)."""
+
+    @property
+    @abstractmethod
+    def dimension(self) -> int:
+        """Dimension of the vectors."""
+
+    @abstractmethod
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embed a batch of texts (blocking).
+
+        Args:
+            texts: At most `max_batch` texts and `max_batch_tokens` estimated
+                tokens, each text within the token budget
+
+        Returns:
+            One vector per text, in order
+        """
+
+
+class VertexEmbeddingBackend(EmbeddingBackend):
+    """Google Vertex AI text embedding model."""
+
+    MODEL_NAME = "text-embedding-004"
+    EMBEDDING_DIMENSION = 768
+
+    # Request limits of the model: 250 texts and 20,000 tokens
+    max_batch = 250
+    max_batch_tokens = 20_000
+
+    def __init__(self):
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.MODEL_NAME
+
+    @property
+    def dimension(self) -> int:
+        return self.EMBEDDING_DIMENSION
+
+    def _ensure_initialized(self):
+        """Initialize Vertex AI and load the model, once."""
+        with self._lock:
+            if self._model is None:
+                from google.cloud import aiplatform
+                from vertexai.language_models import TextEmbeddingModel
+
+                aiplatform.init(
+                    project=settings.gcp_project_id,
+                    location=settings.gcp_region,
+                )
+                self._model = TextEmbeddingModel.from_pretrained(self.MODEL_NAME)
+                logger.info(f"Initialized Vertex AI embedding model: {self.MODEL_NAME}")
+        return self._model
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        return [e.values for e in self._ensure_initialized().get_embeddings(texts)]
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Offline embeddings by feature hashing.
+
+    Words (case and accents folded) and word bigrams are hashed to a
+    dimension and a sign; counts are weighted by 1 + log(tf) and vectors
+    are L2-normalized, so cosine similarity reflects shared vocabulary.
+    Batches are computed with NumPy when it is installed (the `local`
+    extra), and in pure Python otherwise (same vectors, up to float
+    rounding).
+    """
+
+    max_batch = 1000
+
+    _TOKEN_PATTERN = re.compile(r"\w+")
+
+    def __init__(self, dimension: int = 768):
+        """
+        Initialize the backend.
+
+        Args:
+            dimension: Dimension of the vectors (match the vector index)
+        """
+        self._dimension = max(1, dimension)
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+            logger.info("NumPy not installed, local embeddings are computed in pure Python")
+        self._numpy = numpy
+
+    @property
+    def name(self) -> str:
+        return f"local-hashing-{self._dimension}"
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _terms(self, text: str) -> list[str]:
+        """Get the words (case and accents folded) and word bigrams of a text."""
+        decomposed = unicodedata.normalize("NFKD", text)
+        folded = "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+        words = self._TOKEN_PATTERN.findall(folded)
+        return [*words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]
+
+    @staticmethod
+    def _hash(term: str) -> int:
+        """Hash a term to 64 bits (low bits pick the dimension, the top bit the sign)."""
+        return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        if self._numpy is not None:
+            return self._embed_numpy(texts)
+
+        vectors = []
+        for text in texts:
+            counts: dict[str, int] = {}
+            for term in self._terms(text):
+                counts[term] = counts.get(term, 0) + 1
+
+            vector = [0.0] * self._dimension
+            for term, count in counts.items():
+                value = self._hash(term)
+                vector[value % self._dimension] += (1 if value >> 63 else -1) * (1.0 + math.log(count))
+            norm = math.sqrt(sum(v * v for v in vector))
+            vectors.append([v / norm for v in vector] if norm else vector)
+        return vectors
+
+    def _embed_numpy(self, texts: list[str]) -> list[list[float]]:
+        """
+        Build the normalized vectors of a batch with NumPy.
+
+        Only tokenizing and hashing (once per distinct term of the batch)
+        run in Python; term counts, feature indexes, signs, weights and
+        normalization are array operations over the whole batch.
+        """
+        np = self._numpy
+        hashes: dict[str, int] = {}
+        rows: list[int] = []
+        values: list[int] = []
+        for row, text in enumerate(texts):
+            for term in self._terms(text):
+                value = hashes.get(term)
+                if value is None:
+                    value = hashes[term] = self._hash(term)
+                rows.append(row)
+                values.append(value)
+
+        matrix = np.zeros((len(texts), self._dimension), dtype=np.float64)
+        if values:
+            # Term frequencies: occurrences of each distinct (row, term hash)
+            occurrences = np.stack([np.asarray(rows, dtype=np.uint64), np.asarray(values, dtype=np.uint64)])
+            (term_rows, term_hashes), counts = np.unique(occurrences, axis=1, return_counts=True)
+
+            columns = (term_hashes % np.uint64(self._dimension)).astype(np.intp)
+            signs = np.where(term_hashes >> np.uint64(63), 1.0, -1.0)
+            np.add.at(matrix, (term_rows.astype(np.intp), columns), signs * (1.0 + np.log(counts)))
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        return matrix.tolist()
+
+
+def get_embedding_backend(name: str | None = None) -> EmbeddingBackend:
+    """
+    Create the embedding backend selected by settings.
+
+    Args:
+        name: Backend name ("vertex" or "local"; default: embedding_backend setting)
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    name = (name or settings.embedding_backend).lower()
+    if name == "vertex":
+        return VertexEmbeddingBackend()
+    if name == "local":
+        return HashingEmbeddingBackend(dimension=settings.embedding_dimension)
+    raise ValueError(f"Unknown embedding backend: {name}")
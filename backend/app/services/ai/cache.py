@@ -0,0 +1,155 @@
+"""
+Cache of query embeddings.
+
+Search, MCP tools and audits embed the same short queries over and over.
+Embeddings are cached by model name and normalized text (Unicode NFC,
+whitespace collapsed), in memory with LRU eviction and a TTL, and
+optionally in a local SQLite file so the cache survives restarts.
+
+Vectors are kept as float32 arrays (about 3 KB for 768 dimensions instead
+of ~18 KB as a list of Python floats), so `max_entries` bounds memory.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = Counter(
+    "nprocess_embedding_cache_requests_total",
+    "Embedding cache lookups, by result (hit, disk_hit or miss)",
+    ("result",),
+)
+EVICTIONS = Counter("nprocess_embedding_cache_evictions_total", "Embeddings evicted from the memory cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def cache_key(model: str, text: str) -> str:
+    """Build the cache key of a text embedded by a model."""
+    normalized = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    LRU cache of embeddings with a TTL and an optional SQLite store.
+
+    Memory lookups are synchronous; the SQLite store is only read on a
+    memory miss and written on insert, in a worker thread.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 86_400, path: str | None = None):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Embeddings kept in memory
+            ttl_seconds: Time an embedding stays valid
+            path: SQLite file to persist embeddings in (None = memory only)
+        """
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, array]] = OrderedDict()
+        self._db: sqlite3.Connection | None = None
+        self._db_lock = threading.Lock()
+        if path:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        """Open (or create) the SQLite store and drop expired rows."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB, expires_at REAL)"
+        )
+        removed = self._db.execute("DELETE FROM embeddings WHERE expires_at <= ?", (time.time(),)).rowcount
+        logger.info(f"Opened embedding cache store {path} ({removed} expired entries removed)")
+
+    async def get(self, key: str) -> list[float] | None:
+        """
+        Get a cached embedding.
+
+        Args:
+            key: Key from `cache_key`
+
+        Returns:
+            The embedding, or None if not cached or expired
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, vector = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                REQUESTS.inc(result="hit")
+                return vector.tolist()
+            del self._entries[key]
+
+        if self._db is not None:
+            row = await asyncio.to_thread(self._read, key, now)
+            if row is not None:
+                expires_at, vector = row
+                self._remember(key, expires_at, vector)
+                REQUESTS.inc(result="disk_hit")
+                return vector.tolist()
+
+        REQUESTS.inc(result="miss")
+        return None
+
+    async def put(self, key: str, embedding: list[float]) -> None:
+        """
+        Cache an embedding.
+
+        Args:
+            key: Key from `cache_key`
+            embedding: The embedding vector
+        """
+        expires_at = time.time() + self.ttl
+        vector = array("f", embedding)
+        self._remember(key, expires_at, vector)
+        if self._db is not None:
+            await asyncio.to_thread(self._write, key, expires_at, vector)
+
+    def _remember(self, key: str, expires_at: float, vector: array) -> None:
+        """Insert into the memory cache, evicting the least recently used."""
+        self._entries[key] = (expires_at, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            EVICTIONS.inc()
+
+    def _read(self, key: str, now: float) -> tuple[float, array] | None:
+        """Read an unexpired entry from the SQLite store."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT expires_at, vector FROM embeddings WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[1])
+        return row[0], vector
+
+    def _write(self, key: str, expires_at: float, vector: array) -> None:
+        """Write an entry to the SQLite store."""
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, expires_at) VALUES (?, ?, ?)",
+                (key, vector.tobytes(), expires_at),
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,129 @@
+"""
+Micro-batching of single-text embedding requests.
+
+Search, audits and MCP tools each embed one query text. Under load, the
+coalescer collects the texts submitted within a short window (or until a
+batch is full), embeds them with one model request, and hands each caller
+its own vector, so concurrent queries share a round trip and a quota unit.
+Identical texts in a batch are embedded once.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+from app.core.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    "nprocess_embedding_coalesced_batch_size",
+    "Texts per coalesced embedding request",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 250),
+)
+BATCH_FILL = Histogram(
+    "nprocess_embedding_coalesced_batch_fill_ratio",
+    "Coalesced batch size relative to the maximum batch size",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+FLUSHES = Counter(
+    "nprocess_embedding_coalesced_flushes_total",
+    "Coalesced embedding requests, by what triggered them",
+    ("reason",),
+)
+
+
+class EmbeddingCoalescer:
+    """
+    Collects concurrent single-text embedding calls into batches.
+
+    A batch is sent when it reaches `max_batch` texts or `window_ms` after
+    its first text, whichever comes first. A failed batch fails every
+    call in it.
+    """
+
+    def __init__(
+        self,
+        embed_many: Callable[[list[str]], Awaitable[list[list[float]]]],
+        window_ms: float = 5.0,
+        max_batch: int = 32,
+    ):
+        """
+        Initialize the coalescer.
+
+        Args:
+            embed_many: Embeds a list of texts, returning vectors in order
+            window_ms: Longest wait for more texts after the first of a batch
+            max_batch: Texts per batch
+        """
+        self.embed_many = embed_many
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> list[float]:
+        """
+        Embed one text as part of the next batch.
+
+        Args:
+            text: Text to embed
+
+        Returns:
+            The embedding vector of the text
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # State left by another event loop (e.g. a finished asyncio.run)
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush("full")
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush, "window")
+        return await future
+
+    def _flush(self, reason: str) -> None:
+        """Send the pending texts as one batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        FLUSHES.inc(reason=reason)
+        BATCH_SIZE.observe(len(batch))
+        BATCH_FILL.observe(len(batch) / self.max_batch)
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[str, asyncio.Future]]) -> None:
+        """Embed a batch and resolve the futures of its callers."""
+        # Callers that gave up (cancelled) are dropped before the request
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        try:
+            vectors = dict(zip(texts, await self.embed_many(texts)))
+        except Exception as e:
+            logger.warning(f"Coalesced embedding of {len(texts)} texts failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, future in batch:
+            if not future.done():
+                # A copy each, so a caller modifying its vector affects no other
+                future.set_result(list(vectors[text]))
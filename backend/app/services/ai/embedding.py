@@ -1,102 +1,310 @@
 """
-Embedding service using Vertex AI.
+Embedding service.
 
-Generates vector embeddings for text using Google's text-embedding-004 model.
+Generates vector embeddings for text with the configured backend: Google's
+text-embedding-004 model on Vertex AI, or an offline hashing backend (see
+`app.services.ai.backends`).
+
+Texts are never truncated: a text over the model's token budget is split
+into windows that fit, and the window embeddings are mean-pooled into one
+vector.
+
+Backend calls (the Vertex SDK call included) are synchronous, so they run
+in a dedicated thread pool that also bounds how many requests are in
+flight; each request has a deadline. The event loop is never blocked by
+an embedding round trip.
+
+Inputs are packed into requests by count and estimated tokens; the
+requests of one call run concurrently and each is retried on its own.
+
+Single-text `embed` calls are served from the query embedding cache when
+possible (see `EmbeddingCache`); concurrent misses are coalesced into
+shared batch requests (see `EmbeddingCoalescer`).
 """
 
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 
-from google.cloud import aiplatform
-from vertexai.language_models import TextEmbeddingModel
-
 from app.core.config import settings
+from app.core.metrics import Counter
+from app.services.ai.backends import EmbeddingBackend, get_embedding_backend
+from app.services.ai.cache import EmbeddingCache, cache_key
+from app.services.ai.coalescer import EmbeddingCoalescer
+from app.services.ai.tokens import estimate_tokens, fits_tokens, split_by_tokens
 
 logger = logging.getLogger(__name__)
 
+RETRIES = Counter("nprocess_embedding_request_retries_total", "Embedding model requests retried after a failure")
+
+_embedding_executor: ThreadPoolExecutor | None = None
+
+
+def get_embedding_executor(max_workers: int = 0) -> ThreadPoolExecutor:
+    """
+    Get the shared thread pool that runs embedding model requests.
+
+    Its size is the limit on embedding requests in flight; further
+    requests wait for a free thread.
+
+    Args:
+        max_workers: Number of threads (0 = embedding_max_concurrency
+            setting). Only used when the pool is first created.
+    """
+    global _embedding_executor
+    if _embedding_executor is None:
+        max_workers = max(1, max_workers or settings.embedding_max_concurrency)
+        _embedding_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+        logger.info(f"Started embedding pool with {max_workers} threads")
+    return _embedding_executor
+
+
+def shutdown_embedding_executor() -> None:
+    """Shut down the embedding thread pool, if started."""
+    global _embedding_executor
+    if _embedding_executor is not None:
+        _embedding_executor.shutdown(wait=False, cancel_futures=True)
+        _embedding_executor = None
+
 
 class EmbeddingService:
     """
-    Service for generating text embeddings using Vertex AI.
+    Service for generating text embeddings.
     
-    Uses Google's text-embedding-004 model which produces 768-dimensional vectors.
+    Uses the backend selected by the `embedding_backend` setting (Vertex AI
+    text-embedding-004 by default, 768-dimensional vectors).
     """
     
-    MODEL_NAME = "text-embedding-004"
-    EMBEDDING_DIMENSION = 768
+    def __init__(
+        self,
+        max_tokens: int | None = None,
+        timeout: float | None = None,
+        backend: EmbeddingBackend | None = None,
+    ):
+        """
+        Initialize the embedding service.
+        
+        Args:
+            max_tokens: Token budget per input (default: embedding_max_tokens setting)
+            timeout: Deadline in seconds of each model request, including
+                the wait for a free slot (default: embedding_timeout_seconds
+                setting)
+            backend: Embedding backend (default: from settings)
+        """
+        self.backend = backend or get_embedding_backend()
+        self.max_tokens = max_tokens or settings.embedding_max_tokens
+        self.timeout = timeout or settings.embedding_timeout_seconds
+        self._coalescer: EmbeddingCoalescer | None = None
+        if settings.embedding_coalesce_window_ms > 0:
+            self._coalescer = EmbeddingCoalescer(
+                self._embed_texts,
+                window_ms=settings.embedding_coalesce_window_ms,
+                max_batch=settings.embedding_coalesce_max_batch,
+            )
+        self._cache: EmbeddingCache | None = None
+        if settings.embedding_cache_max_entries > 0:
+            self._cache = EmbeddingCache(
+                max_entries=settings.embedding_cache_max_entries,
+                ttl_seconds=settings.embedding_cache_ttl_seconds,
+                path=settings.embedding_cache_path,
+            )
     
-    def __init__(self):
-        """Initialize the embedding service."""
-        self._model: TextEmbeddingModel | None = None
-        self._initialized = False
+    @property
+    def model_name(self) -> str:
+        """Name of the embedding model."""
+        return self.backend.name
     
-    def _ensure_initialized(self) -> None:
-        """Ensure Vertex AI is initialized."""
-        if not self._initialized:
-            aiplatform.init(
-                project=settings.gcp_project_id,
-                location=settings.gcp_region,
-            )
-            self._model = TextEmbeddingModel.from_pretrained(self.MODEL_NAME)
-            self._initialized = True
-            logger.info(f"Initialized Vertex AI embedding model: {self.MODEL_NAME}")
+    @property
+    def dimension(self) -> int:
+        """Dimension of the embedding vectors."""
+        return self.backend.dimension
     
-    async def embed(self, text: str) -> list[float]:
+    async def embed(self, text: str, timeout: float | None = None) -> list[float]:
         """
         Generate embedding for a single text.
         
+        Cached embeddings are returned without a model request. Concurrent
+        uncached calls are sent together as one batch request, unless
+        coalescing is disabled or the call sets its own timeout.
+        
         Args:
             text: Text to embed
+            timeout: Deadline in seconds per model request (default: the service's)
             
         Returns:
-            List of floats representing the embedding vector (768 dimensions)
+            List of floats representing the embedding vector
+            
+        Raises:
+            TimeoutError: If a model request misses its deadline
         """
-        self._ensure_initialized()
-        
-        # Truncate if too long (model has token limit)
-        if len(text) > 10000:
-            text = text[:10000]
-            logger.warning("Text truncated to 10000 chars for embedding")
+        key = cache_key(self.backend.name, text)
+        if self._cache is not None:
+            cached = await self._cache.get(key)
+            if cached is not None:
+                return cached
         
         try:
-            embeddings = self._model.get_embeddings([text])
-            embedding = embeddings[0].values
+            if self._coalescer and timeout is None:
+                embedding = await self._coalescer.embed(text)
+            else:
+                embedding = (await self._embed_texts([text], timeout))[0]
+            if self._cache is not None:
+                await self._cache.put(key, embedding)
             logger.debug(f"Generated embedding with {len(embedding)} dimensions")
             return embedding
         except Exception as e:
             logger.error(f"Failed to generate embedding: {e}")
             raise
     
-    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+    async def embed_batch(self, texts: list[str], timeout: float | None = None) -> list[list[float]]:
         """
         Generate embeddings for multiple texts.
         
         Args:
             texts: List of texts to embed
+            timeout: Deadline in seconds per model request (default: the service's)
             
         Returns:
             List of embedding vectors
+            
+        Raises:
+            TimeoutError: If a model request misses its deadline
         """
-        self._ensure_initialized()
-        
-        # Truncate long texts
-        processed_texts = [t[:10000] if len(t) > 10000 else t for t in texts]
-        
         try:
-            # Process in batches of 250 (API limit)
-            batch_size = 250
-            all_embeddings = []
-            
-            for i in range(0, len(processed_texts), batch_size):
-                batch = processed_texts[i:i + batch_size]
-                embeddings = self._model.get_embeddings(batch)
-                all_embeddings.extend([e.values for e in embeddings])
-            
+            all_embeddings = await self._embed_texts(texts, timeout)
             logger.info(f"Generated {len(all_embeddings)} embeddings")
             return all_embeddings
         except Exception as e:
             logger.error(f"Failed to generate batch embeddings: {e}")
             raise
+    
+    async def _request(self, inputs: list[str], timeout: float | None) -> list[list[float]]:
+        """
+        Run one model request in the embedding pool, with a deadline.
+        
+        A request still waiting for a thread when its deadline passes is
+        cancelled; one already running is abandoned, and its thread freed
+        when the model answers.
+        """
+        timeout = timeout or self.timeout
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(get_embedding_executor(), self.backend.embed_texts, inputs)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except TimeoutError:
+            raise TimeoutError(
+                f"Embedding request of {len(inputs)} inputs exceeded its {timeout}s deadline"
+            ) from None
+    
+    async def _request_with_retry(self, inputs: list[str], timeout: float | None) -> list[list[float]]:
+        """
+        Run one model request, retrying failures with exponential backoff.
+        
+        Timeouts are not retried: the abandoned request may still hold a
+        pool thread, so a retry would queue behind it (or take another
+        thread) while the caller's deadline has already passed.
+        """
+        retries = max(0, settings.embedding_retries)
+        for attempt in range(retries + 1):
+            try:
+                return await self._request(inputs, timeout)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                if attempt >= retries:
+                    raise
+                delay = 0.5 * (2 ** attempt)
+                RETRIES.inc()
+                logger.warning(
+                    f"Embedding request of {len(inputs)} inputs failed "
+                    f"(attempt {attempt + 1}), retrying in {delay}s: {e}"
+                )
+                await asyncio.sleep(delay)
+    
+    def _pack(self, inputs: list[str]) -> list[tuple[int, int]]:
+        """
+        Pack consecutive inputs into requests within the backend's limits.
+        
+        Returns:
+            (start, end) input ranges, one per request, in input order
+        """
+        max_count = self.backend.max_batch
+        max_tokens = self.backend.max_batch_tokens
+        
+        batches = []
+        start = 0
+        tokens = 0
+        for i, text in enumerate(inputs):
+            text_tokens = estimate_tokens(text) if max_tokens else 0
+            if i > start and (i - start >= max_count or (max_tokens and tokens + text_tokens > max_tokens)):
+                batches.append((start, i))
+                start, tokens = i, 0
+            tokens += text_tokens
+        if start < len(inputs):
+            batches.append((start, len(inputs)))
+        return batches
+    
+    async def _embed_texts(self, texts: list[str], timeout: float | None = None) -> list[list[float]]:
+        """
+        Embed texts, splitting those over the token budget into windows.
+        
+        Inputs are packed into requests (see `_pack`), which run
+        concurrently up to `embedding_batch_concurrency` per call; each
+        request is retried on its own, and the output keeps input order.
+        
+        Args:
+            texts: Texts to embed
+            timeout: Deadline in seconds per model request
+            
+        Returns:
+            One embedding per text (mean of its window embeddings if split)
+        """
+        # Inputs sent to the model, and the input range of each text
+        inputs: list[str] = []
+        ranges: list[tuple[int, int]] = []
+        for text in texts:
+            start = len(inputs)
+            if fits_tokens(text, self.max_tokens):
+                inputs.append(text)
+            else:
+                spans = split_by_tokens(text, self.max_tokens)
+                inputs.extend(text[a:b] for a, b in spans)
+                logger.info(
+                    f"Text of {len(text)} chars over {self.max_tokens} tokens: "
+                    f"embedding {len(spans)} windows"
+                )
+            ranges.append((start, len(inputs)))
+        
+        semaphore = asyncio.Semaphore(max(1, settings.embedding_batch_concurrency))
+        
+        async def run(start: int, end: int) -> list[list[float]]:
+            async with semaphore:
+                return await self._request_with_retry(inputs[start:end], timeout)
+        
+        tasks = [asyncio.create_task(run(start, end)) for start, end in self._pack(inputs)]
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # One request failed for good: the others are not needed
+            for task in tasks:
+                task.cancel()
+            raise
+        vectors = [vector for result in results for vector in result]
+        
+        return [
+            vectors[start] if end - start == 1 else self._mean_pool(vectors[start:end])
+            for start, end in ranges
+        ]
+    
+    @staticmethod
+    def _mean_pool(vectors: list[list[float]]) -> list[float]:
+        """Average window embeddings and normalize the result to unit length."""
+        if not vectors:
+            return []
+        mean = [sum(values) / len(vectors) for values in zip(*vectors)]
+        norm = sum(v * v for v in mean) ** 0.5
+        return [v / norm for v in mean] if norm else mean
 
 
 @lru_cache
@@ -0,0 +1,114 @@
+"""
+Token estimation for Vertex AI models.
+
+The SentencePiece tokenizers used by Vertex AI are not available locally,
+so token counts are estimated: every run of up to four word characters
+and every punctuation mark counts as one token. This overestimates real
+counts for Portuguese and English text, so text that fits the estimate
+fits the model.
+"""
+
+import re
+from functools import lru_cache
+
+_PIECE_PATTERN = re.compile(r"\w{1,4}+|[^\w\s]")
+_WORD_PATTERN = re.compile(r"\S++")
+
+# Longer texts are counted without being cached, to keep the cache small
+CACHE_MAX_CHARS = 20_000
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of model tokens in a text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Estimated token count (an upper bound for typical text)
+    """
+    if len(text) > CACHE_MAX_CHARS:
+        return _count_pieces(text)
+    return _estimate_cached(text)
+
+
+@lru_cache(maxsize=8192)
+def _estimate_cached(text: str) -> int:
+    """Cached token estimate for short texts (e.g. chunks)."""
+    return _count_pieces(text)
+
+
+def _count_pieces(text: str) -> int:
+    """Count token pieces in a text."""
+    # subn counts matches without building a list of piece strings
+    return _PIECE_PATTERN.subn("", text)[1]
+
+
+def fits_tokens(text: str, max_tokens: int) -> bool:
+    """Check whether a text fits a token budget."""
+    # Every token covers at least one character
+    return len(text) <= max_tokens or estimate_tokens(text) <= max_tokens
+
+
+def split_by_tokens(text: str, max_tokens: int) -> list[tuple[int, int]]:
+    """
+    Split a text into consecutive spans that each fit a token budget.
+
+    Spans break between words; a single word larger than the budget is
+    cut between token pieces.
+
+    Args:
+        text: Text to split
+        max_tokens: Maximum estimated tokens per span
+
+    Returns:
+        List of (start, end) character offsets into `text`
+    """
+    max_tokens = max(1, max_tokens)
+    spans: list[tuple[int, int]] = []
+    start = None
+    end = 0
+    count = 0
+
+    for word in _WORD_PATTERN.finditer(text):
+        word_tokens = _count_pieces(word.group())
+
+        if start is not None and count + word_tokens > max_tokens:
+            spans.append((start, end))
+            start = None
+            count = 0
+
+        if word_tokens > max_tokens:
+            pieces = list(_PIECE_PATTERN.finditer(text, word.start(), word.end()))
+            for i in range(0, len(pieces), max_tokens):
+                last = pieces[min(i + max_tokens, len(pieces)) - 1]
+                spans.append((pieces[i].start(), last.end()))
+            continue
+
+        if start is None:
+            start = word.start()
+        end = word.end()
+        count += word_tokens
+
+    if start is not None:
+        spans.append((start, end))
+
+    return spans
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Truncate a text to a token budget, at a word boundary.
+
+    Args:
+        text: Text to truncate
+        max_tokens: Maximum estimated tokens to keep
+
+    Returns:
+        The text itself if it fits, otherwise its longest prefix that fits
+    """
+    if fits_tokens(text, max_tokens):
+        return text
+    spans = split_by_tokens(text, max_tokens)
+    return text[:spans[0][1]] if spans else ""
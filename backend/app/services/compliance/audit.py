@@ -3,14 +3,20 @@ Compliance audit service.
 
 Audits processes and documents against legal frameworks using RAG.
 Combines Knowledge Store (legal context) with Gemini Pro (analysis).
+
+Provisions cited by the retrieved context ("nos termos do art. 7º") are
+pulled in from the cross-reference index built at ingestion, without
+further vector searches.
 """
 
 import logging
 import uuid
 from datetime import datetime
 
+from app.core.config import settings
 from app.services.ai.embedding import get_embedding_service
 from app.services.ai.gemini import get_gemini_service
+from app.services.ai.tokens import estimate_tokens, truncate_to_tokens
 from app.services.knowledge.service import get_knowledge_service
 
 logger = logging.getLogger(__name__)
@@ -80,8 +86,9 @@ class ComplianceAuditService:
         
         logger.info(f"Starting compliance audit {audit_id}")
         
-        # Step 1: Embed the content for RAG search
-        content_embedding = await self.embedding.embed(content[:5000])  # Limit for embedding
+        # Step 1: Embed the content for RAG search (long content is embedded
+        # in windows by the embedding service, not truncated)
+        content_embedding = await self.embedding.embed(content)
         
         # Step 2: Search for relevant legal context
         legal_context = await self._get_legal_context(
@@ -111,6 +118,7 @@ class ComplianceAuditService:
                 "frameworks": frameworks or [],
                 "created_at": created_at.isoformat(),
                 "context_chunks_used": len(legal_context),
+                "referenced_chunks_used": sum(1 for ctx in legal_context if ctx.get("referenced")),
             })
             
             logger.info(f"Completed audit {audit_id}: score={result.get('compliance_score')}")
@@ -144,13 +152,57 @@ class ComplianceAuditService:
                     law = metadata.get("law", "")
                     if any(fw.lower() in law.lower() for fw in frameworks):
                         filtered.append(r)
-                return filtered or results  # Fallback to all if no matches
-            
-            return results
+                results = filtered or results  # Fallback to all if no matches
             
         except Exception as e:
             logger.warning(f"Failed to retrieve legal context: {e}")
             return []
+        
+        return results + await self._get_referenced_provisions(results, tenant_id)
+    
+    async def _get_referenced_provisions(
+        self,
+        results: list[dict],
+        tenant_id: str | None,
+    ) -> list[dict]:
+        """
+        Get the provisions cited by context chunks and not already in the context.
+        
+        Uses the cross-reference index (`references` and `provision`
+        chunk metadata), so this costs index lookups, not vector searches.
+        
+        Args:
+            results: Context chunks from the vector search
+            tenant_id: Tenant ID for accessing private knowledge
+            
+        Returns:
+            Chunks of the referenced provisions, marked with `referenced`
+        """
+        if settings.audit_reference_limit <= 0:
+            return []
+        
+        present = {r.get("metadata", {}).get("provision") for r in results}
+        cited: list[str] = []
+        for r in results:
+            for provision in r.get("metadata", {}).get("references") or []:
+                if provision not in present and provision not in cited:
+                    cited.append(provision)
+        cited = cited[:settings.audit_reference_limit]
+        if not cited:
+            return []
+        
+        try:
+            referenced = await self.knowledge.get_provisions(
+                cited,
+                tenant_id=tenant_id or "system",
+                limit=settings.audit_reference_max_chunks,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to retrieve referenced provisions: {e}")
+            return []
+        
+        seen = {r["id"] for r in results}
+        return [{**ctx, "referenced": True} for ctx in referenced if ctx["id"] not in seen]
     
     def _build_audit_prompt(
         self,
@@ -161,10 +213,18 @@ class ComplianceAuditService:
         """Build the audit prompt with RAG context."""
         frameworks_text = ", ".join(frameworks) if frameworks else "aplicáveis"
         
+        max_tokens = settings.audit_content_max_tokens
+        prompt_content = truncate_to_tokens(content, max_tokens)
+        if len(prompt_content) < len(content):
+            logger.warning(
+                f"Audit content truncated to {max_tokens} tokens "
+                f"(~{estimate_tokens(content)} tokens, {len(content)} chars)"
+            )
+        
         prompt = f"""Analise o seguinte conteúdo quanto à conformidade com normas {frameworks_text}:
 
 ## CONTEÚDO PARA ANÁLISE:
-{content[:5000]}
+{prompt_content}
 """
         
         if legal_context:
@@ -173,8 +233,9 @@ class ComplianceAuditService:
                 metadata = ctx.get("metadata", {})
                 law = metadata.get("law", "N/A")
                 article = metadata.get("article", "")
+                cited = ", citado por outro trecho" if ctx.get("referenced") else ""
                 
-                prompt += f"### Trecho {i} ({law} {f'Art. {article}' if article else ''}):\n"
+                prompt += f"### Trecho {i} ({law} {f'Art. {article}' if article else ''}{cited}):\n"
                 prompt += f"{ctx.get('content', '')}\n\n"
         
         prompt += """
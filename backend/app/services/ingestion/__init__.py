@@ -4,14 +4,19 @@ from app.services.ingestion.chunking import (
     ChunkingStrategy,
     SlidingWindowStrategy,
     LegalDocumentStrategy,
+    LegalUnit,
     get_chunking_strategy,
 )
+from app.services.ingestion.pipeline import IngestPipeline, IngestProgress
 from app.services.ingestion.service import IngestionService
 
 __all__ = [
     "ChunkingStrategy",
     "SlidingWindowStrategy",
     "LegalDocumentStrategy",
+    "LegalUnit",
     "get_chunking_strategy",
+    "IngestPipeline",
+    "IngestProgress",
     "IngestionService",
 ]
@@ -0,0 +1,185 @@
+"""
+Readers for bulk ingestion payloads.
+
+A bulk upload is either an NDJSON stream of `{content, metadata, strategy}`
+records or a ZIP of files. Both are turned into a stream of `BulkItem`s
+that `IngestionService.ingest_bulk` runs through one shared pipeline.
+Records are parsed and files extracted one at a time, so memory does not
+depend on the size of the upload.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ("default", "legal")
+
+
+@dataclass
+class BulkItem:
+    """A document of a bulk upload: raw text or a file on local disk."""
+
+    name: str
+    content: str | None = None
+    path: str | None = None
+    strategy: str = "default"
+    metadata: dict | None = None
+    error: str | None = None  # Set when the record could not be read
+
+
+async def iter_ndjson_items(
+    blocks: AsyncIterator[bytes],
+    strategy: str = "default",
+    metadata: dict | None = None,
+) -> AsyncIterator[BulkItem]:
+    """
+    Parse an NDJSON byte stream into bulk items.
+
+    Each non-empty line is a JSON object with `content` and optional
+    `metadata`, `strategy` and `name`. Invalid lines become items with an
+    error instead of aborting the upload.
+
+    Args:
+        blocks: Async iterator of byte blocks
+        strategy: Strategy for records that do not set one
+        metadata: Metadata applied to every record (record metadata wins)
+
+    Yields:
+        One BulkItem per record, in order
+    """
+    buffer = b""
+    line_number = 0
+
+    async for block in blocks:
+        buffer += block
+        if b"\n" not in block:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield _parse_record(line, line_number, strategy, metadata)
+
+    if buffer.strip():
+        yield _parse_record(buffer, line_number + 1, strategy, metadata)
+
+
+def _parse_record(
+    line: bytes,
+    line_number: int,
+    strategy: str,
+    metadata: dict | None,
+) -> BulkItem:
+    """Parse a single NDJSON record."""
+    name = f"line {line_number}"
+    try:
+        record = json.loads(line)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return BulkItem(name=name, error=f"Invalid JSON: {e}")
+
+    if not isinstance(record, dict):
+        return BulkItem(name=name, error="Record must be a JSON object")
+
+    name = str(record.get("name") or name)
+    content = record.get("content")
+    record_metadata = record.get("metadata") or {}
+    record_strategy = record.get("strategy") or strategy
+
+    if not isinstance(content, str) or not content.strip():
+        return BulkItem(name=name, error="Record has no content")
+    if not isinstance(record_metadata, dict):
+        return BulkItem(name=name, error="Record metadata must be an object")
+    if record_strategy not in STRATEGIES:
+        return BulkItem(name=name, error=f"Unknown strategy: {record_strategy}")
+
+    return BulkItem(
+        name=name,
+        content=content,
+        strategy=record_strategy,
+        metadata={**(metadata or {}), **record_metadata},
+    )
+
+
+async def iter_zip_items(
+    path: str,
+    strategy: str = "default",
+    metadata: dict | None = None,
+    spool_dir: str | None = None,
+    max_file_bytes: int | None = None,
+) -> AsyncIterator[BulkItem]:
+    """
+    Extract the files of a ZIP archive one at a time as bulk items.
+
+    Each file is extracted to a temporary file that is deleted once the
+    consumer asks for the next item. Directories, hidden files and macOS
+    resource forks are skipped.
+
+    Args:
+        path: Path to the ZIP file
+        strategy: Chunking strategy for every file
+        metadata: Metadata applied to every file
+        spool_dir: Directory for the extracted files (system default if None)
+        max_file_bytes: Maximum uncompressed size per file (None = no limit)
+
+    Yields:
+        One BulkItem per file, in archive order
+
+    Raises:
+        ValueError: If the file is not a valid ZIP archive
+    """
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Invalid ZIP file: {e}")
+
+    with archive:
+        for info in archive.infolist():
+            basename = os.path.basename(info.filename)
+            if info.is_dir() or not basename or basename.startswith(".") or "__MACOSX" in info.filename:
+                continue
+
+            if max_file_bytes is not None and info.file_size > max_file_bytes:
+                yield BulkItem(
+                    name=info.filename,
+                    error=f"File exceeds {max_file_bytes} bytes uncompressed",
+                )
+                continue
+
+            try:
+                extracted = await asyncio.to_thread(_extract_member, archive, info, spool_dir)
+            except (zipfile.BadZipFile, OSError, RuntimeError) as e:
+                yield BulkItem(name=info.filename, error=f"Could not extract file: {e}")
+                continue
+
+            try:
+                yield BulkItem(
+                    name=info.filename,
+                    path=extracted,
+                    strategy=strategy,
+                    metadata=dict(metadata or {}),
+                )
+            finally:
+                os.unlink(extracted)
+
+
+def _extract_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, spool_dir: str | None) -> str:
+    """Extract an archive member to a temporary file (never to its archived path)."""
+    suffix = os.path.splitext(info.filename)[1]
+    with archive.open(info) as source, tempfile.NamedTemporaryFile(
+        delete=False, suffix=suffix, dir=spool_dir
+    ) as target:
+        try:
+            shutil.copyfileobj(source, target)
+        except BaseException:
+            target.close()
+            os.unlink(target.name)
+            raise
+    return target.name
@@ -3,21 +3,44 @@ Chunking strategies for document ingestion.
 
 Implements Strategy Pattern for different chunking approaches:
 - SlidingWindowStrategy: Default token-based sliding window
-- LegalDocumentStrategy: Preserves legal document structure (Artigos, Parágrafos, Incisos)
+- LegalDocumentStrategy: Preserves legal document structure (Artigos, Parágrafos, Incisos, Alíneas)
 """
 
 import re
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from collections import ChainMap
+from collections.abc import Iterable, Iterator, MutableMapping
+from dataclasses import dataclass, field
 
+from app.core.config import settings
+from app.services.ai.tokens import fits_tokens, split_by_tokens
+from app.services.ingestion.references import document_law, extract_references, provision_key
 
-@dataclass
+
+@dataclass(slots=True)
 class Chunk:
-    """Represents a chunk of text with metadata."""
+    """
+    Represents a chunk of text with metadata.
+    
+    Strategies may pass `metadata` as a ChainMap of the chunk's own fields
+    over the document's base metadata, so the base dict is shared by all
+    chunks instead of being copied into each one (and is stored once, on
+    the document record). `char_start`/`char_end` locate the chunk in the
+    source text when the strategy tracks offsets.
+    """
     
     content: str
     index: int
-    metadata: dict
+    metadata: MutableMapping
+    char_start: int | None = None
+    char_end: int | None = None
+    
+    @property
+    def own_metadata(self) -> MutableMapping:
+        """Get the chunk's own metadata, without the shared document metadata."""
+        if isinstance(self.metadata, ChainMap):
+            return self.metadata.maps[0]
+        return self.metadata
 
 
 class ChunkingStrategy(ABC):
@@ -37,6 +60,27 @@ class ChunkingStrategy(ABC):
         """
         pass
     
+    def chunk_stream(
+        self,
+        segments: Iterable[str],
+        metadata: dict | None = None,
+    ) -> Iterator[Chunk]:
+        """
+        Split a stream of text segments into chunks.
+        
+        Strategies that can chunk incrementally override this to emit each
+        chunk as soon as it is complete. The default implementation joins
+        all segments and delegates to `chunk`.
+        
+        Args:
+            segments: Consecutive pieces of the document text
+            metadata: Optional metadata to include with each chunk
+            
+        Yields:
+            Chunk objects, in document order
+        """
+        yield from self.chunk("".join(segments), metadata)
+    
     @property
     @abstractmethod
     def name(self) -> str:
@@ -49,12 +93,22 @@ class SlidingWindowStrategy(ChunkingStrategy):
     Default chunking strategy using sliding window with overlap.
     
     Splits text by tokens (words) with configurable window size and overlap.
+    Windows are located with regex matches over the original text, so no
+    per-token strings are created: each chunk is a single slice of the
+    source, preserving its whitespace, with character offsets recorded.
+    
+    With `max_tokens` set, a window whose estimated model token count is
+    over the budget is split further, so every chunk fits the embedding
+    model without truncation.
     """
     
+    TOKEN_PATTERN = re.compile(r"\S++")
+    
     def __init__(
         self,
         chunk_size: int = 500,
         overlap: int = 50,
+        max_tokens: int | None = None,
     ):
         """
         Initialize sliding window strategy.
@@ -62,9 +116,23 @@ class SlidingWindowStrategy(ChunkingStrategy):
         Args:
             chunk_size: Number of tokens per chunk
             overlap: Number of overlapping tokens between chunks
+            max_tokens: Maximum estimated model tokens per chunk (None = no limit)
         """
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self.max_tokens = max_tokens
+        
+        # A full window followed by at least one more token; the "skip" (or
+        # "next") group marks where the following window starts
+        step = chunk_size - overlap
+        if overlap > 0:
+            window = (
+                rf"(?P<skip>(?:\S++\s++){{{step}}})"
+                rf"\S++(?:\s++\S++){{{overlap - 1}}}(?=\s++\S)"
+            )
+        else:
+            window = rf"\S++(?:\s++\S++){{{chunk_size - 1}}}(?=\s++(?P<next>\S))"
+        self._window_pattern = re.compile(window)
     
     @property
     def name(self) -> str:
@@ -75,41 +143,146 @@ class SlidingWindowStrategy(ChunkingStrategy):
         if not text.strip():
             return []
         
-        # Tokenize by words
-        tokens = text.split()
-        chunks = []
+        return list(self.chunk_stream([text], metadata))
+    
+    def chunk_stream(
+        self,
+        segments: Iterable[str],
+        metadata: dict | None = None,
+    ) -> Iterator[Chunk]:
+        """
+        Split streamed text using the sliding window approach.
         
-        start = 0
+        Only the text from the current window onwards is kept in memory.
+        Offsets are relative to the start of the whole stream.
+        """
+        base_metadata = metadata or {}
+        step = self.chunk_size - self.overlap
+        
+        buffer = ""
+        buffer_offset = 0  # Stream offset of buffer[0]
+        pos = None  # Buffer offset of the next window's first token
+        window_index = 0
         index = 0
         
-        while start < len(tokens):
-            end = min(start + self.chunk_size, len(tokens))
-            chunk_tokens = tokens[start:end]
-            chunk_text = " ".join(chunk_tokens)
+        for segment in segments:
+            buffer += segment
+            if pos is None:
+                first = self.TOKEN_PATTERN.search(buffer)
+                if first is None:
+                    continue
+                pos = first.start()
             
-            chunk_metadata = {
-                "strategy": self.name,
-                "chunk_index": index,
-                "token_start": start,
-                "token_end": end,
-                **(metadata or {}),
-            }
+            # Only emit windows known not to be the last one
+            while window := self._window_pattern.match(buffer, pos):
+                chunks = self._make_chunks(
+                    buffer, pos, window.end(), buffer_offset,
+                    window_index * step, self.chunk_size, index, base_metadata,
+                )
+                yield from chunks
+                pos = window.end("skip") if self.overlap > 0 else window.start("next")
+                window_index += 1
+                index += len(chunks)
             
-            chunks.append(Chunk(
-                content=chunk_text,
-                index=index,
-                metadata=chunk_metadata,
-            ))
-            
-            # Move window with overlap
-            start += self.chunk_size - self.overlap
-            index += 1
-            
-            # Avoid infinite loop on very small texts
-            if end >= len(tokens):
-                break
+            # Drop text before the next window
+            if pos:
+                buffer = buffer[pos:]
+                buffer_offset += pos
+                pos = 0
+        
+        if pos is None:
+            return
+        
+        # The remaining tokens (at most chunk_size) form the last window
+        tail = buffer[pos:].rstrip()
+        yield from self._make_chunks(
+            buffer, pos, pos + len(tail), buffer_offset,
+            window_index * step, len(tail.split()), index, base_metadata,
+        )
+    
+    def _make_chunks(
+        self,
+        buffer: str,
+        start: int,
+        end: int,
+        buffer_offset: int,
+        token_start: int,
+        token_count: int,
+        index: int,
+        base_metadata: dict,
+    ) -> list[Chunk]:
+        """Build the chunks of the window buffer[start:end], splitting it to fit max_tokens."""
+        window = buffer[start:end]
+        if self.max_tokens is None or fits_tokens(window, self.max_tokens):
+            return [self._make_chunk(
+                buffer, start, end, buffer_offset,
+                token_start, token_count, index, base_metadata,
+            )]
         
+        chunks = []
+        for part_start, part_end in split_by_tokens(window, self.max_tokens):
+            part_count = len(window[part_start:part_end].split())
+            chunks.append(self._make_chunk(
+                buffer, start + part_start, start + part_end, buffer_offset,
+                token_start, part_count, index + len(chunks), base_metadata,
+            ))
+            token_start += part_count
         return chunks
+    
+    def _make_chunk(
+        self,
+        buffer: str,
+        start: int,
+        end: int,
+        buffer_offset: int,
+        token_start: int,
+        token_count: int,
+        index: int,
+        base_metadata: dict,
+    ) -> Chunk:
+        """Build a chunk from buffer[start:end]."""
+        char_start = buffer_offset + start
+        char_end = buffer_offset + end
+        
+        own_metadata = {
+            "strategy": self.name,
+            "chunk_index": index,
+            "token_start": token_start,
+            "token_end": token_start + token_count,
+            "char_start": char_start,
+            "char_end": char_end,
+        }
+        
+        return Chunk(
+            content=buffer[start:end],
+            index=index,
+            metadata=ChainMap(own_metadata, base_metadata),
+            char_start=char_start,
+            char_end=char_end,
+        )
+
+
+@dataclass(slots=True)
+class LegalUnit:
+    """
+    A node of the structure of a legal text.
+    
+    `kind` is one of "preamble", "article", "paragraph", "inciso" or
+    "alinea"; `start`/`end` are character offsets of the whole unit,
+    children included. The unit's own text (e.g. an article's caput)
+    runs from `start` to the start of its first child.
+    """
+    
+    kind: str
+    label: str | None
+    start: int
+    end: int
+    children: list["LegalUnit"] = field(default_factory=list)
+    
+    @property
+    def body_end(self) -> int:
+        """End offset of the unit's own text, before its first child."""
+        return self.children[0].start if self.children else self.end
 
 
 class LegalDocumentStrategy(ChunkingStrategy):
@@ -122,163 +295,258 @@ class LegalDocumentStrategy(ChunkingStrategy):
     - Incisos (Items)
     - Alíneas (Sub-items)
     
-    Never breaks in the middle of a legal unit.
+    The text is parsed in a single scan into an Artigo → § → Inciso →
+    Alínea tree with character offsets. Each article becomes one chunk;
+    articles over `max_chunk_size` estimated model tokens are split along
+    the tree, and only a unit without sub-units that is still too large
+    falls back to a token window. Never breaks in the middle of a legal
+    unit otherwise.
+    
+    Each chunk records its provision ("<law>:<article>") and the
+    provisions it cites (see `references`), so referenced articles can be
+    looked up without a vector search.
     """
     
-    # Regex patterns for Brazilian legal documents
-    ARTICLE_PATTERN = re.compile(
-        r"(?:^|\n)(Art(?:igo)?\.?\s*\d+[º°]?\.?\s*[-–]?\s*)",
-        re.IGNORECASE | re.MULTILINE
-    )
-    PARAGRAPH_PATTERN = re.compile(
-        r"(?:^|\n)(§\s*\d+[º°]?\.?\s*[-–]?\s*|Parágrafo\s+único\.?\s*)",
-        re.IGNORECASE | re.MULTILINE
-    )
-    INCISO_PATTERN = re.compile(
-        r"(?:^|\n)([IVXLCDM]+\s*[-–]\s*|\d+\s*[-–]\s*)",
+    # Structural markers of Brazilian legal documents at the start of a
+    # line, in one alternation (incisos are Roman numerals or numbers of at
+    # most three digits, so lines like "2018 - ..." are not incisos)
+    UNIT_PATTERN = re.compile(
+        r"^[ \t]*(?:"
+        r"(?P<article>(?i:art(?:igo)?)\.?\s*(?P<article_label>\d+(?:\.\d{3})*))"
+        r"|(?P<paragraph>§\s*(?P<paragraph_label>\d+)|(?i:par[áa]grafo\s+[úu]nico))"
+        r"|(?P<inciso>(?P<inciso_label>[IVXLCDM]+|\d{1,3})\s*[-–])"
+        r"|(?P<alinea>(?P<alinea_label>[a-z])\))"
+        r")",
         re.MULTILINE
     )
+    UNIT_LEVELS = {"article": 1, "paragraph": 2, "inciso": 3, "alinea": 4}
+    
+    # Characters buffered by chunk_stream before flushing text without articles
+    STREAM_BUFFER_LIMIT = 1_000_000
     
-    def __init__(self, max_chunk_size: int = 1000):
+    def __init__(self, max_chunk_size: int = 1000, max_tokens: int | None = None):
         """
         Initialize legal document strategy.
         
         Args:
             max_chunk_size: Maximum tokens per chunk (will split large articles)
+            max_tokens: Token budget of the embedding model; caps max_chunk_size
         """
+        if max_tokens is not None:
+            max_chunk_size = min(max_chunk_size, max_tokens)
         self.max_chunk_size = max_chunk_size
+        self._fallback = SlidingWindowStrategy(
+            chunk_size=max(1, max_chunk_size // 2),
+            overlap=min(50, max(0, max_chunk_size // 2 - 1)),
+            max_tokens=max_chunk_size,
+        )
     
     @property
     def name(self) -> str:
         return "legal_document"
     
+    def parse(self, text: str) -> list[LegalUnit]:
+        """
+        Parse legal text into its structure tree in one linear scan.
+        
+        Args:
+            text: The legal text
+            
+        Returns:
+            Top-level units: an optional preamble (text before the first
+            article, holding any units found there) followed by articles
+        """
+        root = LegalUnit("document", None, 0, len(text))
+        stack = [(0, root)]
+        
+        for match in self.UNIT_PATTERN.finditer(text):
+            kind = match.lastgroup
+            level = self.UNIT_LEVELS[kind]
+            start = match.start(kind)
+            
+            # Close every open unit at the same or a deeper level
+            while stack[-1][0] >= level:
+                stack.pop()[1].end = start
+            
+            if kind == "paragraph":
+                label = match.group("paragraph_label") or "único"
+            else:
+                label = match.group(f"{kind}_label").replace(".", "")
+            
+            unit = LegalUnit(kind, label, start, len(text))
+            stack[-1][1].children.append(unit)
+            stack.append((level, unit))
+        
+        units = root.children
+        first_article = next(
+            (i for i, unit in enumerate(units) if unit.kind == "article"), len(units)
+        )
+        if first_article == len(units) or units[first_article].start > 0:
+            end = units[first_article].start if first_article < len(units) else len(text)
+            preamble = LegalUnit("preamble", None, 0, end, units[:first_article])
+            units = [preamble] + units[first_article:]
+        
+        return units
+    
     def chunk(self, text: str, metadata: dict | None = None) -> list[Chunk]:
         """Split legal text preserving article structure."""
         if not text.strip():
             return []
         
-        chunks = []
+        chunks = list(self._chunk_text(text, metadata or {}))
+        for index, chunk in enumerate(chunks):
+            chunk.index = index
+        return chunks
+    
+    def chunk_stream(
+        self,
+        segments: Iterable[str],
+        metadata: dict | None = None,
+    ) -> Iterator[Chunk]:
+        """
+        Split streamed legal text preserving article structure.
         
-        # Split by articles first
-        articles = self._split_by_articles(text)
+        Text is buffered until the start of the next article is seen; every
+        article before it is complete and is chunked right away. Only new
+        text is scanned for article markers, and offsets are relative to
+        the start of the whole stream.
+        """
+        base_metadata = metadata or {}
+        buffer = ""
+        buffer_offset = 0  # Stream offset of buffer[0]
+        index = 0
         
-        for article_idx, article_text in enumerate(articles):
-            article_text = article_text.strip()
-            if not article_text:
-                continue
+        for segment in segments:
+            # A marker may straddle segments: rescan a few characters back
+            scan_from = max(0, len(buffer) - 16)
+            buffer += segment
             
-            # Extract article number if present
-            article_match = self.ARTICLE_PATTERN.search(article_text)
-            article_num = None
-            if article_match:
-                num_match = re.search(r"\d+", article_match.group(1))
-                if num_match:
-                    article_num = num_match.group()
+            # Keep the last (possibly incomplete) article in the buffer
+            last_start = None
+            for match in self.UNIT_PATTERN.finditer(buffer, scan_from):
+                if match.lastgroup == "article":
+                    last_start = match.start()
             
-            # Check if article is too large
-            tokens = article_text.split()
-            if len(tokens) > self.max_chunk_size:
-                # Split by paragraphs
-                sub_chunks = self._split_large_article(article_text, article_num, metadata)
-                for sub_idx, sub_chunk in enumerate(sub_chunks):
-                    chunks.append(Chunk(
-                        content=sub_chunk["content"],
-                        index=len(chunks),
-                        metadata={
-                            "strategy": self.name,
-                            "article": article_num,
-                            "sub_chunk": sub_idx,
-                            **(metadata or {}),
-                            **sub_chunk.get("metadata", {}),
-                        },
-                    ))
+            if last_start:
+                ready, buffer = buffer[:last_start], buffer[last_start:]
+            elif len(buffer) > self.STREAM_BUFFER_LIMIT:
+                # No article markers: flush rather than buffer without bound
+                ready, buffer = buffer, ""
             else:
-                chunks.append(Chunk(
-                    content=article_text,
-                    index=len(chunks),
-                    metadata={
-                        "strategy": self.name,
-                        "article": article_num,
-                        **(metadata or {}),
-                    },
-                ))
+                continue
+            
+            for chunk in self._chunk_text(ready, base_metadata, buffer_offset):
+                chunk.index = index
+                index += 1
+                yield chunk
+            buffer_offset += len(ready)
         
-        return chunks
+        for chunk in self._chunk_text(buffer, base_metadata, buffer_offset):
+            chunk.index = index
+            index += 1
+            yield chunk
     
-    def _split_by_articles(self, text: str) -> list[str]:
-        """Split text by article markers."""
-        # Find all article positions
-        matches = list(self.ARTICLE_PATTERN.finditer(text))
-        
-        if not matches:
-            # No articles found, return as single chunk
-            return [text]
-        
-        articles = []
-        for i, match in enumerate(matches):
-            start = match.start()
-            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-            articles.append(text[start:end])
-        
-        # Include any text before first article
-        if matches[0].start() > 0:
-            preamble = text[:matches[0].start()].strip()
-            if preamble:
-                articles.insert(0, preamble)
+    def _chunk_text(
+        self,
+        text: str,
+        base_metadata: dict,
+        offset: int = 0,
+    ) -> Iterator[Chunk]:
+        """Chunk text along its structure tree (chunk indexes are left at 0)."""
+        law = document_law(base_metadata)
         
-        return articles
+        for unit in self.parse(text):
+            article_num = unit.label if unit.kind == "article" else None
+            provision = provision_key(law, article_num) if law and article_num else None
+            spans = list(self._split_unit(text, unit, {}))
+            
+            for sub_idx, (start, end, labels) in enumerate(spans):
+                own_metadata = {"strategy": self.name, "article": article_num}
+                if len(spans) > 1:
+                    own_metadata["sub_chunk"] = sub_idx
+                own_metadata.update(labels)
+                own_metadata["char_start"] = offset + start
+                own_metadata["char_end"] = offset + end
+                
+                # Cross-reference index entries
+                if provision:
+                    own_metadata["provision"] = provision
+                references = [ref for ref in extract_references(text[start:end], law) if ref != provision]
+                if references:
+                    own_metadata["references"] = references
+                
+                yield Chunk(
+                    content=text[start:end],
+                    index=0,
+                    metadata=ChainMap(own_metadata, base_metadata),
+                    char_start=offset + start,
+                    char_end=offset + end,
+                )
     
-    def _split_large_article(
+    def _split_unit(
         self,
-        article_text: str,
-        article_num: str | None,
-        base_metadata: dict | None,
-    ) -> list[dict]:
-        """Split a large article by paragraphs."""
-        # Try splitting by paragraphs
-        para_matches = list(self.PARAGRAPH_PATTERN.finditer(article_text))
+        text: str,
+        unit: LegalUnit,
+        labels: dict,
+    ) -> Iterator[tuple[int, int, dict]]:
+        """
+        Get the chunk spans of a unit as (start, end, labels).
         
-        if para_matches:
-            sub_chunks = []
-            for i, match in enumerate(para_matches):
-                start = match.start()
-                end = para_matches[i + 1].start() if i + 1 < len(para_matches) else len(article_text)
-                para_text = article_text[start:end].strip()
-                
-                if para_text:
-                    sub_chunks.append({
-                        "content": para_text,
-                        "metadata": {"paragraph": i + 1},
-                    })
-            
-            # Include caput (text before first paragraph)
-            if para_matches[0].start() > 0:
-                caput = article_text[:para_matches[0].start()].strip()
-                if caput:
-                    sub_chunks.insert(0, {
-                        "content": caput,
-                        "metadata": {"paragraph": "caput"},
-                    })
-            
-            return sub_chunks
+        A unit that fits in `max_chunk_size` is a single span. Otherwise its
+        own text and each child are split recursively; a unit without
+        children falls back to token windows. Spans are stripped of
+        surrounding whitespace and empty spans are skipped.
+        """
+        if fits_tokens(text[unit.start:unit.end], self.max_chunk_size):
+            yield from self._stripped(text, unit.start, unit.end, labels)
+            return
         
-        # Fallback: use sliding window on large article
-        fallback = SlidingWindowStrategy(
-            chunk_size=self.max_chunk_size // 2,
-            overlap=50,
-        )
-        fallback_chunks = fallback.chunk(article_text, base_metadata)
+        if not unit.children:
+            for window in self._fallback.chunk_stream([text[unit.start:unit.end]]):
+                yield from self._stripped(
+                    text,
+                    unit.start + window.char_start,
+                    unit.start + window.char_end,
+                    labels,
+                )
+            return
+        
+        # Own text (the caput, for articles) before the first child
+        if unit.body_end > unit.start:
+            caput = {**labels, "paragraph": "caput"} if unit.kind in ("article", "preamble") else labels
+            if fits_tokens(text[unit.start:unit.body_end], self.max_chunk_size):
+                yield from self._stripped(text, unit.start, unit.body_end, caput)
+            else:
+                yield from self._split_unit(
+                    text, LegalUnit(unit.kind, unit.label, unit.start, unit.body_end), caput
+                )
         
-        return [
-            {"content": c.content, "metadata": c.metadata}
-            for c in fallback_chunks
-        ]
+        for child in unit.children:
+            yield from self._split_unit(text, child, {**labels, child.kind: child.label})
+    
+    @staticmethod
+    def _stripped(
+        text: str,
+        start: int,
+        end: int,
+        labels: dict,
+    ) -> Iterator[tuple[int, int, dict]]:
+        """Yield text[start:end] without surrounding whitespace, if not empty."""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            yield start, end, labels
 
 
 def get_chunking_strategy(strategy_name: str = "default") -> ChunkingStrategy:
     """
     Factory function to get a chunking strategy by name.
     
+    Chunks are capped at the embedding model's token budget
+    (`embedding_max_tokens`).
+    
     Args:
         strategy_name: Name of the strategy ("default", "legal")
         
@@ -293,4 +561,4 @@ def get_chunking_strategy(strategy_name: str = "default") -> ChunkingStrategy:
     }
     
     strategy_class = strategies.get(strategy_name.lower(), SlidingWindowStrategy)
-    return strategy_class()
+    return strategy_class(max_tokens=settings.embedding_max_tokens)
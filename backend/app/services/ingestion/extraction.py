@@ -0,0 +1,333 @@
+"""
+Text extraction for ingested files.
+
+Uploads are spooled to disk and text is extracted lazily, one PDF page or
+text block at a time, so chunking can start before the whole document has
+been read and memory stays flat regardless of file size.
+
+PDF extraction is CPU-bound, so page ranges are extracted in a process pool
+and reassembled in page order by the caller.
+"""
+
+import asyncio
+import codecs
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+# Size of each read when spooling uploads and decoding text files
+BLOCK_SIZE = 1024 * 1024
+
+_pdf_executor: ProcessPoolExecutor | None = None
+
+
+@dataclass
+class SpooledFile:
+    """A file spooled to local disk."""
+
+    path: str
+    size: int
+    sha256: str
+
+    def remove(self) -> None:
+        """Delete the spooled file."""
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_to_disk(
+    blocks: AsyncIterator[bytes],
+    suffix: str = "",
+    spool_dir: str | None = None,
+) -> SpooledFile:
+    """
+    Write an async stream of bytes to a temporary file.
+
+    Args:
+        blocks: Async iterator of byte blocks
+        suffix: File suffix (e.g. ".pdf")
+        spool_dir: Directory for the temporary file (system default if None)
+
+    Returns:
+        SpooledFile pointing to the written file (with its SHA-256)
+    """
+    size = 0
+    digest = hashlib.sha256()
+
+    def write(block: bytes) -> None:
+        spool.write(block)
+        digest.update(block)
+
+    # File I/O runs in worker threads so slow disks don't stall the event loop
+    spool = await asyncio.to_thread(
+        tempfile.NamedTemporaryFile, delete=False, suffix=suffix, dir=spool_dir
+    )
+    try:
+        async for block in blocks:
+            await asyncio.to_thread(write, block)
+            size += len(block)
+        await asyncio.to_thread(spool.close)
+    except BaseException:
+        await asyncio.to_thread(_discard, spool)
+        raise
+
+    logger.debug(f"Spooled {size} bytes to {spool.name}")
+    return SpooledFile(path=spool.name, size=size, sha256=digest.hexdigest())
+
+
+def _discard(spool) -> None:
+    """Close and remove a partially written spool file."""
+    spool.close()
+    os.unlink(spool.name)
+
+
+def is_pdf(filename: str) -> bool:
+    """Check whether a filename refers to a PDF."""
+    return filename.lower().endswith(".pdf")
+
+
+def get_pdf_executor(workers: int = 0) -> ProcessPoolExecutor:
+    """
+    Get the shared process pool used for PDF extraction.
+
+    Args:
+        workers: Number of worker processes (0 = one per CPU). Only used
+            when the pool is first created.
+    """
+    global _pdf_executor
+    if _pdf_executor is None:
+        max_workers = workers or os.cpu_count() or 1
+        # Spawn rather than fork: the API process holds gRPC threads
+        _pdf_executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        logger.info(f"Started PDF extraction pool with {max_workers} workers")
+    return _pdf_executor
+
+
+def shutdown_pdf_executor() -> None:
+    """Shut down the PDF extraction pool, if started."""
+    global _pdf_executor
+    if _pdf_executor is not None:
+        _pdf_executor.shutdown(wait=False, cancel_futures=True)
+        _pdf_executor = None
+
+
+def _pdf_page_count(path: str) -> int:
+    """Count the pages of a PDF (runs in a worker process)."""
+    from pypdf import PdfReader
+
+    try:
+        return len(PdfReader(path).pages)
+    except Exception as e:
+        raise ValueError(f"Invalid or corrupted PDF file: {str(e)}")
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> list[str]:
+    """Extract the text of pages [start, end) of a PDF (runs in a worker process)."""
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(path)
+        return [reader.pages[i].extract_text() for i in range(start, end)]
+    except Exception as e:
+        raise ValueError(f"Invalid or corrupted PDF file (pages {start + 1}-{end}): {str(e)}")
+
+
+def iter_pdf_pages(
+    path: str,
+    workers: int = 0,
+    pages_per_task: int = 16,
+    timeout: float | None = None,
+) -> Iterator[str]:
+    """
+    Extract text from a PDF one page at a time using the process pool.
+
+    Page ranges are extracted in parallel and yielded in page order. At
+    most two ranges per worker are in flight, so memory stays bounded for
+    very large files. This generator blocks while waiting for workers and
+    must not be consumed on the event loop thread.
+
+    Args:
+        path: Path to the PDF file
+        workers: Size of the process pool (0 = one per CPU)
+        pages_per_task: Number of pages extracted per worker task
+        timeout: Maximum seconds for the whole file (None = no limit)
+
+    Yields:
+        Text of each page, followed by a blank line
+
+    Raises:
+        ValueError: If the PDF is invalid or corrupted
+        TimeoutError: If extraction exceeds the timeout
+    """
+    executor = get_pdf_executor(workers)
+    deadline = time.monotonic() + timeout if timeout else None
+    pending: deque[Future] = deque()
+
+    def result(future: Future):
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=remaining)
+        except TimeoutError:
+            future.cancel()
+            for other in pending:
+                other.cancel()
+            logger.error(f"PDF extraction timed out after {timeout}s: {path}")
+            raise TimeoutError(f"PDF extraction timed out after {timeout}s")
+
+    page_count = result(executor.submit(_pdf_page_count, path))
+    ranges = deque(
+        (start, min(start + pages_per_task, page_count))
+        for start in range(0, page_count, max(1, pages_per_task))
+    )
+    max_in_flight = 2 * (workers or os.cpu_count() or 1)
+
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < max_in_flight:
+                pending.append(executor.submit(_extract_pdf_pages, path, *ranges.popleft()))
+
+            for text in result(pending.popleft()):
+                yield text + "\n\n"
+    finally:
+        # Stop queued work if the consumer stops early or fails
+        for future in pending:
+            future.cancel()
+
+
+def detect_text_encoding(path: str, block_size: int = BLOCK_SIZE) -> str:
+    """
+    Detect whether a text file is UTF-8, falling back to latin-1.
+
+    Validates the file incrementally so it is never fully loaded.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        try:
+            while block := f.read(block_size):
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return "latin-1"
+    return "utf-8"
+
+
+def iter_text_blocks(
+    path: str,
+    block_size: int = BLOCK_SIZE,
+    encoding: str | None = None,
+) -> Iterator[str]:
+    """
+    Decode a text file one block at a time.
+
+    Args:
+        path: Path to the text file
+        block_size: Number of bytes to read per block
+        encoding: Known encoding (detected if None)
+
+    Yields:
+        Decoded text blocks (multi-byte characters are never split)
+    """
+    encoding = encoding or detect_text_encoding(path, block_size)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            text = decoder.decode(block)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+
+class _HTMLTextParser(HTMLParser):
+    """Incremental HTML to plain text converter."""
+
+    SKIP_TAGS = {"head", "script", "style", "noscript", "template"}
+    BLOCK_TAGS = {
+        "address", "article", "blockquote", "br", "dd", "div", "dl", "dt", "h1", "h2",
+        "h3", "h4", "h5", "h6", "hr", "li", "ol", "p", "pre", "section", "table", "td",
+        "th", "tr", "ul",
+    }
+    _SPACES = re.compile(r"\s+")
+    _LINE_BREAKS = re.compile(r" *\n[ \n]*")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: list[str] = []
+        self._skip_depth = 0
+        self._line_start = True
+
+    def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data: str) -> None:
+        if not self._skip_depth:
+            self._parts.append(self._SPACES.sub(" ", data))
+
+    def pop_text(self) -> str:
+        """Get the text converted since the last call."""
+        text = self._LINE_BREAKS.sub("\n", "".join(self._parts))
+        self._parts = []
+        # Block boundaries become line starts (legal markers rely on them)
+        if self._line_start:
+            text = text.lstrip(" \n")
+        if text:
+            self._line_start = text.endswith("\n")
+        return text
+
+
+def iter_html_text(
+    path: str,
+    block_size: int = BLOCK_SIZE,
+    encoding: str | None = None,
+) -> Iterator[str]:
+    """
+    Extract the visible text of an HTML file one block at a time.
+
+    Block elements (paragraphs, list items, table cells...) start new
+    lines; scripts, styles and the document head are dropped.
+
+    Args:
+        path: Path to the HTML file
+        block_size: Number of bytes to read per block
+        encoding: Known encoding (detected if None)
+
+    Yields:
+        Text blocks
+    """
+    parser = _HTMLTextParser()
+    for block in iter_text_blocks(path, block_size, encoding):
+        parser.feed(block)
+        text = parser.pop_text()
+        if text:
+            yield text
+    parser.close()
+    tail = parser.pop_text()
+    if tail:
+        yield tail
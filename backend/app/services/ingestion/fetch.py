@@ -0,0 +1,205 @@
+"""
+HTTP fetching for URL ingestion.
+
+All URL fetches share one pooled `httpx.AsyncClient`, so re-syncing many
+sources on the same portal reuses connections. Responses are streamed to
+disk with a size cap, and requests are conditional when validators
+(ETag / Last-Modified) from a previous fetch are known.
+"""
+
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+import httpx
+
+from app.core.config import settings
+from app.services.ingestion.extraction import BLOCK_SIZE, SpooledFile, spool_to_disk
+
+logger = logging.getLogger(__name__)
+
+_http_client: httpx.AsyncClient | None = None
+
+PDF_CONTENT_TYPES = ("application/pdf", "application/x-pdf")
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml")
+TEXT_CONTENT_TYPES = ("application/json", "application/xml")
+TEXT_EXTENSIONS = (".txt", ".md", ".csv", ".xml", ".json")
+
+
+@dataclass
+class FetchResult:
+    """Outcome of a (conditional) URL fetch."""
+
+    url: str  # Final URL, after redirects
+    not_modified: bool
+    spooled: SpooledFile | None = None
+    content_type: str = ""
+    charset: str | None = None
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client used for URL ingestion."""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(settings.url_fetch_timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=settings.url_fetch_max_connections,
+                max_keepalive_connections=settings.url_fetch_max_connections,
+            ),
+            headers={"User-Agent": settings.url_fetch_user_agent},
+            event_hooks={"request": [_check_request_host]},
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client, if created."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def _check_request_host(request: httpx.Request) -> None:
+    """Refuse requests (including redirects) to private network addresses."""
+    if settings.url_fetch_allow_private:
+        return
+
+    host = request.url.host
+    port = request.url.port or (443 if request.url.scheme == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0])
+        if not address.is_global:
+            raise ValueError(f"URL host resolves to a non-public address: {host}")
+
+
+def check_url(url: str) -> None:
+    """
+    Validate a URL before fetching it.
+
+    Raises:
+        ValueError: If the URL is not an absolute http(s) URL
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.netloc:
+        raise ValueError(f"Only absolute http(s) URLs can be ingested: {url}")
+
+
+def url_content_kind(content_type: str, url: str) -> str:
+    """
+    Route a fetched resource to an extractor.
+
+    Args:
+        content_type: Media type of the response (without parameters)
+        url: URL of the resource (its extension is used for generic types)
+
+    Returns:
+        "pdf", "html" or "text"
+
+    Raises:
+        ValueError: If the content type is not supported
+    """
+    extension = os.path.splitext(urlparse(url).path)[1].lower()
+
+    if content_type in PDF_CONTENT_TYPES:
+        return "pdf"
+    if content_type in HTML_CONTENT_TYPES:
+        return "html"
+    if content_type.startswith("text/") or content_type in TEXT_CONTENT_TYPES:
+        return "text"
+
+    # Servers often send files as application/octet-stream
+    if extension == ".pdf":
+        return "pdf"
+    if extension in (".html", ".htm"):
+        return "html"
+    if extension in TEXT_EXTENSIONS:
+        return "text"
+
+    raise ValueError(f"Unsupported content type for URL ingestion: {content_type or 'unknown'}")
+
+
+async def fetch_to_disk(
+    url: str,
+    client: httpx.AsyncClient,
+    etag: str | None = None,
+    last_modified: str | None = None,
+    max_bytes: int | None = None,
+    spool_dir: str | None = None,
+) -> FetchResult:
+    """
+    Download a URL to a temporary file, conditionally if validators are known.
+
+    Args:
+        url: URL to fetch
+        client: HTTP client to use
+        etag: ETag of the previous fetch (sent as If-None-Match)
+        last_modified: Last-Modified of the previous fetch (sent as If-Modified-Since)
+        max_bytes: Maximum size of the (decoded) body (None = no limit)
+        spool_dir: Directory for the temporary file (system default if None)
+
+    Returns:
+        FetchResult; `spooled` is None when the server answered 304
+
+    Raises:
+        ValueError: If the URL is invalid, the server answers with an error
+            or the body exceeds max_bytes
+    """
+    check_url(url)
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    async with client.stream("GET", url, headers=headers) as response:
+        result = FetchResult(
+            url=str(response.url),
+            not_modified=response.status_code == httpx.codes.NOT_MODIFIED,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        if result.not_modified:
+            logger.info(f"Not modified since last fetch: {url}")
+            return result
+
+        if response.is_error:
+            raise ValueError(f"Failed to fetch {url}: HTTP {response.status_code}")
+
+        content_type = response.headers.get("content-type", "")
+        result.content_type = content_type.split(";")[0].strip().lower()
+        result.charset = response.charset_encoding
+
+        length = response.headers.get("content-length")
+        if max_bytes is not None and length and length.isdigit() and int(length) > max_bytes:
+            raise ValueError(f"Content of {url} exceeds {max_bytes} bytes")
+
+        result.spooled = await spool_to_disk(
+            _capped(response.aiter_bytes(BLOCK_SIZE), max_bytes, url),
+            suffix=os.path.splitext(urlparse(result.url).path)[1],
+            spool_dir=spool_dir,
+        )
+
+    logger.info(f"Fetched {result.spooled.size} bytes from {url} ({result.content_type})")
+    return result
+
+
+async def _capped(blocks: AsyncIterator[bytes], max_bytes: int | None, url: str):
+    """Pass blocks through, failing once more than max_bytes were read."""
+    size = 0
+    async for block in blocks:
+        size += len(block)
+        if max_bytes is not None and size > max_bytes:
+            raise ValueError(f"Content of {url} exceeds {max_bytes} bytes")
+        yield block
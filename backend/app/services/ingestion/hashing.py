@@ -0,0 +1,35 @@
+"""
+Content hashing for ingest-time deduplication.
+
+Two levels of content addressing:
+- File hash: SHA-256 of the raw file bytes, used to skip re-extraction
+- Chunk hash: SHA-256 of the normalized chunk text, used to reuse
+  embeddings and skip writes for chunks that are already stored
+"""
+
+import hashlib
+import re
+import unicodedata
+
+from app.services.ingestion.extraction import BLOCK_SIZE
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for hashing (Unicode NFC, collapsed whitespace)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def content_hash(text: str) -> str:
+    """Get the content address of a chunk."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str, block_size: int = BLOCK_SIZE) -> str:
+    """Get the SHA-256 of a file, reading it in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
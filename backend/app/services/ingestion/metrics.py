@@ -0,0 +1,96 @@
+"""
+Ingestion metrics.
+
+Per-document stage timings and sizes are aggregated into histograms and
+counters (scraped from `/metrics`), labelled by source kind and chunking
+strategy so the slow stage can be found for each kind of document.
+Per-batch embedding and storage times are recorded by the pipeline, since
+batches may mix documents.
+"""
+
+from dataclasses import dataclass
+
+from app.core.metrics import SIZE_BUCKETS, Counter, Histogram
+
+# Per-document stages, in pipeline order ("<stage>_ms" keys of `timings`)
+STAGES = ("fetch", "extraction", "chunking", "embedding", "storage", "total")
+
+STAGE_SECONDS = Histogram(
+    "nprocess_ingest_stage_seconds",
+    "Time spent per ingestion stage and document",
+    ("stage", "source", "strategy"),
+)
+BATCH_SECONDS = Histogram(
+    "nprocess_ingest_batch_seconds",
+    "Time spent per pipeline batch and stage",
+    ("stage",),
+)
+DOCUMENT_BYTES = Histogram(
+    "nprocess_ingest_document_bytes",
+    "Source size of ingested documents",
+    ("source",),
+    buckets=SIZE_BUCKETS,
+)
+DOCUMENT_CHUNKS = Histogram(
+    "nprocess_ingest_document_chunks",
+    "Chunks per ingested document",
+    ("source", "strategy"),
+    buckets=SIZE_BUCKETS,
+)
+DOCUMENTS = Counter("nprocess_ingest_documents_total", "Ingested documents", ("source", "strategy"))
+BYTES = Counter("nprocess_ingest_bytes_total", "Source bytes ingested", ("source",))
+PAGES = Counter("nprocess_ingest_pages_total", "PDF pages extracted")
+CHUNKS = Counter("nprocess_ingest_chunks_total", "Chunks created", ("source", "strategy"))
+EMBEDDING_CALLS = Counter("nprocess_ingest_embedding_calls_total", "Embedding requests made by the pipeline")
+EMBEDDING_TOKENS = Counter("nprocess_ingest_embedding_tokens_total", "Estimated tokens sent for embedding")
+WRITES = Counter("nprocess_ingest_writes_total", "Chunk writes to Firestore", ("kind",))
+NEAR_DUPLICATES = Counter(
+    "nprocess_ingest_near_duplicates_total",
+    "Chunks found to nearly duplicate stored chunks",
+    ("action",),
+)
+
+
+@dataclass
+class SourceStats:
+    """Size and extraction cost of a document's source."""
+
+    kind: str = "raw"  # "raw" (text sent inline), "pdf", "html" or "text" (text file)
+    bytes_in: int = 0
+    pages: int = 0
+    extraction_seconds: float = 0.0
+
+
+def source_kind(content_type: str | None) -> str:
+    """Map a document's content type to the `source` metric label."""
+    if not content_type:
+        return "raw"
+    if content_type in ("application/pdf", "application/x-pdf"):
+        return "pdf"
+    if content_type in ("text/html", "application/xhtml+xml"):
+        return "html"
+    return "text"
+
+
+def observe_document(source: str, strategy: str, timings: dict[str, float]) -> None:
+    """
+    Record the stage timings and sizes of one ingested document.
+
+    Args:
+        source: Source kind label (see `SourceStats.kind`)
+        strategy: Chunking strategy name
+        timings: The document's `timings` block (stage `*_ms` and counters)
+    """
+    for stage in STAGES:
+        milliseconds = timings.get(f"{stage}_ms")
+        if milliseconds is not None:
+            STAGE_SECONDS.observe(milliseconds / 1000, stage=stage, source=source, strategy=strategy)
+
+    bytes_in = timings.get("bytes_in", 0)
+    chunks = timings.get("chunks", 0)
+    DOCUMENTS.inc(source=source, strategy=strategy)
+    BYTES.inc(bytes_in, source=source)
+    PAGES.inc(timings.get("pages", 0))
+    CHUNKS.inc(chunks, source=source, strategy=strategy)
+    DOCUMENT_BYTES.observe(bytes_in, source=source)
+    DOCUMENT_CHUNKS.observe(chunks, source=source, strategy=strategy)
@@ -0,0 +1,165 @@
+"""
+MinHash signatures and LSH bands for near-duplicate detection.
+
+The same law often arrives from several sources with small formatting
+differences, which exact content hashing misses. Texts are folded (case,
+accents, punctuation) and split into word shingles; two texts are near
+duplicates when the Jaccard similarity of their shingle sets is high.
+
+Signatures use one-permutation hashing: each shingle is hashed once and
+its hash picks a bin, keeping the minimum per bin. For LSH this is as good
+as one hash function per bin but costs one hash per shingle instead of
+one per shingle and bin, which matters in pure Python. Bins left empty by
+short texts are filled by densification.
+
+Raw (not yet densified) signatures of parts merge by elementwise minimum,
+so a document's signature is built from its chunks without a second pass.
+"""
+
+import hashlib
+import re
+import unicodedata
+from functools import lru_cache
+
+from app.core.config import settings
+
+# Marks an empty bin (also the largest value Firestore stores as an integer)
+EMPTY = (1 << 63) - 1
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def _hash64(text: str) -> int:
+    """Stable 63-bit hash of a string."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little") >> 1
+
+
+def fold_tokens(text: str) -> list[str]:
+    """Split text into words, ignoring case, accents and punctuation."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _TOKEN_PATTERN.findall(stripped.casefold())
+
+
+class MinHashLSH:
+    """
+    MinHash signatures with banded locality-sensitive hashing.
+
+    A signature has `bands * rows` bins. Two texts share at least one band
+    hash with probability 1 - (1 - s^rows)^bands for similarity s, so the
+    band layout sets where candidates start to be found; candidates are
+    then checked against `threshold` with the full signatures.
+    """
+
+    def __init__(
+        self,
+        bands: int = 16,
+        rows: int = 8,
+        shingle_size: int = 3,
+        min_shingles: int = 8,
+        threshold: float = 0.9,
+    ):
+        """
+        Initialize the index parameters.
+
+        Args:
+            bands: Number of LSH bands (at most 30, the Firestore limit for
+                array-contains-any queries)
+            rows: Bins per band
+            shingle_size: Words per shingle
+            min_shingles: Texts with fewer shingles get no signature (short
+                boilerplate such as "Art. 5º (VETADO)." is not compared)
+            threshold: Minimum estimated similarity of near duplicates
+        """
+        self.bands = min(max(1, bands), 30)
+        self.rows = max(1, rows)
+        self.shingle_size = max(1, shingle_size)
+        self.min_shingles = max(1, min_shingles)
+        self.threshold = threshold
+
+    @property
+    def num_bins(self) -> int:
+        """Number of bins of a signature."""
+        return self.bands * self.rows
+
+    def raw_signature(self, text: str) -> list[int] | None:
+        """
+        Compute the raw (mergeable) signature of a text.
+
+        Returns:
+            Per-bin minimum hashes (EMPTY for empty bins), or None if the
+            text is too short to compare
+        """
+        tokens = fold_tokens(text)
+        size = self.shingle_size
+        shingles = {" ".join(tokens[i:i + size]) for i in range(max(1, len(tokens) - size + 1))}
+        if len(shingles) < self.min_shingles:
+            return None
+
+        num_bins = self.num_bins
+        bins = [EMPTY] * num_bins
+        for shingle in shingles:
+            value, index = divmod(_hash64(shingle), num_bins)
+            if value < bins[index]:
+                bins[index] = value
+        return bins
+
+    @staticmethod
+    def merge(a: list[int] | None, b: list[int] | None) -> list[int] | None:
+        """Merge two raw signatures (signature of the union of the texts)."""
+        if a is None:
+            return b
+        if b is None:
+            return a
+        return list(map(min, a, b))
+
+    def signature(self, raw: list[int]) -> list[int]:
+        """
+        Densify a raw signature.
+
+        Each empty bin takes the value of the next non-empty bin (to the
+        right, wrapping around) combined with its distance, so texts with
+        the same shingles fill empty bins the same way.
+        """
+        num_bins = len(raw)
+        filled = list(raw)
+        for i, value in enumerate(raw):
+            if value != EMPTY:
+                continue
+            distance = 1
+            while raw[(i + distance) % num_bins] == EMPTY:
+                distance += 1
+            filled[i] = _hash64(f"{raw[(i + distance) % num_bins]}:{distance}")
+        return filled
+
+    def band_hashes(self, signature: list[int]) -> list[str]:
+        """
+        Get the LSH band hashes of a signature.
+
+        Returns:
+            One "<band>:<hash>" string per band, for array-contains-any lookups
+        """
+        rows = self.rows
+        return [
+            f"{band}:{hashlib.blake2b(repr(signature[band * rows:(band + 1) * rows]).encode(), digest_size=8).hexdigest()}"
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(a: list[int], b: list[int]) -> float:
+        """Estimate the Jaccard similarity of two densified signatures."""
+        if not a or len(a) != len(b):
+            return 0.0
+        return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+@lru_cache
+def get_minhash_lsh() -> MinHashLSH:
+    """Get the near-duplicate index parameters from settings."""
+    return MinHashLSH(
+        bands=settings.near_dedupe_bands,
+        rows=settings.near_dedupe_rows,
+        shingle_size=settings.near_dedupe_shingle_size,
+        min_shingles=settings.near_dedupe_min_shingles,
+        threshold=settings.near_dedupe_threshold,
+    )
@@ -0,0 +1,477 @@
+"""
+Embedding and storage pipeline for document ingestion.
+
+Chunks are grouped into batches of at most `batch_size` chunks and
+`batch_max_tokens` estimated tokens (the embedding model's per-request
+limit). Each batch is embedded with a single `embed_batch` call and
+stored as soon as its vectors are ready, so storage of one batch overlaps
+with embedding of the next. A semaphore bounds how many batches are in
+flight at any time.
+
+With deduplication enabled, chunks are content-addressed: a chunk already
+stored in the same scope (tenant or marketplace) is linked to the new
+document instead of being embedded and written again, and embeddings of
+marketplace chunks are reused for identical private chunks.
+
+With near-duplicate detection enabled, chunks also get a MinHash
+signature. Stored chunks of other documents whose estimated similarity is
+above the threshold are either recorded on the new chunk ("flag") or
+linked in its place like an exact duplicate ("skip").
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import asdict, dataclass
+
+from app.services.ai.tokens import estimate_tokens
+from app.services.ingestion import metrics
+from app.services.ingestion.chunking import Chunk
+from app.services.ingestion.hashing import content_hash
+from app.services.ingestion.minhash import MinHashLSH
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestProgress:
+    """Live counters of a running ingestion (e.g. for job status polling)."""
+
+    pages_extracted: int = 0
+    chunks_created: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        """Get the counters as a dict."""
+        return asdict(self)
+
+
+class IngestPipeline:
+    """
+    Batched embed → store pipeline with bounded concurrency.
+
+    Usage:
+        pipeline = IngestPipeline(embedding_service, knowledge_service)
+        for chunk in chunks:
+            await pipeline.put(chunk, doc_type, tenant_id)
+        chunk_ids = await pipeline.join()
+    """
+
+    def __init__(
+        self,
+        embedding_service=None,
+        knowledge_service=None,
+        batch_size: int = 100,
+        batch_max_tokens: int | None = None,
+        max_concurrency: int = 4,
+        bulk_writes: bool = True,
+        dedupe: bool = False,
+        near_dedupe: str = "off",
+        lsh: MinHashLSH | None = None,
+        progress: IngestProgress | None = None,
+    ):
+        """
+        Initialize the pipeline.
+
+        Args:
+            embedding_service: Service for generating embeddings
+            knowledge_service: Service for storing chunks
+            batch_size: Number of chunks per embedding batch
+            batch_max_tokens: Estimated tokens per embedding batch (None =
+                no limit); a batch is dispatched before it would exceed it
+            max_concurrency: Maximum number of batches in flight
+            bulk_writes: Store each batch with one `store_chunks_bulk` call
+                instead of one `store_chunk` call per chunk
+            dedupe: Reuse chunks and embeddings that are already stored
+            near_dedupe: Near-duplicate handling: "off", "flag" or "skip"
+            lsh: MinHash parameters for near-duplicate detection
+            progress: Counters to update as batches are embedded and stored
+        """
+        self.embedding_service = embedding_service
+        self.knowledge_service = knowledge_service
+        self.batch_size = max(1, batch_size)
+        self.batch_max_tokens = batch_max_tokens
+        self.bulk_writes = bulk_writes
+        self.dedupe = dedupe and knowledge_service is not None
+        self.lsh = lsh
+        self.near_dedupe = near_dedupe if lsh is not None and knowledge_service is not None else "off"
+        self.progress = progress or IngestProgress()
+
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._buffer: list[tuple[Chunk, str, str | None, list[int] | None]] = []
+        self._buffer_tokens = 0
+        self._tasks: list[asyncio.Task] = []
+        self._started_at: float | None = None
+
+        # Cumulative busy time per stage (stages overlap, so these may
+        # add up to more than the wall-clock time of the pipeline)
+        self.embedding_seconds = 0.0
+        self.storage_seconds = 0.0
+        self.near_dedupe_seconds = 0.0
+        self.wall_seconds = 0.0
+
+        # Chunks embedded by this pipeline vs. served from existing content
+        self.chunks_new = 0
+        self.chunks_reused = 0
+        self.chunks_near_duplicate = 0
+
+        # Work done against the embedding model and Firestore
+        self.embedding_calls = 0
+        self.embedding_tokens = 0
+        self.writes = 0
+
+    async def put(
+        self,
+        chunk: Chunk,
+        doc_type: str,
+        tenant_id: str | None,
+        signature: list[int] | None = None,
+    ) -> None:
+        """
+        Add a chunk to the pipeline.
+
+        Dispatches a batch once the buffer is full. Blocks while the
+        maximum number of batches is already in flight.
+
+        Args:
+            chunk: Chunk to embed and store
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            signature: Raw MinHash signature of the chunk, if already
+                computed (computed by the batch otherwise)
+        """
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+
+        if self.batch_max_tokens:
+            tokens = estimate_tokens(chunk.content)
+            if self._buffer and self._buffer_tokens + tokens > self.batch_max_tokens:
+                await self._dispatch()
+            self._buffer_tokens += tokens
+
+        self._buffer.append((chunk, doc_type, tenant_id, signature))
+        if len(self._buffer) >= self.batch_size:
+            await self._dispatch()
+
+    async def join(self) -> list[str]:
+        """
+        Flush pending chunks and wait for all batches to finish.
+
+        Returns:
+            IDs of the stored chunks, in submission order
+        """
+        if self._buffer:
+            await self._dispatch()
+
+        try:
+            results = await asyncio.gather(*self._tasks)
+        except Exception:
+            self.cancel()
+            raise
+
+        if self._started_at is not None:
+            self.wall_seconds = time.perf_counter() - self._started_at
+
+        return [chunk_id for batch_ids in results for chunk_id in batch_ids]
+
+    async def drain(self) -> None:
+        """
+        Flush pending chunks and wait for all batches to finish.
+
+        Unlike `join`, failed batches do not raise; check them with
+        `batches_error`.
+        """
+        if self._buffer:
+            await self._dispatch()
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+
+        if self._started_at is not None:
+            self.wall_seconds = time.perf_counter() - self._started_at
+
+    def position(self) -> tuple[int, int]:
+        """
+        Get the batch position of the pipeline.
+
+        Returns:
+            Tuple of (index of the batch the next chunk joins, number of
+            batches holding the chunks put so far). Taken before and after
+            putting a document's chunks, these bound the batches it spans.
+        """
+        return len(self._tasks), len(self._tasks) + (1 if self._buffer else 0)
+
+    def batches_done(self, start: int, end: int) -> bool:
+        """Check whether batches [start, end) have all been dispatched and finished."""
+        return len(self._tasks) >= end and all(task.done() for task in self._tasks[start:end])
+
+    def batches_error(self, start: int, end: int) -> BaseException | None:
+        """Get the first error of the finished batches in [start, end), if any."""
+        for task in self._tasks[start:end]:
+            if task.done() and (task.cancelled() or task.exception()):
+                return task.exception() if not task.cancelled() else asyncio.CancelledError()
+        return None
+
+    def cancel(self) -> None:
+        """Cancel all batches still in flight."""
+        self._buffer = []
+        self._buffer_tokens = 0
+        for task in self._tasks:
+            task.cancel()
+
+    def timings(self) -> dict[str, float]:
+        """Get stage timings in milliseconds."""
+        return {
+            "embedding_ms": round(self.embedding_seconds * 1000, 2),
+            "storage_ms": round(self.storage_seconds * 1000, 2),
+            "near_dedupe_ms": round(self.near_dedupe_seconds * 1000, 2),
+            "pipeline_ms": round(self.wall_seconds * 1000, 2),
+        }
+
+    def counters(self) -> dict[str, int]:
+        """Get the embedding calls, estimated tokens embedded, chunk writes and near duplicates."""
+        return {
+            "embedding_calls": self.embedding_calls,
+            "embedding_tokens": self.embedding_tokens,
+            "writes": self.writes,
+            "near_duplicates": self.chunks_near_duplicate,
+        }
+
+    async def _dispatch(self) -> None:
+        """Start processing the buffered batch."""
+        batch, self._buffer = self._buffer, []
+        self._buffer_tokens = 0
+        await self._semaphore.acquire()
+        self._tasks.append(asyncio.create_task(self._process_batch(batch)))
+
+    async def _process_batch(self, batch: list[tuple[Chunk, str, str | None, list[int] | None]]) -> list[str]:
+        """Embed and store a single batch."""
+        try:
+            hashes = [content_hash(chunk.content) for chunk, *_ in batch]
+
+            # Chunks already stored in the same scope: (index -> chunk ID);
+            # embeddings known up front: (content hash -> vector)
+            linked: dict[int, str] = {}
+            embeddings: dict[str, list[float]] = {}
+            if self.dedupe:
+                linked, embeddings = await self._lookup_existing(batch, hashes)
+
+            # Near duplicates of stored chunks (index -> chunk ID, document
+            # ID and similarity); skipped ones are linked like exact ones
+            bands: dict[int, list[str]] = {}
+            near: dict[int, dict] = {}
+            if self.near_dedupe != "off":
+                start = time.perf_counter()
+                bands, near = await self._lookup_near_duplicates(batch, linked)
+                elapsed = time.perf_counter() - start
+                self.near_dedupe_seconds += elapsed
+                self.chunks_near_duplicate += len(near)
+                metrics.BATCH_SECONDS.observe(elapsed, stage="near_dedupe")
+                metrics.NEAR_DUPLICATES.inc(len(near), action=self.near_dedupe)
+                if self.near_dedupe == "skip":
+                    linked.update((i, found["chunk_id"]) for i, found in near.items())
+
+            # Embed each distinct new content once
+            to_embed = {}
+            for i, (chunk, *_) in enumerate(batch):
+                if i not in linked and hashes[i] not in embeddings:
+                    to_embed.setdefault(hashes[i], chunk.content)
+
+            if self.embedding_service and to_embed:
+                texts = list(to_embed.values())
+                start = time.perf_counter()
+                vectors = await self.embedding_service.embed_batch(texts)
+                elapsed = time.perf_counter() - start
+                embeddings.update(zip(to_embed.keys(), vectors))
+
+                tokens = sum(estimate_tokens(text) for text in texts)
+                self.embedding_seconds += elapsed
+                self.embedding_calls += 1
+                self.embedding_tokens += tokens
+                metrics.BATCH_SECONDS.observe(elapsed, stage="embedding")
+                metrics.EMBEDDING_CALLS.inc()
+                metrics.EMBEDDING_TOKENS.inc(tokens)
+
+            self.chunks_new += len(to_embed)
+            self.chunks_reused += len(batch) - len(to_embed)
+            self.progress.chunks_embedded += len(batch)
+
+            # Chunks are stored with their own metadata and a reference to
+            # their document; document metadata lives on the document record
+            chunk_ids = [linked.get(i) for i in range(len(batch))]
+            if self.knowledge_service:
+                start = time.perf_counter()
+
+                if linked:
+                    await self.knowledge_service.link_chunks([
+                        (chunk_id, batch[i][0].metadata.get("source_doc_id"))
+                        for i, chunk_id in linked.items()
+                    ])
+
+                new_indexes = [i for i in range(len(batch)) if i not in linked]
+                if self.bulk_writes:
+                    new_ids = await self.knowledge_service.store_chunks_bulk([
+                        {
+                            "content": batch[i][0].content,
+                            "embedding": embeddings.get(hashes[i]),
+                            "doc_type": batch[i][1],
+                            "tenant_id": batch[i][2],
+                            "metadata": batch[i][0].own_metadata,
+                            "content_hash": hashes[i],
+                            "chunk_index": batch[i][0].index,
+                            "doc_id": batch[i][0].metadata.get("source_doc_id"),
+                            "lsh_bands": bands.get(i),
+                            "near_duplicate_of": near.get(i),
+                        }
+                        for i in new_indexes
+                    ])
+                else:
+                    new_ids = []
+                    for i in new_indexes:
+                        chunk, doc_type, tenant_id, _ = batch[i]
+                        chunk_id = await self.knowledge_service.store_chunk(
+                            content=chunk.content,
+                            embedding=embeddings.get(hashes[i]),
+                            doc_type=doc_type,
+                            tenant_id=tenant_id,
+                            metadata=chunk.own_metadata,
+                            content_hash=hashes[i],
+                            chunk_index=chunk.index,
+                            doc_id=chunk.metadata.get("source_doc_id"),
+                            lsh_bands=bands.get(i),
+                            near_duplicate_of=near.get(i),
+                        )
+                        new_ids.append(chunk_id)
+
+                for i, chunk_id in zip(new_indexes, new_ids):
+                    chunk_ids[i] = chunk_id
+                elapsed = time.perf_counter() - start
+                self.storage_seconds += elapsed
+                self.writes += len(batch)
+                self.progress.chunks_stored += len(batch)
+                metrics.BATCH_SECONDS.observe(elapsed, stage="storage")
+                metrics.WRITES.inc(len(new_indexes), kind="chunk")
+                metrics.WRITES.inc(len(linked), kind="link")
+
+            logger.debug(f"Pipeline batch of {len(batch)} chunks done ({len(linked)} linked)")
+            return [chunk_id for chunk_id in chunk_ids if chunk_id is not None]
+        finally:
+            self._semaphore.release()
+
+    async def _lookup_existing(
+        self,
+        batch: list[tuple[Chunk, str, str | None, list[int] | None]],
+        hashes: list[str],
+    ) -> tuple[dict[int, str], dict[str, list[float]]]:
+        """
+        Find content of a batch that is already stored.
+
+        Returns:
+            Tuple of (batch index -> existing chunk ID in the same scope,
+            content hash -> reusable embedding)
+        """
+        scopes: dict[tuple[str, str | None], list[int]] = {}
+        for i, (_, doc_type, tenant_id, _) in enumerate(batch):
+            scopes.setdefault((doc_type, tenant_id), []).append(i)
+
+        linked: dict[int, str] = {}
+        embeddings: dict[str, list[float]] = {}
+
+        for (doc_type, tenant_id), indexes in scopes.items():
+            scope_hashes = [hashes[i] for i in indexes]
+            found = await self.knowledge_service.find_chunks_by_hash(
+                scope_hashes, doc_type, tenant_id
+            )
+            for i in indexes:
+                if hashes[i] in found:
+                    linked[i] = found[hashes[i]]["id"]
+
+            # Private documents can reuse embeddings of marketplace content
+            if doc_type == "private":
+                missing = [h for h in scope_hashes if h not in found]
+                if missing:
+                    found.update(await self.knowledge_service.find_chunks_by_hash(
+                        missing, "marketplace", None
+                    ))
+
+            for content_address, existing in found.items():
+                if existing["embedding"]:
+                    embeddings[content_address] = existing["embedding"]
+
+        return linked, embeddings
+
+    async def _lookup_near_duplicates(
+        self,
+        batch: list[tuple[Chunk, str, str | None, list[int] | None]],
+        linked: dict[int, str],
+    ) -> tuple[dict[int, list[str]], dict[int, dict]]:
+        """
+        Find stored near duplicates of the chunks of a batch.
+
+        Candidates sharing an LSH band are verified by recomputing their
+        signature from their content; chunks of the same document are not
+        considered duplicates of each other.
+
+        Lookup errors are logged and yield no near duplicates, so ingestion
+        continues without near dedupe.
+
+        Returns:
+            Tuple of (batch index -> LSH band hashes of the chunk, batch
+            index -> {"chunk_id", "doc_id", "similarity"} of the most
+            similar stored chunk above the threshold)
+        """
+        lsh = self.lsh
+        indexes = [i for i in range(len(batch)) if i not in linked]
+
+        def sign() -> dict[int, list[int]]:
+            signatures = {}
+            for i in indexes:
+                chunk, _, _, raw = batch[i]
+                if raw is None:
+                    raw = lsh.raw_signature(chunk.content)
+                if raw is not None:
+                    signatures[i] = lsh.signature(raw)
+            return signatures
+
+        signatures = await asyncio.to_thread(sign)
+        bands = {i: lsh.band_hashes(signature) for i, signature in signatures.items()}
+
+        try:
+            candidates = await asyncio.gather(*(
+                self.knowledge_service.find_near_duplicate_chunks(bands[i], batch[i][1], batch[i][2])
+                for i in signatures
+            ))
+        except Exception as e:
+            # Near dedupe is best effort: the batch is stored without it
+            logger.warning(f"Near-duplicate lookup failed, skipping it for {len(signatures)} chunks: {e}")
+            return bands, {}
+
+        def verify() -> dict[int, dict]:
+            near = {}
+            candidate_signatures: dict[str, list[int] | None] = {}
+            for i, found in zip(signatures, candidates):
+                doc_id = batch[i][0].metadata.get("source_doc_id")
+                best = None
+                for candidate in found:
+                    if candidate["doc_id"] == doc_id:
+                        continue
+                    if candidate["id"] not in candidate_signatures:
+                        raw = lsh.raw_signature(candidate["content"])
+                        candidate_signatures[candidate["id"]] = lsh.signature(raw) if raw else None
+                    signature = candidate_signatures[candidate["id"]]
+                    if signature is None:
+                        continue
+
+                    similarity = lsh.similarity(signatures[i], signature)
+                    if similarity >= lsh.threshold and (best is None or similarity > best["similarity"]):
+                        best = {
+                            "chunk_id": candidate["id"],
+                            "doc_id": candidate["doc_id"],
+                            "similarity": round(similarity, 4),
+                        }
+                if best:
+                    near[i] = best
+            return near
+
+        near = await asyncio.to_thread(verify) if any(candidates) else {}
+        return bands, near
@@ -0,0 +1,132 @@
+"""
+Cross-references between legal provisions.
+
+Brazilian statutes cite other provisions inline ("nos termos do art. 7º",
+"§ 2º do art. 11", "art. 5º da Lei nº 13.709, de 2018"). References are
+extracted at article granularity and keyed as "<law>:<article>", where
+<law> is a normalized law name ("lgpd", "lei-13709") or, for documents
+without a `law` in their metadata, the document ID.
+
+The legal chunker stores each chunk's own provision key and the keys it
+references in the chunk metadata, which turns the chunk collection into
+an adjacency index: the chunks of a referenced provision are found with
+an equality lookup instead of another vector search.
+"""
+
+import re
+import unicodedata
+
+_NUMBER = r"\d+(?:\.\d{3})*"
+_ORDINAL = r"(?:[º°ª]|o\b)?"
+
+# Law names that are cited in several ways
+_LAW_ALIASES = {
+    "cf": "constituicao-federal",
+    "cf-88": "constituicao-federal",
+    "constituicao": "constituicao-federal",
+}
+
+# An article citation ("art. 7º", "arts. 7º e 8º", "artigos 7 a 10"),
+# optionally followed by the units cited inside it and by the law
+REFERENCE_PATTERN = re.compile(
+    rf"\b(?i:art(?:igo)?s?)\.?\s*"
+    rf"(?P<articles>{_NUMBER}{_ORDINAL}(?:\s*(?:,|\be\b|\ba\b|\bou\b)\s*{_NUMBER}{_ORDINAL}(?![\d.]))*)"
+    rf"(?:\s*,?\s*(?:§+\s*\d+{_ORDINAL}|(?i:inciso)\s+[IVXLCDM]+|(?i:al[íi]nea)\s+\"?[a-z]\"?"
+    rf"|(?i:caput)|(?i:par[áa]grafo\s+[úu]nico)))*"
+    rf"(?:\s*,?\s*(?i:d[ao]s?|desta|nesta|na|no)\s+(?P<law>"
+    rf"(?i:lei(?:\s+complementar)?|decreto(?:-lei)?|medida\s+provis[óo]ria|resolu[çc][ãa]o"
+    rf"|instru[çc][ãa]o\s+normativa)(?:\s*(?i:n)?[º°o.]*\s*{_NUMBER}(?:/\d{{2,4}})?)?"
+    rf"|(?i:constitui[çc][ãa]o(?:\s+federal)?)"
+    rf"|[A-Z]{{2,}}(?:/\d{{2,4}})?\b"
+    rf"))?"
+)
+_LAW_KIND_PATTERN = re.compile(
+    r"lei(?:\s+complementar)?|decreto(?:-lei)?|medida\s+provis[óo]ria|resolu[çc][ãa]o|instru[çc][ãa]o\s+normativa",
+    re.IGNORECASE,
+)
+_ARTICLE_LIST_PATTERN = re.compile(rf"(?P<number>{_NUMBER})|(?P<range>\ba\b)")
+
+# Longest article range expanded ("arts. 7º a 10")
+MAX_RANGE = 50
+
+
+def law_key(name: str) -> str:
+    """
+    Normalize a law name to an index key.
+
+    "Lei nº 13.709, de 14 de agosto de 2018" and "Lei 13.709/2018" both
+    become "lei-13709"; "LGPD" becomes "lgpd".
+    """
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    text = re.split(r",|\s+de\s+\d", text)[0]
+    text = re.sub(r"/\d{2,4}\b", "", text)
+    text = re.sub(r"\bn[o.]*\s*(?=\d)", "", text)
+    text = re.sub(r"(?<=\d)\.(?=\d{3})", "", text)
+    key = "-".join(re.findall(r"[a-z0-9]+", text))
+    return _LAW_ALIASES.get(key, key)
+
+
+def document_law(metadata: dict) -> str | None:
+    """Get the law key of a document: its `law` metadata, or its document ID."""
+    law = metadata.get("law")
+    if law:
+        return law_key(str(law))
+    return metadata.get("source_doc_id")
+
+
+def provision_key(law: str, article: str) -> str:
+    """Build the index key of an article of a law."""
+    return f"{law}:{article}"
+
+
+def extract_references(text: str, law: str | None) -> list[str]:
+    """
+    Get the provisions cited in a text.
+
+    Args:
+        text: Legal text (e.g. one chunk)
+        law: Key of the text's own law; citations that name no other law
+            ("nos termos do art. 7º", "art. 7º desta Lei") refer to it, and
+            are dropped if it is None
+
+    Returns:
+        Provision keys in order of first citation, without duplicates
+    """
+    references: dict[str, None] = {}
+    for match in REFERENCE_PATTERN.finditer(text):
+        target = _cited_law(match.group("law")) or law
+        if not target:
+            continue
+
+        for article in _parse_articles(match.group("articles")):
+            references[provision_key(target, article)] = None
+    return list(references)
+
+
+def _cited_law(name: str | None) -> str | None:
+    """Get the key of the law named by a citation, or None for the citing law ("desta Lei")."""
+    if not name:
+        return None
+    if not any(c.isdigit() for c in name) and _LAW_KIND_PATTERN.fullmatch(name):
+        return None
+    return law_key(name)
+
+
+def _parse_articles(articles: str) -> list[str]:
+    """Expand an article list ("7º, 8º e 10 a 12") to article labels."""
+    labels: list[str] = []
+    in_range = False
+    for match in _ARTICLE_LIST_PATTERN.finditer(articles):
+        if match.group("range"):
+            in_range = bool(labels)
+            continue
+
+        number = int(match.group("number").replace(".", ""))
+        if in_range:
+            start = int(labels[-1]) + 1
+            labels.extend(str(n) for n in range(start, min(number, start + MAX_RANGE - 1) + 1))
+            in_range = False
+        else:
+            labels.append(str(number))
+    return labels
@@ -2,17 +2,45 @@
 Ingestion service for processing documents.
 
 Orchestrates the document ingestion pipeline:
-1. Receive document (text, URL, or file)
-2. Apply chunking strategy
-3. Generate embeddings for each chunk
-4. Store in Firestore with tenant isolation
+1. Receive document (text, URL, or file); files are extracted page by page,
+   URLs are fetched conditionally so unchanged sources are skipped
+2. Apply chunking strategy (incrementally for streamed files)
+3. Generate embeddings in batches (bounded concurrency), reusing
+   embeddings of content that is already stored
+4. Store each embedded batch in Firestore with tenant isolation
+
+Near-duplicate chunks and documents (MinHash/LSH) are flagged, or near
+duplicate chunks skipped, according to `near_dedupe_action`.
 """
 
+import asyncio
+import functools
 import logging
+import os
+import time
 import uuid
+from collections import deque
+from collections.abc import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator
 from datetime import datetime
+from urllib.parse import urlparse
 
-from app.services.ingestion.chunking import ChunkingStrategy, get_chunking_strategy
+from app.core.config import settings
+from app.core.metrics import log_event
+from app.services.ingestion import metrics
+from app.services.ingestion.bulk import BulkItem
+from app.services.ingestion.chunking import Chunk, ChunkingStrategy, get_chunking_strategy
+from app.services.ingestion.extraction import (
+    is_pdf,
+    iter_html_text,
+    iter_pdf_pages,
+    iter_text_blocks,
+    spool_to_disk,
+)
+from app.services.ingestion.fetch import fetch_to_disk, get_http_client, url_content_kind
+from app.services.ingestion.hashing import content_hash
+from app.services.ingestion.hashing import file_hash as compute_file_hash
+from app.services.ingestion.minhash import MinHashLSH, get_minhash_lsh
+from app.services.ingestion.pipeline import IngestPipeline, IngestProgress
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +56,7 @@ class IngestionService:
         self,
         embedding_service=None,
         knowledge_service=None,
+        http_client=None,
     ):
         """
         Initialize ingestion service.
@@ -35,9 +64,12 @@ class IngestionService:
         Args:
             embedding_service: Service for generating embeddings
             knowledge_service: Service for storing/retrieving knowledge
+            http_client: httpx.AsyncClient for URL ingestion (shared pooled
+                client if None)
         """
         self.embedding_service = embedding_service
         self.knowledge_service = knowledge_service
+        self.http_client = http_client
     
     async def ingest_text(
         self,
@@ -46,6 +78,7 @@ class IngestionService:
         strategy: str = "default",
         doc_type: str = "private",
         metadata: dict | None = None,
+        progress: IngestProgress | None = None,
     ) -> dict:
         """
         Ingest raw text content.
@@ -56,60 +89,199 @@ class IngestionService:
             strategy: Chunking strategy ("default" or "legal")
             doc_type: Type of document ("private" or "marketplace")
             metadata: Optional metadata to attach
+            progress: Optional counters updated while the ingestion runs
             
         Returns:
             Dict with ingestion results (doc_id, chunk_count, etc.)
         """
-        # Generate document ID
-        doc_id = str(uuid.uuid4())
-        created_at = datetime.utcnow()
+        return await self._ingest(
+            lambda chunker, base_metadata: chunker.chunk(content, base_metadata),
+            tenant_id=tenant_id,
+            strategy=strategy,
+            doc_type=doc_type,
+            metadata=metadata,
+            progress=progress,
+            source=metrics.SourceStats(bytes_in=len(content.encode("utf-8"))),
+        )
+    
+    async def update_document(
+        self,
+        doc_id: str,
+        content: str,
+        tenant_id: str,
+        strategy: str = "default",
+        doc_type: str = "private",
+        metadata: dict | None = None,
+    ) -> dict:
+        """
+        Update a stored document in place with a new version of its text.
         
-        logger.info(f"Starting ingestion for doc {doc_id}, strategy={strategy}")
+        The new text is re-chunked with the given strategy and diffed
+        against the stored chunks by content hash and position:
+        - unchanged chunks are kept as they are
+        - chunks whose content moved keep their embedding and only get
+          their position and metadata updated; chunks shared with other
+          documents are left in place and copied (with their embedding)
+          into a chunk of this document instead
+        - new chunks are embedded and written
+        - chunks no longer present are tombstoned
         
-        # Get chunking strategy
-        chunker: ChunkingStrategy = get_chunking_strategy(strategy)
+        Args:
+            doc_id: ID of the document to update
+            content: New raw text of the document
+            tenant_id: ID of the tenant (for private docs)
+            strategy: Chunking strategy (should match the original one)
+            doc_type: Type of document ("private" or "marketplace")
+            metadata: Optional metadata to attach
+            
+        Returns:
+            Dict with update results (chunk counts per diff outcome)
+            
+        Raises:
+            LookupError: If the document does not exist for this tenant
+        """
+        if not self.knowledge_service:
+            raise RuntimeError("Updating documents requires a knowledge service")
         
-        # Chunk the document
+        owner_tenant_id = tenant_id if doc_type == "private" else None
+        stored = await self.knowledge_service.get_document_chunks(doc_id, owner_tenant_id)
+        stored = [chunk for chunk in stored if chunk["type"] == doc_type]
+        if not stored:
+            raise LookupError(f"Document {doc_id} not found")
+        
+        updated_at = datetime.utcnow()
+        logger.info(f"Starting incremental update for doc {doc_id}, strategy={strategy}")
+        
+        # Legacy documents have no record: their chunks carry the metadata
+        record = await self.knowledge_service.get_document(doc_id, doc_type, owner_tenant_id)
+        ingested_at = (record or stored[0])["metadata"].get("ingested_at", updated_at.isoformat())
+        
+        chunker: ChunkingStrategy = get_chunking_strategy(strategy)
         base_metadata = {
             "source_doc_id": doc_id,
             "doc_type": doc_type,
-            "ingested_at": created_at.isoformat(),
+            "ingested_at": ingested_at,
             **(metadata or {}),
         }
         
-        chunks = chunker.chunk(content, base_metadata)
-        logger.info(f"Document {doc_id} split into {len(chunks)} chunks using {chunker.name}")
+        start = time.perf_counter()
+        chunks = await asyncio.to_thread(chunker.chunk, content, base_metadata)
+        chunking_seconds = time.perf_counter() - start
         
-        # Generate embeddings if service available
-        if self.embedding_service:
-            for chunk in chunks:
-                embedding = await self.embedding_service.embed(chunk.content)
-                chunk.metadata["embedding"] = embedding
+        # Index stored chunks by content hash (legacy chunks have none stored)
+        stored_by_hash: dict[str, list[dict]] = {}
+        for chunk in stored:
+            chunk_hash = chunk["content_hash"] or content_hash(chunk["content"])
+            stored_by_hash.setdefault(chunk_hash, []).append(chunk)
         
-        # Store chunks if knowledge service available
-        stored_chunks = []
-        if self.knowledge_service:
-            for chunk in chunks:
-                chunk_id = await self.knowledge_service.store_chunk(
-                    content=chunk.content,
-                    embedding=chunk.metadata.get("embedding"),
-                    doc_type=doc_type,
-                    tenant_id=tenant_id if doc_type == "private" else None,
-                    metadata=chunk.metadata,
-                )
-                stored_chunks.append(chunk_id)
+        unchanged = 0
+        moves = []
+        copies = []
+        new_chunks = []
+        for chunk in chunks:
+            candidates = stored_by_hash.get(content_hash(chunk.content))
+            if not candidates:
+                new_chunks.append(chunk)
+                continue
+            
+            # Prefer the stored chunk at the same position
+            match = next(
+                (c for c in candidates if c["chunk_index"] == chunk.index),
+                candidates[0],
+            )
+            candidates.remove(match)
+            
+            # Legacy chunks store the document metadata too, so they are
+            # always rewritten to the compact schema
+            if match["chunk_index"] == chunk.index and match["metadata"] == chunk.own_metadata:
+                unchanged += 1
+            elif any(other != doc_id for other in match["doc_ids"]):
+                copies.append((match, chunk))
+            else:
+                moves.append((match["id"], chunk.index, chunk.own_metadata))
+        
+        removed = [chunk for candidates in stored_by_hash.values() for chunk in candidates]
+        
+        # Embed and write only new content, then retire what is gone
+        pipeline = self._new_pipeline()
+        try:
+            for chunk in new_chunks:
+                await pipeline.put(chunk, doc_type, owner_tenant_id)
+            await pipeline.join()
+        except BaseException:
+            pipeline.cancel()
+            raise
+        
+        # Shared chunks keep their position for the other documents: this
+        # document gets its own copy and is unlinked from the shared one
+        if copies:
+            hashes = [content_hash(chunk.content) for _, chunk in copies]
+            found = await self.knowledge_service.find_chunks_by_hash(hashes, doc_type, owner_tenant_id)
+            await self.knowledge_service.store_chunks_bulk([
+                {
+                    "content": chunk.content,
+                    "embedding": (found.get(chunk_hash) or {}).get("embedding"),
+                    "doc_type": doc_type,
+                    "tenant_id": owner_tenant_id,
+                    "metadata": chunk.own_metadata,
+                    "content_hash": chunk_hash,
+                    "chunk_index": chunk.index,
+                    "doc_id": doc_id,
+                }
+                for (_, chunk), chunk_hash in zip(copies, hashes)
+            ])
+        
+        await self.knowledge_service.move_chunks(doc_id, moves)
+        await self.knowledge_service.tombstone_chunks(doc_id, removed + [match for match, _ in copies])
+        
+        # Re-sign the document from its new chunks
+        near_duplicate = {}
+        if pipeline.near_dedupe != "off":
+            lsh = pipeline.lsh
+            document_signature = await asyncio.to_thread(
+                lambda: functools.reduce(lsh.merge, (lsh.raw_signature(chunk.content) for chunk in chunks), None)
+            )
+            near_duplicate = await self._near_duplicate_document(
+                doc_id, document_signature, doc_type, owner_tenant_id, lsh
+            )
+        
+        await self.knowledge_service.register_document(
+            doc_id, doc_type, owner_tenant_id, chunker.name, base_metadata, len(chunks),
+            created_at=record["created_at"] if record else datetime.fromisoformat(ingested_at),
+            updated_at=updated_at,
+            content_chars=sum(len(chunk.content) for chunk in chunks),
+            **near_duplicate,
+        )
         
         result = {
             "doc_id": doc_id,
             "chunk_count": len(chunks),
+            "chunks_unchanged": unchanged,
+            "chunks_moved": len(moves) + len(copies),
+            "chunks_added": len(new_chunks),
+            "chunks_removed": len(removed),
             "strategy": chunker.name,
             "doc_type": doc_type,
-            "tenant_id": tenant_id if doc_type == "private" else None,
-            "created_at": created_at.isoformat(),
-            "chunk_ids": stored_chunks,
+            "updated_at": updated_at.isoformat(),
+            "timings": {
+                "chunking_ms": round(chunking_seconds * 1000, 2),
+                **pipeline.timings(),
+                "chunks": len(chunks),
+                **pipeline.counters(),
+            },
         }
+        log_event(
+            logger, "ingest.update",
+            doc_id=doc_id, strategy=chunker.name, doc_type=doc_type,
+            chunks_unchanged=unchanged, chunks_moved=len(moves) + len(copies),
+            chunks_added=len(new_chunks), chunks_removed=len(removed),
+            timings=result["timings"],
+        )
         
-        logger.info(f"Ingestion complete for doc {doc_id}: {len(chunks)} chunks stored")
+        logger.info(
+            f"Update complete for doc {doc_id}: {unchanged} unchanged, {len(moves) + len(copies)} moved, "
+            f"{len(new_chunks)} added, {len(removed)} removed"
+        )
         return result
     
     async def ingest_file(
@@ -135,57 +307,513 @@ class IngestionService:
         Returns:
             Dict with ingestion results
         """
-        import io
-        from pypdf import PdfReader
+        spooled = await spool_to_disk(
+            _iter_bytes(file_content),
+            suffix=os.path.splitext(filename)[1],
+            spool_dir=settings.ingest_spool_dir,
+        )
+        try:
+            return await self.ingest_file_path(
+                path=spooled.path,
+                filename=filename,
+                tenant_id=tenant_id,
+                strategy=strategy,
+                doc_type=doc_type,
+                metadata=metadata,
+                file_hash=spooled.sha256,
+            )
+        finally:
+            spooled.remove()
+    
+    async def ingest_file_path(
+        self,
+        path: str,
+        filename: str,
+        tenant_id: str,
+        strategy: str = "default",
+        doc_type: str = "private",
+        metadata: dict | None = None,
+        file_hash: str | None = None,
+        progress: IngestProgress | None = None,
+        pipeline: IngestPipeline | None = None,
+    ) -> dict:
+        """
+        Ingest a file from local disk in streaming mode.
+        
+        Text is extracted one PDF page (or text block) at a time and fed to
+        an incremental chunker, so chunks are embedded and stored while the
+        rest of the file is still being read. Peak memory does not grow
+        with the file size. PDF pages are extracted in a process pool.
+        
+        If the same file was already ingested into the same scope with the
+        same strategy, the existing document is returned without extracting
+        anything.
+        
+        Args:
+            path: Path to the file (e.g. a spooled upload)
+            filename: Original name of the file
+            tenant_id: ID of the tenant
+            strategy: Chunking strategy
+            doc_type: Type of document
+            metadata: Optional metadata
+            file_hash: SHA-256 of the file, if already known
+            progress: Optional counters updated while the ingestion runs
+            pipeline: Shared pipeline to submit chunks to (see `_ingest`)
+            
+        Returns:
+            Dict with ingestion results
+        """
+        if file_hash is None:
+            file_hash = await asyncio.to_thread(compute_file_hash, path)
         
-        text_content = ""
+        if settings.ingest_dedupe and self.knowledge_service:
+            owner_tenant_id = tenant_id if doc_type == "private" else None
+            chunker_name = get_chunking_strategy(strategy).name
+            existing = await self.knowledge_service.find_document_by_hash(
+                file_hash, doc_type, owner_tenant_id, chunker_name
+            )
+            if existing:
+                logger.info(f"File {filename} already ingested as doc {existing['doc_id']}")
+                created_at = existing.get("created_at")
+                return {
+                    "doc_id": existing["doc_id"],
+                    "chunk_count": existing["chunk_count"],
+                    "strategy": chunker_name,
+                    "doc_type": doc_type,
+                    "tenant_id": owner_tenant_id,
+                    "created_at": created_at.isoformat() if created_at else "",
+                    "chunk_ids": [],
+                    "chunks_reused": existing["chunk_count"],
+                    "chunks_new": 0,
+                    "file_duplicate": True,
+                }
         
-        # Determine file type
-        if filename.lower().endswith(".pdf"):
-            try:
-                # Process PDF
-                logger.info(f"Processing PDF file: {filename}")
-                pdf_file = io.BytesIO(file_content)
-                reader = PdfReader(pdf_file)
-                
-                # Extract text from all pages
-                for page in reader.pages:
-                    text_content += page.extract_text() + "\n\n"
-                    
-                if not text_content.strip():
-                    logger.warning(f"No text extracted from PDF: {filename}")
-                    
-            except Exception as e:
-                logger.error(f"Failed to process PDF {filename}: {e}")
-                raise ValueError(f"Invalid or corrupted PDF file: {str(e)}")
+        if is_pdf(filename):
+            logger.info(f"Streaming PDF file: {filename}")
+            segments = iter_pdf_pages(
+                path,
+                workers=settings.pdf_extract_workers,
+                pages_per_task=settings.pdf_pages_per_task,
+                timeout=settings.pdf_extract_timeout_seconds,
+            )
         else:
-            # Assume text
-            try:
-                text_content = file_content.decode("utf-8")
-            except UnicodeDecodeError:
-                # Try latin-1 fallback
-                text_content = file_content.decode("latin-1")
+            segments = iter_text_blocks(path)
+        
+        return await self._ingest_file_segments(
+            segments,
+            filename=filename,
+            size=os.path.getsize(path),
+            file_hash=file_hash,
+            tenant_id=tenant_id,
+            strategy=strategy,
+            doc_type=doc_type,
+            metadata=metadata,
+            progress=progress,
+            pipeline=pipeline,
+        )
+    
+    async def _ingest_file_segments(
+        self,
+        segments: Iterable[str],
+        filename: str,
+        size: int,
+        file_hash: str,
+        tenant_id: str,
+        strategy: str,
+        doc_type: str,
+        metadata: dict | None,
+        progress: IngestProgress | None = None,
+        pipeline: IngestPipeline | None = None,
+    ) -> dict:
+        """
+        Ingest text segments extracted from a file.
         
+        Segments of a PDF are its pages. Time spent waiting on the
+        extractor is measured separately from chunking.
+        """
         # Enrich metadata
         file_metadata = {
             **(metadata or {}),
             "filename": filename,
-            "original_size": len(file_content),
-            "content_type": "application/pdf" if filename.lower().endswith(".pdf") else "text/plain",
+            "original_size": size,
+            "file_hash": file_hash,
+            "content_type": (metadata or {}).get("content_type")
+            or ("application/pdf" if is_pdf(filename) else "text/plain"),
         }
         
         # Helper to treat title if not present
         if "title" not in file_metadata:
             file_metadata["title"] = filename
-            
-        return await self.ingest_text(
-            content=text_content,
+        
+        if progress is None:
+            progress = pipeline.progress if pipeline is not None else IngestProgress()
+        pages = is_pdf(filename)
+        source = metrics.SourceStats(
+            kind="pdf" if pages else metrics.source_kind(file_metadata["content_type"]),
+            bytes_in=size,
+        )
+        has_text = False
+        
+        def track_text(segments: Iterable[str]) -> Iterator[str]:
+            nonlocal has_text
+            segments = iter(segments)
+            while True:
+                start = time.perf_counter()
+                segment = next(segments, None)
+                source.extraction_seconds += time.perf_counter() - start
+                if segment is None:
+                    return
+                
+                if pages:
+                    source.pages += 1
+                    progress.pages_extracted += 1
+                has_text = has_text or bool(segment.strip())
+                yield segment
+        
+        result = await self._ingest(
+            lambda chunker, base_metadata: chunker.chunk_stream(track_text(segments), base_metadata),
             tenant_id=tenant_id,
             strategy=strategy,
             doc_type=doc_type,
             metadata=file_metadata,
+            progress=progress,
+            pipeline=pipeline,
+            source=source,
         )
-
+        
+        if not has_text:
+            logger.warning(f"No text extracted from file: {filename}")
+        
+        return result
+    
+    async def _ingest(
+        self,
+        make_chunks: Callable[[ChunkingStrategy, dict], Iterable[Chunk]],
+        tenant_id: str,
+        strategy: str,
+        doc_type: str,
+        metadata: dict | None,
+        progress: IngestProgress | None = None,
+        pipeline: IngestPipeline | None = None,
+        source: metrics.SourceStats | None = None,
+    ) -> dict:
+        """
+        Run the ingestion pipeline for a new document.
+        
+        With a shared `pipeline` (e.g. for bulk ingestion), the chunks are
+        only submitted: the caller joins the pipeline, and the result has
+        no chunk IDs, reuse counts or pipeline timings. The document is not
+        registered either: the result's `register` coroutine function does
+        it, to be awaited once the batches holding the chunks are stored.
+        Errors are returned as a failed result with the document ID, since
+        chunks submitted before the error still have to be removed.
+        
+        The result's `timings` block has per-stage times (`*_ms`) and
+        sizes (bytes_in, pages, chunks, embedding calls and tokens,
+        writes); they are also logged as an `ingest.document` event and
+        aggregated into the ingestion metrics.
+        
+        Args:
+            make_chunks: Produces the document chunks from the chunker and
+                the base metadata (a list or a lazy iterator)
+            tenant_id: ID of the tenant
+            strategy: Chunking strategy
+            doc_type: Type of document
+            metadata: Optional metadata
+            progress: Optional counters updated while the ingestion runs
+            pipeline: Shared pipeline to submit chunks to
+            source: Size and extraction stats of the source, updated while
+                its segments are consumed
+            
+        Returns:
+            Dict with ingestion results
+        """
+        # Generate document ID
+        doc_id = str(uuid.uuid4())
+        created_at = datetime.utcnow()
+        started = time.perf_counter()
+        source = source or metrics.SourceStats()
+        
+        logger.info(f"Starting ingestion for doc {doc_id}, strategy={strategy}")
+        
+        # Get chunking strategy
+        chunker: ChunkingStrategy = get_chunking_strategy(strategy)
+        
+        base_metadata = {
+            "source_doc_id": doc_id,
+            "doc_type": doc_type,
+            "ingested_at": created_at.isoformat(),
+            **(metadata or {}),
+        }
+        
+        # Embed in batches and store each batch as soon as it is embedded
+        shared = pipeline is not None
+        if not shared:
+            pipeline = self._new_pipeline(progress)
+        owner_tenant_id = tenant_id if doc_type == "private" else None
+        
+        # Chunking (and any extraction feeding it) is CPU-bound or waits on
+        # the extraction pool, so chunks are pulled in a worker thread to
+        # keep the event loop free. Time is measured per chunk because
+        # chunks may be produced lazily; it includes extraction, which is
+        # measured separately by the source and subtracted afterwards.
+        # MinHash signatures are computed in the same thread as the chunks
+        # (so chunking_ms includes them); the document signature is their
+        # merge, so the document text is never shingled a second time.
+        chunk_count = 0
+        content_chars = 0
+        chunking_seconds = 0.0
+        lsh = pipeline.lsh if pipeline.near_dedupe != "off" else None
+        document_signature = None
+        near_duplicate = {}
+        
+        def next_chunk() -> tuple[Chunk | None, list[int] | None]:
+            chunk = next(chunks, None)
+            if chunk is None or lsh is None:
+                return chunk, None
+            return chunk, lsh.raw_signature(chunk.content)
+        
+        try:
+            start = time.perf_counter()
+            chunks = await asyncio.to_thread(lambda: iter(make_chunks(chunker, base_metadata)))
+            chunking_seconds += time.perf_counter() - start
+            
+            while True:
+                start = time.perf_counter()
+                chunk, signature = await asyncio.to_thread(next_chunk)
+                chunking_seconds += time.perf_counter() - start
+                if chunk is None:
+                    break
+                
+                chunk_count += 1
+                content_chars += len(chunk.content)
+                pipeline.progress.chunks_created += 1
+                if lsh is not None:
+                    document_signature = lsh.merge(document_signature, signature)
+                await pipeline.put(chunk, doc_type, owner_tenant_id, signature)
+            
+            if not shared:
+                stored_chunks = await pipeline.join()
+            
+            # Document metadata is stored once, not on every chunk; the
+            # record also makes the document listable without a chunk scan
+            register = None
+            if self.knowledge_service:
+                if lsh is not None:
+                    near_duplicate = await self._near_duplicate_document(
+                        doc_id, document_signature, doc_type, owner_tenant_id, lsh
+                    )
+                register = functools.partial(
+                    self.knowledge_service.register_document,
+                    doc_id, doc_type, owner_tenant_id, chunker.name, base_metadata, chunk_count,
+                    created_at=created_at,
+                    content_chars=content_chars,
+                    **near_duplicate,
+                )
+                if not shared:
+                    await register()
+        
+        except Exception as e:
+            if not shared:
+                pipeline.cancel()
+                raise
+            logger.warning(f"Document {doc_id} failed after {chunk_count} chunks: {e}")
+            return {"doc_id": doc_id, "status": "failed", "error": str(e)}
+        except BaseException:
+            if not shared:
+                pipeline.cancel()
+            raise
+        
+        timings = {
+            "extraction_ms": round(source.extraction_seconds * 1000, 2),
+            "chunking_ms": round(max(0.0, chunking_seconds - source.extraction_seconds) * 1000, 2),
+        }
+        if not shared:
+            timings.update(pipeline.timings())
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        timings.update(bytes_in=source.bytes_in, pages=source.pages, chunks=chunk_count)
+        if not shared:
+            timings.update(pipeline.counters())
+        
+        metrics.observe_document(source.kind, chunker.name, timings)
+        log_event(
+            logger, "ingest.document",
+            doc_id=doc_id, source=source.kind, strategy=chunker.name, doc_type=doc_type,
+            shared_pipeline=shared, timings=timings,
+        )
+        
+        if shared:
+            logger.info(f"Document {doc_id} submitted as {chunk_count} chunks using {chunker.name}")
+            return {
+                "doc_id": doc_id,
+                "chunk_count": chunk_count,
+                "strategy": chunker.name,
+                "doc_type": doc_type,
+                "tenant_id": owner_tenant_id,
+                "created_at": created_at.isoformat(),
+                "near_duplicate_of": near_duplicate.get("near_duplicate_of"),
+                "timings": timings,
+                "register": register,
+            }
+        
+        logger.info(f"Document {doc_id} split into {chunk_count} chunks using {chunker.name}")
+        
+        result = {
+            "doc_id": doc_id,
+            "chunk_count": chunk_count,
+            "strategy": chunker.name,
+            "doc_type": doc_type,
+            "tenant_id": owner_tenant_id,
+            "created_at": created_at.isoformat(),
+            "chunk_ids": stored_chunks,
+            "chunks_reused": pipeline.chunks_reused,
+            "chunks_new": pipeline.chunks_new,
+            "chunks_near_duplicate": pipeline.chunks_near_duplicate,
+            "near_duplicate_of": near_duplicate.get("near_duplicate_of"),
+            "timings": timings,
+        }
+        
+        logger.info(
+            f"Ingestion complete for doc {doc_id}: {chunk_count} chunks stored "
+            f"({pipeline.chunks_reused} reused, {pipeline.chunks_new} new)"
+        )
+        return result
+    
+    async def ingest_bulk(
+        self,
+        items: AsyncIterable[BulkItem],
+        tenant_id: str,
+        doc_type: str = "private",
+    ) -> AsyncIterator[dict]:
+        """
+        Ingest many documents through one shared pipeline.
+        
+        Chunks of consecutive documents share embedding batches and bulk
+        writes, instead of running one embed → store cycle per document.
+        A document is registered, and its result yielded (in order), only
+        once all batches holding its chunks are stored. A failed document
+        does not stop the others, but a failed batch fails every document
+        with chunks in it. The chunks a failed document already stored
+        are tombstoned (or unlinked, if shared with other documents).
+        
+        Args:
+            items: Documents to ingest (text or files on disk)
+            tenant_id: ID of the tenant
+            doc_type: Type of every document
+            
+        Yields:
+            One result dict per document (with `name` and `status`), then a
+            final dict with `summary` totals
+        """
+        pipeline = self._new_pipeline()
+        # Submitted documents waiting for their batches: (result, start, end)
+        pending: deque[tuple[dict, int, int]] = deque()
+        counts = {"documents": 0, "completed": 0, "failed": 0, "chunks": 0}
+        
+        async def finish(result: dict, start: int, end: int) -> dict:
+            register = result.pop("register", None)
+            error = pipeline.batches_error(start, end)
+            if error is None and result["status"] == "completed" and register is not None:
+                try:
+                    await register()
+                except Exception as e:
+                    error = e
+            if error is not None:
+                result.update(status="failed", error=str(error) or type(error).__name__)
+            
+            if result["status"] == "failed" and result.get("doc_id"):
+                await self._discard_chunks(result["doc_id"], doc_type, tenant_id)
+            else:
+                counts["chunks"] += result.get("chunk_count", 0)
+            counts[result["status"]] += 1
+            return result
+        
+        try:
+            async for item in items:
+                counts["documents"] += 1
+                start, _ = pipeline.position()
+                try:
+                    result = await self._ingest_bulk_item(item, tenant_id, doc_type, pipeline)
+                except Exception as e:
+                    logger.warning(f"Bulk item {item.name} failed: {e}")
+                    result = {"name": item.name, "status": "failed", "error": str(e)}
+                    start = pipeline.position()[1]
+                
+                pending.append((result, start, pipeline.position()[1]))
+                while pending and pipeline.batches_done(*pending[0][1:]):
+                    yield await finish(*pending.popleft())
+            
+            await pipeline.drain()
+        except BaseException:
+            pipeline.cancel()
+            raise
+        
+        while pending:
+            yield await finish(*pending.popleft())
+        
+        logger.info(
+            f"Bulk ingestion done: {counts['completed']}/{counts['documents']} documents, "
+            f"{counts['chunks']} chunks ({pipeline.chunks_reused} reused, {pipeline.chunks_new} new)"
+        )
+        summary = {
+            **counts,
+            "chunks_reused": pipeline.chunks_reused,
+            "chunks_new": pipeline.chunks_new,
+            "timings": {**pipeline.timings(), **pipeline.counters()},
+        }
+        log_event(logger, "ingest.bulk", doc_type=doc_type, **summary)
+        yield {"summary": summary}
+    
+    async def _discard_chunks(self, doc_id: str, doc_type: str, tenant_id: str) -> None:
+        """Remove the chunks stored for a document whose ingestion failed."""
+        if not self.knowledge_service:
+            return
+        owner_tenant_id = tenant_id if doc_type == "private" else None
+        try:
+            chunks = await self.knowledge_service.get_document_chunks(doc_id, owner_tenant_id)
+            await self.knowledge_service.tombstone_chunks(doc_id, chunks)
+        except Exception as e:
+            logger.error(f"Failed to remove chunks of failed document {doc_id}: {e}")
+            return
+        if chunks:
+            logger.info(f"Removed {len(chunks)} chunks of failed document {doc_id}")
+    
+    async def _ingest_bulk_item(
+        self,
+        item: BulkItem,
+        tenant_id: str,
+        doc_type: str,
+        pipeline: IngestPipeline,
+    ) -> dict:
+        """Submit one bulk item to the shared pipeline."""
+        if item.error:
+            raise ValueError(item.error)
+        
+        if item.path is not None:
+            result = await self.ingest_file_path(
+                path=item.path,
+                filename=os.path.basename(item.name),
+                tenant_id=tenant_id,
+                strategy=item.strategy,
+                doc_type=doc_type,
+                metadata=item.metadata,
+                pipeline=pipeline,
+            )
+            result.pop("chunk_ids", None)
+        else:
+            result = await self._ingest(
+                lambda chunker, base_metadata: chunker.chunk(item.content, base_metadata),
+                tenant_id=tenant_id,
+                strategy=item.strategy,
+                doc_type=doc_type,
+                metadata=item.metadata,
+                pipeline=pipeline,
+                source=metrics.SourceStats(bytes_in=len(item.content.encode("utf-8"))),
+            )
+        
+        # A document that failed while chunking keeps its "failed" status
+        return {"name": item.name, "status": "completed", **result}
+    
     async def ingest_url(
         self,
         url: str,
@@ -197,6 +825,13 @@ class IngestionService:
         """
         Ingest content from a URL.
         
+        The response is streamed to disk (up to `url_fetch_max_bytes`) and
+        routed by content type to the PDF, HTML or text extractor. The
+        ETag/Last-Modified of each fetch are stored, so fetching the same
+        URL again is conditional: an unchanged source (HTTP 304, or the
+        same bytes) is skipped entirely, and a changed one updates the
+        existing document in place.
+        
         Args:
             url: URL to fetch and ingest
             tenant_id: ID of the tenant
@@ -205,12 +840,220 @@ class IngestionService:
             metadata: Optional metadata
             
         Returns:
-            Dict with ingestion results
+            Dict with ingestion results; `unchanged` is True when the
+            source was not modified since the last fetch
+            
+        Raises:
+            ValueError: If the URL cannot be fetched or its content type
+                is not supported
+        """
+        owner_tenant_id = tenant_id if doc_type == "private" else None
+        source = None
+        if self.knowledge_service:
+            source = await self.knowledge_service.get_url_source(url, doc_type, owner_tenant_id)
+        
+        # Validators only make sense if the previous fetch produced a document
+        known = source if source and source.get("doc_id") else {}
+        start = time.perf_counter()
+        fetched = await fetch_to_disk(
+            url,
+            self.http_client or get_http_client(),
+            etag=known.get("etag"),
+            last_modified=known.get("last_modified"),
+            max_bytes=settings.url_fetch_max_bytes,
+            spool_dir=settings.ingest_spool_dir,
+        )
+        fetch_ms = round((time.perf_counter() - start) * 1000, 2)
+        
+        if fetched.not_modified:
+            return self._unchanged_url_result(url, known, doc_type, owner_tenant_id)
+        
+        try:
+            state = {
+                "etag": fetched.etag,
+                "last_modified": fetched.last_modified,
+                "content_hash": fetched.spooled.sha256,
+                "strategy": strategy,
+            }
+            
+            # Servers without validators: compare the bytes instead
+            if known and known.get("content_hash") == fetched.spooled.sha256:
+                await self.knowledge_service.save_url_source(url, doc_type, owner_tenant_id, state)
+                return self._unchanged_url_result(url, known, doc_type, owner_tenant_id)
+            
+            kind = url_content_kind(fetched.content_type, fetched.url)
+            path = fetched.spooled.path
+            if kind == "pdf":
+                segments = iter_pdf_pages(
+                    path,
+                    workers=settings.pdf_extract_workers,
+                    pages_per_task=settings.pdf_pages_per_task,
+                    timeout=settings.pdf_extract_timeout_seconds,
+                )
+            elif kind == "html":
+                segments = iter_html_text(path, encoding=fetched.charset)
+            else:
+                segments = iter_text_blocks(path, encoding=fetched.charset)
+            
+            url_metadata = {
+                **(metadata or {}),
+                "source_url": url,
+                "content_type": fetched.content_type,
+            }
+            
+            result = None
+            if known:
+                # Amended source: re-chunk and diff against the stored version
+                content = await asyncio.to_thread("".join, segments)
+                try:
+                    update = await self.update_document(
+                        doc_id=known["doc_id"],
+                        content=content,
+                        tenant_id=tenant_id,
+                        strategy=strategy,
+                        doc_type=doc_type,
+                        metadata=url_metadata,
+                    )
+                except LookupError:
+                    # The document was deleted: ingest it again
+                    segments = iter([content])
+                else:
+                    result = {
+                        "doc_id": update["doc_id"],
+                        "chunk_count": update["chunk_count"],
+                        "strategy": update["strategy"],
+                        "doc_type": doc_type,
+                        "tenant_id": owner_tenant_id,
+                        "created_at": update["updated_at"],
+                        "chunks_reused": update["chunks_unchanged"] + update["chunks_moved"],
+                        "chunks_new": update["chunks_added"],
+                        "timings": update["timings"],
+                    }
+            
+            if result is None:
+                filename = os.path.basename(urlparse(fetched.url).path) or "index"
+                if kind == "pdf" and not is_pdf(filename):
+                    filename += ".pdf"
+                result = await self._ingest_file_segments(
+                    segments,
+                    filename=filename,
+                    size=fetched.spooled.size,
+                    file_hash=fetched.spooled.sha256,
+                    tenant_id=tenant_id,
+                    strategy=strategy,
+                    doc_type=doc_type,
+                    metadata=url_metadata,
+                )
+            
+            if self.knowledge_service:
+                await self.knowledge_service.save_url_source(
+                    url, doc_type, owner_tenant_id,
+                    {**state, "doc_id": result["doc_id"], "chunk_count": result["chunk_count"]},
+                )
+        finally:
+            fetched.spooled.remove()
+        
+        metrics.STAGE_SECONDS.observe(fetch_ms / 1000, stage="fetch", source=kind, strategy=result["strategy"])
+        result["timings"] = {"fetch_ms": fetch_ms, **result.get("timings", {})}
+        return {**result, "source_url": url, "unchanged": False}
+    
+    @staticmethod
+    def _unchanged_url_result(
+        url: str,
+        source: dict,
+        doc_type: str,
+        tenant_id: str | None,
+    ) -> dict:
+        """Build the result of a URL whose content did not change."""
+        fetched_at = source.get("fetched_at")
+        logger.info(f"URL unchanged, skipping: {url} (doc {source['doc_id']})")
+        return {
+            "doc_id": source["doc_id"],
+            "chunk_count": source.get("chunk_count", 0),
+            "strategy": get_chunking_strategy(source.get("strategy", "default")).name,
+            "doc_type": doc_type,
+            "tenant_id": tenant_id,
+            "created_at": fetched_at.isoformat() if fetched_at else "",
+            "chunks_reused": source.get("chunk_count", 0),
+            "chunks_new": 0,
+            "source_url": url,
+            "unchanged": True,
+        }
+    
+    def _new_pipeline(self, progress: IngestProgress | None = None) -> IngestPipeline:
+        """Create an embed → store pipeline configured from settings."""
+        near_dedupe = settings.near_dedupe_action
+        return IngestPipeline(
+            embedding_service=self.embedding_service,
+            knowledge_service=self.knowledge_service,
+            batch_size=settings.ingest_embed_batch_size,
+            batch_max_tokens=settings.ingest_embed_batch_max_tokens,
+            max_concurrency=settings.ingest_embed_concurrency,
+            bulk_writes=settings.ingest_bulk_writes,
+            dedupe=settings.ingest_dedupe,
+            near_dedupe=near_dedupe,
+            lsh=get_minhash_lsh() if near_dedupe != "off" else None,
+            progress=progress,
+        )
+    
+    async def _near_duplicate_document(
+        self,
+        doc_id: str,
+        raw_signature: list[int] | None,
+        doc_type: str,
+        tenant_id: str | None,
+        lsh: MinHashLSH,
+    ) -> dict:
+        """
+        Sign a document and look for a stored document it nearly duplicates.
+        
+        Args:
+            doc_id: ID of the document
+            raw_signature: Merged raw MinHash signature of its chunks
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            lsh: MinHash parameters
+            
+        Lookup errors are logged and the document is registered with its
+        bands but no `near_duplicate_of`, so its stored chunks stay owned.
+        
+        Returns:
+            Keyword arguments for `register_document` (minhash, lsh_bands,
+            near_duplicate_of), empty if the document is too short to sign
         """
-        # TODO: Implement URL fetching
-        # For now, placeholder
-        raise NotImplementedError("URL ingestion not yet implemented")
+        if raw_signature is None:
+            return {}
+        
+        signature = lsh.signature(raw_signature)
+        bands = lsh.band_hashes(signature)
+        try:
+            candidates = await self.knowledge_service.find_near_duplicate_documents(bands, doc_type, tenant_id)
+        except Exception as e:
+            # Near dedupe is best effort: the document is registered without it
+            logger.warning(f"Near-duplicate document lookup failed for {doc_id}: {e}")
+            return {"minhash": signature, "lsh_bands": bands, "near_duplicate_of": None}
+        
+        best = None
+        for candidate in candidates:
+            if candidate["doc_id"] == doc_id:
+                continue
+            similarity = lsh.similarity(signature, candidate["minhash"])
+            if similarity >= lsh.threshold and (best is None or similarity > best["similarity"]):
+                best = {"doc_id": candidate["doc_id"], "similarity": round(similarity, 4)}
+        
+        if best:
+            logger.info(
+                f"Document {doc_id} is a near duplicate of {best['doc_id']} "
+                f"(similarity {best['similarity']})"
+            )
+        return {"minhash": signature, "lsh_bands": bands, "near_duplicate_of": best}
     
     def get_available_strategies(self) -> list[str]:
         """Get list of available chunking strategies."""
         return ["default", "sliding_window", "legal", "legal_document"]
+
+
+async def _iter_bytes(content: bytes):
+    """Wrap in-memory content as an async byte stream."""
+    yield content
+
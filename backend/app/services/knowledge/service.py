@@ -3,10 +3,24 @@ Knowledge service for RAG operations.
 
 Handles storage and retrieval of knowledge chunks using Firestore Vector Search.
 Implements tenant isolation for private documents.
+
+Chunks are stored in a compact form: content, embedding, their own
+metadata (position, structure labels) and a reference to their document.
+Document-level metadata (title, filename, size, ingestion time) is stored
+once per document in the `documents` collection and joined into search
+results. The same records serve as the document registry: listing,
+counting and deleting documents never scan chunks.
+
+Chunks and document records may carry MinHash LSH band hashes
+(`lsh_bands`) so near-duplicate content can be looked up with a single
+array-contains-any query.
 """
 
+import asyncio
+import hashlib
 import logging
 import uuid
+from collections.abc import AsyncIterator
 from datetime import datetime
 from functools import lru_cache
 
@@ -28,6 +42,20 @@ class KnowledgeService:
     """
     
     COLLECTION_NAME = "knowledge_base"
+    DOCUMENTS_COLLECTION = "documents"
+    URL_SOURCES_COLLECTION = "url_sources"
+    
+    # Metadata fields that describe a chunk rather than its document
+    CHUNK_METADATA_KEYS = frozenset({
+        "strategy", "chunk_index", "token_start", "token_end", "char_start", "char_end",
+        "article", "sub_chunk", "paragraph", "inciso", "alinea", "provision", "references",
+    })
+    
+    # Chunk fields returned by search (everything except the embedding)
+    SEARCH_FIELDS = ["content", "type", "tenant_id", "doc_id", "metadata"]
+    
+    # Firestore limit on values in an "in" filter
+    IN_QUERY_LIMIT = 30
     
     def __init__(self):
         """Initialize the knowledge service."""
@@ -46,6 +74,11 @@ class KnowledgeService:
         """Get knowledge base collection reference."""
         return self.db.collection(self.COLLECTION_NAME)
     
+    @property
+    def documents(self):
+        """Get document records collection reference."""
+        return self.db.collection(self.DOCUMENTS_COLLECTION)
+    
     async def store_chunk(
         self,
         content: str,
@@ -53,6 +86,11 @@ class KnowledgeService:
         doc_type: str,
         tenant_id: str | None,
         metadata: dict | None = None,
+        content_hash: str | None = None,
+        chunk_index: int | None = None,
+        doc_id: str | None = None,
+        lsh_bands: list[str] | None = None,
+        near_duplicate_of: dict | None = None,
     ) -> str:
         """
         Store a knowledge chunk in Firestore.
@@ -62,30 +100,683 @@ class KnowledgeService:
             embedding: Vector embedding (768 dimensions)
             doc_type: "private" or "marketplace"
             tenant_id: Owner tenant ID (None for marketplace)
-            metadata: Additional metadata
+            metadata: Metadata of the chunk itself (document metadata is
+                stored on the document record)
+            content_hash: Normalized content hash (for deduplication)
+            chunk_index: Position of the chunk in its document
+            doc_id: ID of the document the chunk belongs to
+            lsh_bands: MinHash LSH band hashes (for near-duplicate lookups)
+            near_duplicate_of: Stored chunk this one nearly duplicates
+                ({"chunk_id", "doc_id", "similarity"})
             
         Returns:
             ID of the stored chunk
         """
         chunk_id = str(uuid.uuid4())
+        doc_data = self._build_chunk_data(
+            content, embedding, doc_type, tenant_id, metadata, content_hash, chunk_index, doc_id,
+            lsh_bands, near_duplicate_of,
+        )
+        
+        # Store in Firestore
+        self.collection.document(chunk_id).set(doc_data)
+        logger.debug(f"Stored chunk {chunk_id} in Firestore")
+        
+        return chunk_id
+    
+    async def store_chunks_bulk(self, chunks: list[dict]) -> list[str]:
+        """
+        Store many knowledge chunks using Firestore batched writes.
         
+        Writes are grouped into batches of at most 500 operations (the
+        Firestore limit) and the batches are committed in parallel. A batch
+        that fails is retried with exponential backoff; since chunk IDs are
+        assigned up front, retries are idempotent.
+        
+        Args:
+            chunks: List of dicts with the same keys as `store_chunk`
+                (content, embedding, doc_type, tenant_id, metadata,
+                content_hash, chunk_index, doc_id, lsh_bands,
+                near_duplicate_of), plus an optional `id` to write the
+                chunk under a given ID (e.g. when restoring a snapshot)
+            
+        Returns:
+            IDs of the stored chunks, in input order
+        """
+        if not chunks:
+            return []
+        
+        chunk_ids = [chunk.get("id") or str(uuid.uuid4()) for chunk in chunks]
+        writes = [
+            (chunk_id, self._build_chunk_data(
+                content=chunk["content"],
+                embedding=chunk.get("embedding"),
+                doc_type=chunk["doc_type"],
+                tenant_id=chunk.get("tenant_id"),
+                metadata=chunk.get("metadata"),
+                content_hash=chunk.get("content_hash"),
+                chunk_index=chunk.get("chunk_index"),
+                doc_id=chunk.get("doc_id"),
+                lsh_bands=chunk.get("lsh_bands"),
+                near_duplicate_of=chunk.get("near_duplicate_of"),
+            ))
+            for chunk_id, chunk in zip(chunk_ids, chunks)
+        ]
+        
+        batch_size = min(max(1, settings.firestore_batch_size), 500)
+        groups = [writes[i:i + batch_size] for i in range(0, len(writes), batch_size)]
+        semaphore = asyncio.Semaphore(max(1, settings.firestore_write_concurrency))
+        
+        async def commit_group(group: list[tuple[str, dict]]) -> None:
+            async with semaphore:
+                for attempt in range(settings.firestore_write_retries + 1):
+                    try:
+                        await asyncio.to_thread(self._commit_writes, group)
+                        return
+                    except Exception as e:
+                        if attempt >= settings.firestore_write_retries:
+                            logger.error(f"Batch write of {len(group)} chunks failed: {e}")
+                            raise
+                        delay = 0.5 * (2 ** attempt)
+                        logger.warning(
+                            f"Batch write of {len(group)} chunks failed "
+                            f"(attempt {attempt + 1}), retrying in {delay}s: {e}"
+                        )
+                        await asyncio.sleep(delay)
+        
+        await asyncio.gather(*(commit_group(group) for group in groups))
+        logger.debug(f"Stored {len(chunk_ids)} chunks in {len(groups)} batches")
+        
+        return chunk_ids
+    
+    def _build_chunk_data(
+        self,
+        content: str,
+        embedding: list[float] | None,
+        doc_type: str,
+        tenant_id: str | None,
+        metadata: dict | None,
+        content_hash: str | None = None,
+        chunk_index: int | None = None,
+        doc_id: str | None = None,
+        lsh_bands: list[str] | None = None,
+        near_duplicate_of: dict | None = None,
+    ) -> dict:
+        """Build the Firestore document for a chunk."""
         doc_data = {
             "content": content,
             "type": doc_type,
             "tenant_id": tenant_id,
-            "metadata": metadata or {},
+            "metadata": dict(metadata or {}),
             "created_at": datetime.utcnow(),
         }
         
+        # Content address, owning document and the documents sharing this chunk
+        if content_hash:
+            doc_data["content_hash"] = content_hash
+        if doc_id:
+            doc_data["doc_id"] = doc_id
+            doc_data["doc_ids"] = [doc_id]
+        if chunk_index is not None:
+            doc_data["chunk_index"] = chunk_index
+        
+        # Near-duplicate index
+        if lsh_bands:
+            doc_data["lsh_bands"] = lsh_bands
+        if near_duplicate_of:
+            doc_data["near_duplicate_of"] = near_duplicate_of
+        
         # Add embedding as Firestore Vector if available
         if embedding:
             doc_data["embedding"] = Vector(embedding)
         
-        # Store in Firestore
-        self.collection.document(chunk_id).set(doc_data)
-        logger.debug(f"Stored chunk {chunk_id} in Firestore")
+        return doc_data
+    
+    def _commit_writes(self, writes: list[tuple[str, dict]], collection=None) -> None:
+        """Commit a group of chunk (or other) writes as a single Firestore batch."""
+        if collection is None:
+            collection = self.collection
+        batch = self.db.batch()
+        for chunk_id, doc_data in writes:
+            batch.set(collection.document(chunk_id), doc_data)
+        batch.commit()
+    
+    async def find_chunks_by_hash(
+        self,
+        content_hashes: list[str],
+        doc_type: str,
+        tenant_id: str | None,
+    ) -> dict[str, dict]:
+        """
+        Find stored chunks by content hash within a scope.
         
-        return chunk_id
+        Tombstoned chunks are skipped: they have lost their embedding and
+        must not be linked to new documents.
+        
+        Args:
+            content_hashes: Normalized content hashes to look up
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (ignored for marketplace)
+            
+        Returns:
+            Dict mapping content hash to {"id", "embedding"} of a stored chunk
+        """
+        unique = list(dict.fromkeys(content_hashes))
+        groups = [
+            unique[i:i + self.IN_QUERY_LIMIT]
+            for i in range(0, len(unique), self.IN_QUERY_LIMIT)
+        ]
+        
+        def run(group: list[str]) -> list:
+            query = self._scope_query(doc_type, tenant_id).where("content_hash", "in", group)
+            return list(query.select(["content_hash", "embedding", "tombstone"]).stream())
+        
+        results = await asyncio.gather(*(asyncio.to_thread(run, group) for group in groups))
+        
+        found = {}
+        for docs in results:
+            for doc in docs:
+                data = doc.to_dict()
+                if data.get("tombstone"):
+                    continue
+                embedding = data.get("embedding")
+                found.setdefault(data["content_hash"], {
+                    "id": doc.id,
+                    "embedding": list(embedding) if embedding is not None else None,
+                })
+        
+        return found
+    
+    async def find_document_by_hash(
+        self,
+        file_hash: str,
+        doc_type: str,
+        tenant_id: str | None,
+        strategy: str,
+    ) -> dict | None:
+        """
+        Find a document previously ingested from the same file.
+        
+        Args:
+            file_hash: SHA-256 of the file bytes
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (ignored for marketplace)
+            strategy: Chunking strategy name the file was ingested with
+            
+        Returns:
+            Dict with doc_id, chunk_count and created_at, or None
+        """
+        query = (
+            self._scope_query(doc_type, tenant_id, self.documents)
+            .where("metadata.file_hash", "==", file_hash)
+            .where("strategy", "==", strategy)
+        )
+        
+        def run() -> dict | None:
+            docs = list(query.limit(1).stream())
+            if not docs:
+                return None
+            
+            data = docs[0].to_dict()
+            return {
+                "doc_id": docs[0].id,
+                "chunk_count": data.get("chunk_count", 0),
+                "created_at": data.get("created_at"),
+            }
+        
+        return await asyncio.to_thread(run)
+    
+    async def find_near_duplicate_chunks(
+        self,
+        lsh_bands: list[str],
+        doc_type: str,
+        tenant_id: str | None,
+        limit: int = 10,
+    ) -> list[dict]:
+        """
+        Find stored chunks sharing at least one LSH band within a scope.
+        
+        Candidates still have to be verified: a shared band only makes a
+        high similarity likely.
+        
+        Args:
+            lsh_bands: LSH band hashes of the chunk
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (ignored for marketplace)
+            limit: Maximum number of candidates
+            
+        Returns:
+            List of dicts with id, content and doc_id (tombstoned chunks
+            excluded)
+        """
+        docs = await self._find_by_bands(
+            self.collection, lsh_bands, doc_type, tenant_id, ["content", "doc_id", "tombstone"], limit
+        )
+        return [
+            {"id": doc.id, "content": doc.get("content") or "", "doc_id": doc.get("doc_id")}
+            for doc in docs
+            if not doc.get("tombstone")
+        ]
+    
+    async def find_near_duplicate_documents(
+        self,
+        lsh_bands: list[str],
+        doc_type: str,
+        tenant_id: str | None,
+        limit: int = 10,
+    ) -> list[dict]:
+        """
+        Find document records sharing at least one LSH band within a scope.
+        
+        Args:
+            lsh_bands: LSH band hashes of the document signature
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (ignored for marketplace)
+            limit: Maximum number of candidates
+            
+        Returns:
+            List of dicts with doc_id and minhash
+        """
+        docs = await self._find_by_bands(
+            self.documents, lsh_bands, doc_type, tenant_id, ["minhash"], limit
+        )
+        return [{"doc_id": doc.id, "minhash": doc.get("minhash") or []} for doc in docs]
+    
+    async def _find_by_bands(
+        self,
+        collection,
+        lsh_bands: list[str],
+        doc_type: str,
+        tenant_id: str | None,
+        fields: list[str],
+        limit: int,
+    ) -> list:
+        """Run an array-contains-any query on `lsh_bands` within a scope."""
+        bands = list(dict.fromkeys(lsh_bands))[:self.IN_QUERY_LIMIT]
+        if not bands:
+            return []
+        
+        query = (
+            self._scope_query(doc_type, tenant_id, collection)
+            .where("lsh_bands", "array_contains_any", bands)
+            .select(fields)
+            .limit(limit)
+        )
+        return await asyncio.to_thread(lambda: list(query.stream()))
+    
+    async def register_document(
+        self,
+        doc_id: str,
+        doc_type: str,
+        tenant_id: str | None,
+        strategy: str,
+        metadata: dict | None,
+        chunk_count: int,
+        created_at: datetime,
+        updated_at: datetime | None = None,
+        content_chars: int = 0,
+        minhash: list[int] | None = None,
+        lsh_bands: list[str] | None = None,
+        near_duplicate_of: dict | None = None,
+    ) -> None:
+        """
+        Create or replace the record of a document.
+        
+        The record holds the document-level metadata shared by all its
+        chunks, so it is not repeated on every chunk, and the counters used
+        to list documents without scanning their chunks.
+        
+        Args:
+            doc_id: ID of the document
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            strategy: Chunking strategy name
+            metadata: Document metadata (title, filename, size, ...)
+            chunk_count: Number of chunks of the document
+            created_at: Ingestion time
+            updated_at: Time of the last in-place update, if any
+            content_chars: Total characters of chunk content
+            minhash: MinHash signature of the whole document
+            lsh_bands: LSH band hashes of the signature
+            near_duplicate_of: Stored document this one nearly duplicates
+                ({"doc_id", "similarity"})
+        """
+        metadata = self._document_metadata(metadata or {})
+        data = {
+            "doc_id": doc_id,
+            "type": doc_type,
+            "tenant_id": tenant_id,
+            "strategy": strategy,
+            "metadata": metadata,
+            "chunk_count": chunk_count,
+            "content_chars": content_chars,
+            "original_size": metadata.get("original_size"),
+            "created_at": created_at,
+            "updated_at": updated_at or created_at,
+        }
+        if minhash:
+            data["minhash"] = minhash
+            data["lsh_bands"] = lsh_bands or []
+        if near_duplicate_of:
+            data["near_duplicate_of"] = near_duplicate_of
+        await asyncio.to_thread(self.documents.document(doc_id).set, data)
+    
+    async def get_document(self, doc_id: str, doc_type: str, tenant_id: str | None) -> dict | None:
+        """
+        Get the record of a document in a scope.
+        
+        Args:
+            doc_id: ID of the document
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            
+        Returns:
+            The document record, or None if it does not exist in this scope
+        """
+        snapshot = await asyncio.to_thread(self.documents.document(doc_id).get)
+        if not snapshot.exists:
+            return None
+        
+        data = snapshot.to_dict()
+        if data.get("type") != doc_type or data.get("tenant_id") != tenant_id:
+            return None
+        return data
+    
+    async def get_documents_metadata(self, doc_ids: list[str]) -> dict[str, dict]:
+        """
+        Get the metadata of many documents with one batched read.
+        
+        Args:
+            doc_ids: IDs of the documents
+            
+        Returns:
+            Dict mapping document ID to its metadata (missing records are omitted)
+        """
+        unique = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id]
+        if not unique:
+            return {}
+        
+        def run() -> dict[str, dict]:
+            refs = [self.documents.document(doc_id) for doc_id in unique]
+            return {
+                snapshot.id: snapshot.to_dict().get("metadata", {})
+                for snapshot in self.db.get_all(refs, field_paths=["metadata"])
+                if snapshot.exists
+            }
+        
+        return await asyncio.to_thread(run)
+    
+    @staticmethod
+    def _document_metadata(metadata: dict) -> dict:
+        """Strip fields stored as top-level record fields from document metadata."""
+        return {
+            key: value
+            for key, value in metadata.items()
+            if key not in ("source_doc_id", "doc_type", "embedding")
+        }
+    
+    async def link_chunks(self, links: list[tuple[str, str]]) -> None:
+        """
+        Add existing chunks to documents that share their content.
+        
+        Args:
+            links: (chunk_id, doc_id) pairs
+        """
+        await self.update_chunks([
+            (chunk_id, {"doc_ids": firestore.ArrayUnion([doc_id])})
+            for chunk_id, doc_id in links
+        ])
+    
+    async def get_document_chunks(self, doc_id: str, tenant_id: str | None) -> list[dict]:
+        """
+        Get the live (non-tombstoned) chunks of a document.
+        
+        Args:
+            doc_id: ID of the source document
+            tenant_id: Owner tenant ID (None for marketplace)
+            
+        Returns:
+            List of dicts with id, content, content_hash, chunk_index,
+            type, doc_id, doc_ids and metadata
+        """
+        queries = [
+            self.collection.where("metadata.source_doc_id", "==", doc_id),
+            self.collection.where("doc_ids", "array_contains", doc_id),
+        ]
+        fields = [
+            "content", "content_hash", "chunk_index", "type", "doc_id", "doc_ids", "metadata", "tombstone",
+        ]
+        
+        def run() -> list[dict]:
+            chunks = {}
+            for query in queries:
+                query = query.where("tenant_id", "==", tenant_id).select(fields)
+                for doc in query.stream():
+                    data = doc.to_dict()
+                    if doc.id in chunks or data.get("tombstone"):
+                        continue
+                    chunks[doc.id] = {
+                        "id": doc.id,
+                        "content": data.get("content", ""),
+                        "content_hash": data.get("content_hash"),
+                        "chunk_index": data.get("chunk_index"),
+                        "type": data.get("type"),
+                        "doc_id": data.get("doc_id"),
+                        "doc_ids": data.get("doc_ids") or [],
+                        "metadata": data.get("metadata", {}),
+                    }
+            return list(chunks.values())
+        
+        return await asyncio.to_thread(run)
+    
+    async def update_chunks(self, updates: list[tuple[str, dict]]) -> None:
+        """
+        Apply partial updates to chunks using batched writes.
+        
+        Args:
+            updates: (chunk_id, fields) pairs
+        """
+        for i in range(0, len(updates), 500):
+            batch = self.db.batch()
+            for chunk_id, fields in updates[i:i + 500]:
+                batch.update(self.collection.document(chunk_id), fields)
+            await asyncio.to_thread(batch.commit)
+    
+    async def move_chunks(self, doc_id: str, moves: list[tuple[str, int, dict]]) -> None:
+        """
+        Update the position and metadata of chunks kept across a document update.
+        
+        The chunks are also pointed at the document (legacy chunks had no
+        `doc_id`). Only chunks used by this document alone may be moved:
+        the position and metadata of shared chunks belong to every
+        document linking them.
+        
+        Args:
+            doc_id: ID of the source document
+            moves: (chunk_id, chunk_index, metadata) triples, with the
+                chunks' own metadata
+        """
+        await self.update_chunks([
+            (chunk_id, {
+                "chunk_index": chunk_index,
+                "metadata": dict(metadata),
+                "doc_id": doc_id,
+                "doc_ids": firestore.ArrayUnion([doc_id]),
+            })
+            for chunk_id, chunk_index, metadata in moves
+        ])
+    
+    async def tombstone_chunks(self, doc_id: str, chunks: list[dict]) -> None:
+        """
+        Remove chunks from a document without deleting them outright.
+        
+        Chunks shared with other documents are only unlinked. Others are
+        marked as tombstones and lose their embedding, which drops them
+        from vector search.
+        
+        Args:
+            doc_id: ID of the source document
+            chunks: Chunk dicts as returned by `get_document_chunks`
+        """
+        now = datetime.utcnow()
+        updates = []
+        for chunk in chunks:
+            fields = {"doc_ids": firestore.ArrayRemove([doc_id])}
+            others = [other for other in chunk["doc_ids"] if other != doc_id]
+            if others and chunk.get("doc_id") == doc_id:
+                # Keep the chunk pointing at a document that still uses it
+                fields["doc_id"] = others[0]
+            if not others:
+                fields.update({
+                    "tombstone": True,
+                    "deleted_at": now,
+                    "embedding": firestore.DELETE_FIELD,
+                })
+            updates.append((chunk["id"], fields))
+        
+        await self.update_chunks(updates)
+    
+    async def iter_scope_chunks(
+        self,
+        doc_type: str,
+        tenant_id: str | None,
+        page_size: int = 500,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        Read all live chunks of a scope, page by page.
+        
+        Args:
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            page_size: Chunks read per query
+            
+        Yields:
+            Lists of dicts with id, content, embedding (list of floats, or
+            None), content_hash, chunk_index, doc_id, doc_ids, metadata,
+            lsh_bands and near_duplicate_of
+        """
+        query = self._scope_query(doc_type, tenant_id).order_by("__name__").limit(max(1, page_size))
+        
+        def read_page(last) -> list:
+            page = query.start_after(last) if last is not None else query
+            return list(page.stream())
+        
+        last = None
+        while True:
+            docs = await asyncio.to_thread(read_page, last)
+            if not docs:
+                return
+            last = docs[-1]
+            
+            chunks = []
+            for doc in docs:
+                data = doc.to_dict()
+                if data.get("tombstone"):
+                    continue
+                embedding = data.get("embedding")
+                chunks.append({
+                    "id": doc.id,
+                    "content": data.get("content", ""),
+                    "embedding": list(embedding) if embedding is not None else None,
+                    "content_hash": data.get("content_hash"),
+                    "chunk_index": data.get("chunk_index"),
+                    "doc_id": data.get("doc_id"),
+                    "doc_ids": data.get("doc_ids") or [],
+                    "metadata": data.get("metadata", {}),
+                    "lsh_bands": data.get("lsh_bands"),
+                    "near_duplicate_of": data.get("near_duplicate_of"),
+                })
+            yield chunks
+    
+    async def get_scope_documents(self, doc_type: str, tenant_id: str | None) -> list[dict]:
+        """
+        Get the full records of all documents of a scope.
+        
+        Args:
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            
+        Returns:
+            Document records, as stored
+        """
+        query = self._scope_query(doc_type, tenant_id, collection=self.documents)
+        
+        def run() -> list[dict]:
+            return [{**doc.to_dict(), "doc_id": doc.id} for doc in query.stream()]
+        
+        return await asyncio.to_thread(run)
+    
+    async def store_documents_bulk(self, records: list[dict]) -> None:
+        """
+        Write document records as they are, in batches.
+        
+        Unlike `register_document`, records are not rebuilt, so restored
+        documents keep their counters, timestamps and signatures.
+        
+        Args:
+            records: Document records, each with a `doc_id`
+        """
+        writes = [(record["doc_id"], record) for record in records]
+        batch_size = min(max(1, settings.firestore_batch_size), 500)
+        for i in range(0, len(writes), batch_size):
+            await asyncio.to_thread(self._commit_writes, writes[i:i + batch_size], self.documents)
+    
+    async def get_url_source(self, url: str, doc_type: str, tenant_id: str | None) -> dict | None:
+        """
+        Get the fetch state of a URL ingested into a scope.
+        
+        Args:
+            url: Source URL
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            
+        Returns:
+            Dict with doc_id, etag, last_modified, content_hash, strategy
+            and fetched_at, or None if the URL was never ingested
+        """
+        ref = self._url_source_ref(url, doc_type, tenant_id)
+        snapshot = await asyncio.to_thread(ref.get)
+        return snapshot.to_dict() if snapshot.exists else None
+    
+    async def save_url_source(
+        self,
+        url: str,
+        doc_type: str,
+        tenant_id: str | None,
+        state: dict,
+    ) -> None:
+        """
+        Save the fetch state of a URL (validators and resulting document).
+        
+        Args:
+            url: Source URL
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+            state: Fields to store (doc_id, etag, last_modified, ...)
+        """
+        ref = self._url_source_ref(url, doc_type, tenant_id)
+        data = {
+            **state,
+            "url": url,
+            "type": doc_type,
+            "tenant_id": tenant_id,
+            "fetched_at": datetime.utcnow(),
+        }
+        await asyncio.to_thread(ref.set, data, merge=True)
+    
+    def _url_source_ref(self, url: str, doc_type: str, tenant_id: str | None):
+        """Get the state document of a URL in a scope."""
+        key = hashlib.sha256(f"{doc_type}|{tenant_id or ''}|{url}".encode("utf-8")).hexdigest()
+        return self.db.collection(self.URL_SOURCES_COLLECTION).document(key)
+    
+    def _scope_query(self, doc_type: str, tenant_id: str | None, collection=None):
+        """Build a query restricted to a tenant's private docs or the marketplace."""
+        if collection is None:
+            collection = self.collection
+        query = collection.where("type", "==", doc_type)
+        if doc_type == "private":
+            query = query.where("tenant_id", "==", tenant_id)
+        return query
     
     async def search(
         self,
@@ -122,109 +813,396 @@ class KnowledgeService:
             # For now, we'll do two queries and merge
             pass
         
-        # Perform vector search
+        # Perform vector search, without reading the embeddings back
         try:
-            vector_query = query.find_nearest(
+            vector_query = query.select(self.SEARCH_FIELDS + ["distance"]).find_nearest(
                 vector_field="embedding",
                 query_vector=Vector(query_embedding),
                 distance_measure=DistanceMeasure.COSINE,
                 limit=limit,
+                distance_result_field="distance",
             )
             
+            hits = [(doc.id, doc.to_dict()) for doc in vector_query.stream()]
+            
+            # Join the metadata of the documents the hits belong to
+            parents = await self.get_documents_metadata([data.get("doc_id") for _, data in hits])
+            
             results = []
-            for doc in vector_query.stream():
-                doc_data = doc.to_dict()
+            for chunk_id, doc_data in hits:
                 results.append({
-                    "id": doc.id,
+                    "id": chunk_id,
                     "content": doc_data.get("content", ""),
                     "type": doc_data.get("type"),
-                    "metadata": doc_data.get("metadata", {}),
+                    "metadata": self._join_metadata(doc_data, parents),
                     "score": doc_data.get("distance", 0),
                 })
             
             logger.info(f"Vector search returned {len(results)} results")
             return results
-            
+        
         except Exception as e:
             logger.error(f"Vector search failed: {e}")
             raise
     
+    async def get_provisions(
+        self,
+        provisions: list[str],
+        tenant_id: str,
+        filter_type: str = "all",
+        limit: int = 30,
+    ) -> list[dict]:
+        """
+        Get the chunks of legal provisions from the cross-reference index.
+        
+        Provisions are looked up by key ("<law>:<article>", as stored in
+        `metadata.provision` by the legal chunker) with equality queries,
+        so following references costs no embedding or vector search.
+        
+        Args:
+            provisions: Provision keys
+            tenant_id: ID of the requesting tenant
+            filter_type: "private", "marketplace", or "all"
+            limit: Maximum number of chunks
+            
+        Returns:
+            Live (non-tombstoned) chunks in the same form as `search`
+            results (score None), ordered by provision and position
+        """
+        keys = list(dict.fromkeys(provisions))
+        if not keys:
+            return []
+        
+        if filter_type == "all":
+            scopes = [("marketplace", None), ("private", tenant_id)]
+        else:
+            scopes = [(filter_type, tenant_id)]
+        groups = [keys[i:i + self.IN_QUERY_LIMIT] for i in range(0, len(keys), self.IN_QUERY_LIMIT)]
+        
+        def run(doc_type: str, owner: str | None, group: list[str]) -> list[tuple[str, dict]]:
+            query = (
+                self._scope_query(doc_type, owner)
+                .where("metadata.provision", "in", group)
+                .select(self.SEARCH_FIELDS + ["chunk_index", "tombstone"])
+                .limit(limit)
+            )
+            # Tombstoned chunks are filtered client-side, like in get_document_chunks
+            return [
+                (doc.id, data)
+                for doc in query.stream()
+                if not (data := doc.to_dict()).get("tombstone")
+            ]
+        
+        results = await asyncio.gather(*(
+            asyncio.to_thread(run, doc_type, owner, group)
+            for doc_type, owner in scopes
+            for group in groups
+        ))
+        
+        order = {key: i for i, key in enumerate(keys)}
+        hits = sorted(
+            (hit for hits in results for hit in hits),
+            key=lambda hit: (order[hit[1]["metadata"]["provision"]], hit[1].get("chunk_index") or 0),
+        )[:limit]
+        
+        parents = await self.get_documents_metadata([data.get("doc_id") for _, data in hits])
+        return [
+            {
+                "id": chunk_id,
+                "content": data.get("content", ""),
+                "type": data.get("type"),
+                "metadata": self._join_metadata(data, parents),
+                "score": None,
+            }
+            for chunk_id, data in hits
+        ]
+    
+    @staticmethod
+    def _join_metadata(chunk_data: dict, parents: dict[str, dict]) -> dict:
+        """Merge a chunk's own metadata over the metadata of its document."""
+        metadata = chunk_data.get("metadata", {})
+        doc_id = chunk_data.get("doc_id")
+        if not doc_id:
+            # Legacy chunk: carries a full copy of the document metadata
+            return {key: value for key, value in metadata.items() if key != "embedding"}
+        return {
+            **parents.get(doc_id, {}),
+            **metadata,
+            "source_doc_id": doc_id,
+            "doc_type": chunk_data.get("type"),
+        }
+    
     async def get_documents(
         self,
         tenant_id: str,
         doc_type: str = "private",
         limit: int = 100,
-    ) -> list[dict]:
+        cursor: str | None = None,
+    ) -> tuple[list[dict], str | None]:
         """
-        List documents for a tenant.
+        List documents for a tenant, newest first.
         
         Args:
             tenant_id: ID of the tenant
             doc_type: Filter by document type
             limit: Maximum documents to return
+            cursor: `next_cursor` of the previous page
             
         Returns:
-            List of document summaries
+            Tuple of (document summaries, cursor of the next page or None)
+            
+        Raises:
+            ValueError: If the cursor is invalid
         """
-        query = self.collection.where("tenant_id", "==", tenant_id)
+        query = self._tenant_documents_query(tenant_id, doc_type)
+        query = query.order_by("created_at", direction=firestore.Query.DESCENDING)
         
-        if doc_type != "all":
-            query = query.where("type", "==", doc_type)
+        def run() -> tuple[list[dict], str | None]:
+            page = query
+            if cursor:
+                snapshot = self.documents.document(cursor).get()
+                if not snapshot.exists or snapshot.get("tenant_id") != tenant_id:
+                    raise ValueError("Invalid cursor")
+                page = page.start_after(snapshot)
+            
+            # One extra record tells whether there is a next page
+            docs = list(page.limit(limit + 1).stream())
+            next_cursor = docs[limit - 1].id if len(docs) > limit else None
+            return [self._document_summary(doc) for doc in docs[:limit]], next_cursor
         
-        query = query.limit(limit)
+        return await asyncio.to_thread(run)
+    
+    async def count_documents(self, tenant_id: str, doc_type: str = "private") -> int:
+        """
+        Count documents for a tenant (server-side aggregation).
         
-        # Group by source_doc_id
-        docs_by_source = {}
-        for doc in query.stream():
-            data = doc.to_dict()
-            source_id = data.get("metadata", {}).get("source_doc_id", doc.id)
-            
-            if source_id not in docs_by_source:
-                docs_by_source[source_id] = {
-                    "doc_id": source_id,
-                    "type": data.get("type"),
-                    "chunk_count": 0,
-                    "created_at": data.get("created_at"),
-                    "metadata": data.get("metadata", {}),
-                }
+        Args:
+            tenant_id: ID of the tenant
+            doc_type: Filter by document type
             
-            docs_by_source[source_id]["chunk_count"] += 1
-        
-        return list(docs_by_source.values())
+        Returns:
+            Number of documents
+        """
+        query = self._tenant_documents_query(tenant_id, doc_type)
+        result = await asyncio.to_thread(query.count().get)
+        return int(result[0][0].value)
+    
+    def _tenant_documents_query(self, tenant_id: str, doc_type: str):
+        """Build a registry query for a tenant's documents."""
+        query = self.documents.where("tenant_id", "==", tenant_id)
+        if doc_type != "all":
+            query = query.where("type", "==", doc_type)
+        return query
+    
+    @staticmethod
+    def _document_summary(snapshot) -> dict:
+        """Build a document summary from its registry record."""
+        data = snapshot.to_dict()
+        return {
+            "doc_id": snapshot.id,
+            "type": data.get("type"),
+            "strategy": data.get("strategy"),
+            "chunk_count": data.get("chunk_count", 0),
+            "content_chars": data.get("content_chars", 0),
+            "original_size": data.get("original_size"),
+            "created_at": data.get("created_at"),
+            "updated_at": data.get("updated_at"),
+            "metadata": data.get("metadata", {}),
+        }
     
     async def delete_document(self, doc_id: str, tenant_id: str) -> int:
         """
         Delete a document and all its chunks.
         
+        Legacy documents have no record: their chunks are found by
+        `metadata.source_doc_id` alone.
+        
         Args:
             doc_id: ID of the source document
             tenant_id: ID of the requesting tenant (for authorization)
             
         Returns:
-            Number of chunks deleted
+            Number of chunks deleted (or unlinked, when shared)
+            
+        Raises:
+            LookupError: If the tenant has no such document
         """
-        # Find all chunks for this document
-        query = self.collection.where(
-            "metadata.source_doc_id", "==", doc_id
-        ).where("tenant_id", "==", tenant_id)
+        record = self.documents.document(doc_id)
         
-        deleted = 0
-        batch = self.db.batch()
+        # Deduplicated chunks list every document sharing them in doc_ids;
+        # legacy chunks only have metadata.source_doc_id
+        queries = [
+            self.collection.where("doc_ids", "array_contains", doc_id),
+            self.collection.where("metadata.source_doc_id", "==", doc_id),
+        ]
         
-        for doc in query.stream():
-            batch.delete(doc.reference)
-            deleted += 1
+        def run() -> int:
+            snapshot = record.get()
+            if snapshot.exists and snapshot.get("tenant_id") != tenant_id:
+                raise LookupError(f"Document {doc_id} not found")
+            
+            deleted = 0
+            pending = 0
+            seen = set()
+            batch = self.db.batch()
             
-            # Commit batch every 500 deletes
-            if deleted % 500 == 0:
+            for query in queries:
+                query = query.where("tenant_id", "==", tenant_id).select(["doc_id", "doc_ids"])
+                for doc in query.stream():
+                    if doc.id in seen:
+                        continue
+                    seen.add(doc.id)
+                    
+                    # Chunks shared with other documents are only unlinked
+                    data = doc.to_dict()
+                    others = [other for other in data.get("doc_ids") or [] if other != doc_id]
+                    if others:
+                        fields = {"doc_ids": firestore.ArrayRemove([doc_id])}
+                        if data.get("doc_id") == doc_id:
+                            fields["doc_id"] = others[0]
+                        batch.update(doc.reference, fields)
+                    else:
+                        batch.delete(doc.reference)
+                    deleted += 1
+                    pending += 1
+                    
+                    # Commit batch every 500 writes
+                    if pending == 500:
+                        batch.commit()
+                        batch = self.db.batch()
+                        pending = 0
+            
+            if not snapshot.exists:
+                if not deleted:
+                    raise LookupError(f"Document {doc_id} not found")
                 batch.commit()
-                batch = self.db.batch()
-        
-        if deleted % 500 != 0:
+                return deleted
+            
+            # The record goes last, so a failed delete can be retried
+            batch.delete(record)
             batch.commit()
+            return deleted
         
+        deleted = await asyncio.to_thread(run)
         logger.info(f"Deleted {deleted} chunks for document {doc_id}")
         return deleted
+    
+    async def migrate_compact_schema(self, batch_size: int = 250, dry_run: bool = False) -> dict[str, int]:
+        """
+        Rewrite legacy chunks to the compact schema.
+        
+        Legacy chunks carry a full copy of their document's metadata, with
+        a second copy of the embedding inside it. Each is rewritten with
+        only its own metadata and a `doc_id`, and documents without a record
+        get one built from their first chunk. Compact chunks are skipped,
+        so an interrupted migration can simply be run again.
+        
+        Args:
+            batch_size: Chunks read and rewritten per batch (max 250, as a
+                batch may also create one document record per chunk)
+            dry_run: Only count what would be rewritten
+            
+        Returns:
+            Dict with chunks_scanned, chunks_migrated and documents_registered
+        """
+        batch_size = min(max(1, batch_size), 250)
+        stats = {"chunks_scanned": 0, "chunks_migrated": 0, "documents_registered": 0}
+        registered: set[str] = set()
+        # Records created by this run: doc_id -> characters of chunk content
+        created: dict[str, int] = {}
+        
+        def migrate_page(docs: list) -> None:
+            legacy = []
+            for doc in docs:
+                data = doc.to_dict()
+                metadata = data.get("metadata") or {}
+                if data.get("doc_id") and not ({"embedding", "source_doc_id"} & metadata.keys()):
+                    continue
+                doc_id = data.get("doc_id") or metadata.get("source_doc_id") or doc.id
+                legacy.append((doc, data, metadata, doc_id))
+            if not legacy:
+                return
+            
+            # Documents already registered (e.g. updated since) keep their record
+            new_doc_ids = {doc_id for *_, doc_id in legacy} - registered
+            refs = [self.documents.document(doc_id) for doc_id in new_doc_ids]
+            registered.update(new_doc_ids)
+            existing = {snapshot.id for snapshot in self.db.get_all(refs, field_paths=["type"]) if snapshot.exists}
+            
+            batch = self.db.batch()
+            for doc, data, metadata, doc_id in legacy:
+                chunk_metadata = {k: v for k, v in metadata.items() if k in self.CHUNK_METADATA_KEYS}
+                fields = {"metadata": chunk_metadata, "doc_id": doc_id}
+                if not data.get("doc_ids"):
+                    fields["doc_ids"] = [doc_id]
+                batch.update(doc.reference, fields)
+                stats["chunks_migrated"] += 1
+                
+                if doc_id in created:
+                    created[doc_id] += len(data.get("content", ""))
+                elif doc_id in new_doc_ids and doc_id not in existing:
+                    created[doc_id] = len(data.get("content", ""))
+                    document_metadata = self._document_metadata({
+                        k: v for k, v in metadata.items() if k not in self.CHUNK_METADATA_KEYS
+                    })
+                    batch.set(self.documents.document(doc_id), {
+                        "doc_id": doc_id,
+                        "type": data.get("type"),
+                        "tenant_id": data.get("tenant_id"),
+                        "strategy": metadata.get("strategy"),
+                        "metadata": document_metadata,
+                        "original_size": document_metadata.get("original_size"),
+                        "created_at": _parse_timestamp(metadata.get("ingested_at")) or data.get("created_at"),
+                        "updated_at": data.get("created_at"),
+                    })
+                    stats["documents_registered"] += 1
+            
+            if not dry_run:
+                batch.commit()
+        
+        def run() -> None:
+            last = None
+            while True:
+                query = self.collection.order_by("__name__").limit(batch_size)
+                if last is not None:
+                    query = query.start_after(last)
+                docs = list(query.stream())
+                if not docs:
+                    return
+                
+                stats["chunks_scanned"] += len(docs)
+                migrate_page(docs)
+                last = docs[-1]
+                logger.info(
+                    f"Compact schema migration: {stats['chunks_migrated']}/"
+                    f"{stats['chunks_scanned']} chunks rewritten"
+                )
+        
+        def count_chunks() -> None:
+            # Chunk counts are only known once every chunk has a doc_ids entry
+            for doc_id, content_chars in created.items():
+                count = self.collection.where("doc_ids", "array_contains", doc_id).count().get()
+                self.documents.document(doc_id).update({
+                    "chunk_count": int(count[0][0].value),
+                    "content_chars": content_chars,
+                })
+        
+        await asyncio.to_thread(run)
+        if not dry_run and created:
+            await asyncio.to_thread(count_chunks)
+        
+        logger.info(f"Compact schema migration done: {stats}")
+        return stats
+
+
+def _parse_timestamp(value) -> datetime | None:
+    """Parse an ISO timestamp stored as a string, if valid."""
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
 
 
 @lru_cache
@@ -0,0 +1,373 @@
+"""
+Knowledge base snapshots.
+
+Exports the chunks and document records of one scope (a tenant's private
+documents or the marketplace) to a local directory, and imports them
+back, possibly into another project or scope, without calling the
+embedding model: stored embeddings are written back as they are.
+
+A snapshot directory holds:
+
+- `manifest.json`: format version, source scope, row counts, embedding
+  dimensions and the SHA-256 of every other file
+- `chunks.columns.gz`: chunk content and metadata in a columnar layout;
+  each line is one row group, a JSON object mapping column name to the
+  list of values of its rows (same-typed values next to each other
+  compress much better than row-wise JSON)
+- `embeddings.f32`: embeddings as a raw little-endian float32 matrix, one
+  row per chunk that has an embedding (`has_embedding`), in chunk order
+- `documents.json.gz`: the document records, as stored
+
+Chunk and document IDs are kept when importing into the scope the
+snapshot came from, which makes a restore idempotent. Importing into
+another scope derives new IDs deterministically from the old ones, so
+two scopes of one project never collide and an interrupted import can
+simply be run again.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import uuid
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+
+from app.core.config import settings
+from app.services.knowledge.service import KnowledgeService, get_knowledge_service
+
+logger = logging.getLogger(__name__)
+
+FORMAT_NAME = "nprocess-knowledge-snapshot"
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+CHUNKS_FILE = "chunks.columns.gz"
+EMBEDDINGS_FILE = "embeddings.f32"
+DOCUMENTS_FILE = "documents.json.gz"
+
+CHUNK_COLUMNS = (
+    "id", "content", "content_hash", "chunk_index", "doc_id", "doc_ids",
+    "metadata", "lsh_bands", "near_duplicate_of", "has_embedding",
+)
+
+# Namespace of the IDs derived when importing into another scope
+_REMAP_NAMESPACE = uuid.UUID("6f1d3c2a-9b7e-4e15-8a43-2f0c5d9e7b11")
+
+
+class SnapshotError(ValueError):
+    """Raised for snapshots that are missing, corrupt or incompatible."""
+
+
+def _encode(value):
+    """JSON encoder for values JSON lacks (timestamps)."""
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decode(obj: dict):
+    """JSON object hook reversing `_encode`."""
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def _dumps(value) -> str:
+    """Serialize compactly, keeping timestamps."""
+    return json.dumps(value, default=_encode, ensure_ascii=False, separators=(",", ":"))
+
+
+def _sha256(path: Path) -> str:
+    """Get the SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _float32_bytes(values: list[float]) -> bytes:
+    """Pack floats as little-endian float32."""
+    packed = array("f", values)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _float32_values(data: bytes) -> list[float]:
+    """Unpack little-endian float32 bytes."""
+    packed = array("f")
+    packed.frombytes(data)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return packed.tolist()
+
+
+class SnapshotService:
+    """Exports and imports knowledge base scopes as snapshot directories."""
+
+    def __init__(self, knowledge: KnowledgeService | None = None, row_group_size: int = 1000):
+        """
+        Initialize the snapshot service.
+
+        Args:
+            knowledge: Knowledge service to read from and write to
+            row_group_size: Chunks per row group (and per import write)
+        """
+        self.knowledge = knowledge or get_knowledge_service()
+        self.row_group_size = max(1, row_group_size)
+
+    async def export_snapshot(self, path: str, doc_type: str, tenant_id: str | None) -> dict:
+        """
+        Export a scope to a snapshot directory.
+
+        Args:
+            path: Directory to write (created if needed; snapshot files in
+                it are overwritten)
+            doc_type: "private" or "marketplace"
+            tenant_id: Owner tenant ID (None for marketplace)
+
+        Returns:
+            The snapshot manifest
+
+        Raises:
+            SnapshotError: If the embeddings of the scope have different sizes
+        """
+        directory = Path(path)
+        directory.mkdir(parents=True, exist_ok=True)
+        tenant_id = tenant_id if doc_type == "private" else None
+
+        chunk_count = 0
+        dimensions: int | None = None
+        with gzip.open(directory / CHUNKS_FILE, "wt", encoding="utf-8") as columns_file, \
+                open(directory / EMBEDDINGS_FILE, "wb") as embeddings_file:
+            group: list[dict] = []
+            async for page in self.knowledge.iter_scope_chunks(doc_type, tenant_id, self.row_group_size):
+                for chunk in page:
+                    embedding = chunk["embedding"]
+                    if embedding:
+                        if dimensions is None:
+                            dimensions = len(embedding)
+                        elif len(embedding) != dimensions:
+                            raise SnapshotError(
+                                f"Chunk {chunk['id']} has a {len(embedding)}-dimensional embedding, "
+                                f"others have {dimensions}"
+                            )
+                    group.append(chunk)
+
+                while len(group) >= self.row_group_size:
+                    self._write_row_group(group[:self.row_group_size], columns_file, embeddings_file)
+                    chunk_count += self.row_group_size
+                    group = group[self.row_group_size:]
+
+            if group:
+                self._write_row_group(group, columns_file, embeddings_file)
+                chunk_count += len(group)
+
+        documents = await self.knowledge.get_scope_documents(doc_type, tenant_id)
+        with gzip.open(directory / DOCUMENTS_FILE, "wt", encoding="utf-8") as documents_file:
+            documents_file.write(_dumps(documents))
+
+        manifest = {
+            "format": FORMAT_NAME,
+            "version": FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "source": {"project": settings.gcp_project_id, "doc_type": doc_type, "tenant_id": tenant_id},
+            "chunk_count": chunk_count,
+            "document_count": len(documents),
+            "dimensions": dimensions or 0,
+            "row_group_size": self.row_group_size,
+            "files": {
+                name: {"sha256": _sha256(directory / name), "bytes": (directory / name).stat().st_size}
+                for name in (CHUNKS_FILE, EMBEDDINGS_FILE, DOCUMENTS_FILE)
+            },
+        }
+        tmp_path = directory / (MANIFEST_FILE + ".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp_path, directory / MANIFEST_FILE)
+
+        logger.info(f"Exported {chunk_count} chunks and {len(documents)} documents to {directory}")
+        return manifest
+
+    @staticmethod
+    def _write_row_group(chunks: list[dict], columns_file, embeddings_file) -> None:
+        """Append a row group of chunks to the snapshot files."""
+        columns = {name: [] for name in CHUNK_COLUMNS}
+        for chunk in chunks:
+            for name in CHUNK_COLUMNS[:-1]:
+                columns[name].append(chunk.get(name))
+            columns["has_embedding"].append(bool(chunk["embedding"]))
+        columns_file.write(_dumps(columns) + "\n")
+        embeddings_file.write(b"".join(_float32_bytes(chunk["embedding"]) for chunk in chunks if chunk["embedding"]))
+
+    @staticmethod
+    def read_manifest(path: str) -> dict:
+        """
+        Read and validate the manifest of a snapshot directory.
+
+        Raises:
+            SnapshotError: If the manifest is missing or of another format
+        """
+        manifest_path = Path(path) / MANIFEST_FILE
+        if not manifest_path.exists():
+            raise SnapshotError(f"No snapshot manifest in {path}")
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("format") != FORMAT_NAME:
+            raise SnapshotError(f"{manifest_path} is not a knowledge snapshot manifest")
+        if manifest.get("version") != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')}")
+        return manifest
+
+    async def import_snapshot(
+        self,
+        path: str,
+        doc_type: str | None = None,
+        tenant_id: str | None = None,
+        overwrite: bool = False,
+    ) -> dict[str, int]:
+        """
+        Import a snapshot directory into a scope.
+
+        Chunks are written with bulk writes, embeddings included; nothing
+        is re-embedded. Document records are written after their chunks,
+        so an interrupted import is resumed by running it again: documents
+        that already have a record are skipped unless `overwrite` is set.
+
+        Args:
+            path: Snapshot directory
+            doc_type: Target "private" or "marketplace" (default: the source's)
+            tenant_id: Target tenant (default: the source's; ignored for
+                the marketplace)
+            overwrite: Rewrite documents that already exist in the target
+
+        Returns:
+            Dict with chunks_imported, chunks_skipped, documents_imported
+            and documents_skipped
+
+        Raises:
+            SnapshotError: If the snapshot is invalid or corrupt
+        """
+        directory = Path(path)
+        manifest = self.read_manifest(path)
+        for name, info in manifest["files"].items():
+            if await asyncio.to_thread(_sha256, directory / name) != info["sha256"]:
+                raise SnapshotError(f"Checksum mismatch for {name}: the snapshot is corrupt")
+
+        source = manifest["source"]
+        doc_type = doc_type or source["doc_type"]
+        if doc_type == "private":
+            tenant_id = tenant_id or source["tenant_id"]
+            if not tenant_id:
+                raise SnapshotError("A tenant is required to import into private documents")
+        else:
+            tenant_id = None
+        same_scope = (doc_type, tenant_id) == (source["doc_type"], source["tenant_id"])
+
+        def remap(old_id: str | None) -> str | None:
+            if not old_id or same_scope:
+                return old_id
+            return str(uuid.uuid5(_REMAP_NAMESPACE, f"{doc_type}|{tenant_id or ''}|{old_id}"))
+
+        with gzip.open(directory / DOCUMENTS_FILE, "rt", encoding="utf-8") as f:
+            documents = json.loads(f.read(), object_hook=_decode)
+        existing: set[str] = set()
+        if not overwrite:
+            existing = set(await self.knowledge.get_documents_metadata([remap(d["doc_id"]) for d in documents]))
+
+        stats = {"chunks_imported": 0, "chunks_skipped": 0, "documents_imported": 0, "documents_skipped": 0}
+        dimensions = manifest["dimensions"]
+        row_bytes = dimensions * 4
+
+        with gzip.open(directory / CHUNKS_FILE, "rt", encoding="utf-8") as columns_file, \
+                open(directory / EMBEDDINGS_FILE, "rb") as embeddings_file:
+            for line in columns_file:
+                columns = json.loads(line, object_hook=_decode)
+                rows = len(columns["id"])
+                embedded = sum(columns["has_embedding"])
+                vectors = embeddings_file.read(embedded * row_bytes)
+                if len(vectors) != embedded * row_bytes:
+                    raise SnapshotError("Embeddings file is shorter than the chunk columns")
+                offset = 0
+
+                chunks = []
+                for i in range(rows):
+                    embedding = None
+                    if columns["has_embedding"][i]:
+                        embedding = _float32_values(vectors[offset:offset + row_bytes])
+                        offset += row_bytes
+
+                    doc_id = remap(columns["doc_id"][i])
+                    if doc_id in existing:
+                        stats["chunks_skipped"] += 1
+                        continue
+
+                    metadata = dict(columns["metadata"][i] or {})
+                    if "source_doc_id" in metadata:
+                        metadata["source_doc_id"] = remap(metadata["source_doc_id"])
+                    near_duplicate_of = columns["near_duplicate_of"][i]
+                    if near_duplicate_of:
+                        near_duplicate_of = {
+                            **near_duplicate_of,
+                            "chunk_id": remap(near_duplicate_of.get("chunk_id")),
+                            "doc_id": remap(near_duplicate_of.get("doc_id")),
+                        }
+
+                    chunks.append({
+                        "id": remap(columns["id"][i]),
+                        "content": columns["content"][i],
+                        "embedding": embedding,
+                        "doc_type": doc_type,
+                        "tenant_id": tenant_id,
+                        "metadata": metadata,
+                        "content_hash": columns["content_hash"][i],
+                        "chunk_index": columns["chunk_index"][i],
+                        "doc_id": doc_id,
+                        "doc_ids": [remap(other) for other in columns["doc_ids"][i] or []],
+                        "lsh_bands": columns["lsh_bands"][i],
+                        "near_duplicate_of": near_duplicate_of,
+                    })
+
+                # Chunks are stored linked to their own document; shared
+                # chunks are then linked to the others
+                ids = await self.knowledge.store_chunks_bulk(chunks)
+                links = [
+                    (chunk_id, other)
+                    for chunk_id, chunk in zip(ids, chunks)
+                    for other in chunk["doc_ids"]
+                    if other != chunk["doc_id"]
+                ]
+                if links:
+                    await self.knowledge.link_chunks(links)
+                stats["chunks_imported"] += len(ids)
+                logger.info(f"Snapshot import: {stats['chunks_imported']} chunks written")
+
+        records = []
+        for record in documents:
+            doc_id = remap(record["doc_id"])
+            if doc_id in existing:
+                stats["documents_skipped"] += 1
+                continue
+            record = {**record, "doc_id": doc_id, "type": doc_type, "tenant_id": tenant_id}
+            if record.get("near_duplicate_of"):
+                record["near_duplicate_of"] = {
+                    **record["near_duplicate_of"],
+                    "doc_id": remap(record["near_duplicate_of"].get("doc_id")),
+                }
+            records.append(record)
+        await self.knowledge.store_documents_bulk(records)
+        stats["documents_imported"] = len(records)
+
+        logger.info(f"Imported snapshot {directory}: {stats}")
+        return stats
+
+
+@lru_cache
+def get_snapshot_service() -> SnapshotService:
+    """Get cached snapshot service instance."""
+    return SnapshotService()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Chunking and extraction micro-benchmarks.
+
+Measures SlidingWindowStrategy, LegalDocumentStrategy and PDF text
+extraction over a corpus of long statute-shaped documents, reporting
+chunks per second, MB per second and peak memory, and compares the
+results with a stored baseline so chunker changes cannot silently slow
+down ingestion.
+
+The corpus is generated deterministically (fixed seed) from LGPD text:
+articles with parágrafos, incisos, alíneas and cross-references, plus a
+few oversized articles that exercise the split paths. The same corpus is
+rendered to a PDF for the extraction benchmark.
+
+Throughput is the best of --repeat runs (for PDF extraction, "chunks"
+are pages and MB are PDF file bytes). Peak memory is measured in a
+separate run with tracemalloc (Python allocations of this process; PDF
+pages are extracted in worker processes, so only the reassembly counts).
+
+Absolute throughput depends on the machine and on its load at the time,
+so runs are not compared with the baseline directly: each benchmark is
+timed alternately with a fixed reference workload (regex scanning and
+slicing of the same corpus), and the ratio of the two, the relative
+speed, is what must not drop by more than --tolerance. A baseline is
+still best recorded on the machine that checks it (e.g. the CI runner);
+the machine it was recorded on is stored with it.
+
+Usage:
+    uv run python scripts/benchmark_chunking.py [--scale 1.0] [--repeat 3]
+    uv run python scripts/benchmark_chunking.py --update-baseline
+
+Exit status is 1 if a benchmark regressed beyond --tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# Make the app package importable when run as a script
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+
+# Statutes in the corpus: (name, articles at scale 1.0)
+STATUTES = [("lei-a", 400), ("lei-b", 1500), ("lei-c", 4000)]
+
+# Characters per segment fed to chunk_stream (about one PDF page)
+SEGMENT_CHARS = 4000
+
+# Words, as scanned by the reference workload
+WORD_PATTERN = re.compile(r"\S+")
+
+SENTENCES = [
+    "o tratamento de dados pessoais somente poderá ser realizado mediante o fornecimento de consentimento pelo titular",
+    "para o cumprimento de obrigação legal ou regulatória pelo controlador",
+    "pela administração pública, para o tratamento e uso compartilhado de dados necessários à execução de políticas públicas",
+    "para a realização de estudos por órgão de pesquisa, garantida, sempre que possível, a anonimização dos dados pessoais",
+    "quando necessário para a execução de contrato ou de procedimentos preliminares relacionados a contrato do qual seja parte o titular",
+    "para o exercício regular de direitos em processo judicial, administrativo ou arbitral",
+    "para a proteção da vida ou da incolumidade física do titular ou de terceiro",
+    "o titular dos dados pessoais tem direito a obter do controlador, em relação aos dados do titular por ele tratados, a qualquer momento e mediante requisição, a confirmação da existência de tratamento",
+    "a autoridade nacional poderá dispor sobre padrões e técnicas utilizados em processos de anonimização e realizar verificações acerca de sua segurança",
+    "os agentes de tratamento devem adotar medidas de segurança, técnicas e administrativas aptas a proteger os dados pessoais de acessos não autorizados",
+    "o controlador deverá comunicar à autoridade nacional e ao titular a ocorrência de incidente de segurança que possa acarretar risco ou dano relevante aos titulares",
+    "é vedado o tratamento de dados pessoais sensíveis para fins discriminatórios ilícitos ou abusivos",
+]
+
+
+def _roman(number: int) -> str:
+    """Format a number as a Roman numeral (incisos)."""
+    values = [(1000, "M"), (900, "CM"), (500, "D"), (400, "CD"), (100, "C"), (90, "XC"),
+              (50, "L"), (40, "XL"), (10, "X"), (9, "IX"), (5, "V"), (4, "IV"), (1, "I")]
+    out = ""
+    for value, numeral in values:
+        while number >= value:
+            out += numeral
+            number -= value
+    return out
+
+
+def _sentence(rng: random.Random, articles: int) -> str:
+    """A provision sentence, sometimes citing another article."""
+    text = rng.choice(SENTENCES)
+    if rng.random() < 0.3:
+        text += f", nos termos do art. {rng.randint(1, articles)}º desta Lei"
+    if rng.random() < 0.1:
+        text += f", observado o disposto no § {rng.randint(1, 3)}º do art. {rng.randint(1, articles)}"
+    return text
+
+
+def generate_statute(seed: int, articles: int) -> str:
+    """Generate a long statute-shaped document."""
+    rng = random.Random(seed)
+    lines = ["LEI Nº 99.999, DE 1º DE JANEIRO DE 2030", "", "Dispõe sobre o tratamento de dados.", ""]
+    for number in range(1, articles + 1):
+        label = f"{number}º" if number < 10 else f"{number}."
+        lines.append(f"Art. {label} {_sentence(rng, articles).capitalize()}:")
+
+        # One article in 50 is oversized, to exercise splitting along the tree
+        incisos = rng.randint(0, 6) if number % 50 else 60
+        for inciso in range(1, incisos + 1):
+            lines.append(f"{_roman(inciso)} - {_sentence(rng, articles)};")
+            for alinea in "abc"[:rng.randint(0, 3) if rng.random() < 0.2 else 0]:
+                lines.append(f"{alinea}) {_sentence(rng, articles)};")
+
+        paragraphs = rng.randint(0, 3)
+        if paragraphs == 1:
+            lines.append(f"Parágrafo único. {_sentence(rng, articles).capitalize()}.")
+        else:
+            for paragraph in range(1, paragraphs + 1):
+                lines.append(f"§ {paragraph}º {_sentence(rng, articles).capitalize()}.")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def make_pdf(text: str, path: str, lines_per_page: int = 60, width: int = 95) -> int:
+    """Render text to a simple PDF (Helvetica, WinAnsi); returns the page count."""
+    wrapped = []
+    for line in text.split("\n"):
+        while len(line) > width:
+            cut = line.rfind(" ", 0, width)
+            cut = cut if cut > 0 else width
+            wrapped.append(line[:cut])
+            line = line[cut:].lstrip()
+        wrapped.append(line)
+    pages = [wrapped[i:i + lines_per_page] for i in range(0, len(wrapped), lines_per_page)]
+
+    def escape(line: str) -> bytes:
+        raw = line.encode("cp1252", errors="replace")
+        return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", (
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"
+    )]
+    kids = []
+    for page in pages:
+        page_id = len(objects) + 1
+        kids.append(f"{page_id} 0 R")
+        stream = b"BT /F1 9 Tf 40 770 Td 12 TL " + b" ".join(b"(" + escape(line) + b") '" for line in page) + b" ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+
+    with open(path, "wb") as f:
+        f.write(out)
+    return len(pages)
+
+
+def segments(text: str):
+    """Feed text in page-sized segments, as file ingestion does."""
+    for start in range(0, len(text), SEGMENT_CHARS):
+        yield text[start:start + SEGMENT_CHARS]
+
+
+def reference_workload(corpus: list[str]) -> int:
+    """Machine speed reference: scan and slice the corpus word by word."""
+    total = 0
+    for text in corpus:
+        for segment in segments(text):
+            for match in WORD_PATTERN.finditer(segment):
+                total += len(segment[match.start():match.end()])
+    return total
+
+
+def measure(run, repeat: int, reference) -> dict:
+    """
+    Time `run` and `reference` alternately (best of `repeat` each), then
+    measure the peak memory of `run`.
+    """
+    best = reference_best = float("inf")
+    chunks = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        reference()
+        reference_best = min(reference_best, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        chunks = run()
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": best,
+        "reference_seconds": reference_best,
+        "chunks": chunks,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def run_benchmarks(args) -> dict[str, dict]:
+    """Run every benchmark over the corpus."""
+    from app.services.ingestion.chunking import get_chunking_strategy
+    from app.services.ingestion.extraction import iter_pdf_pages, shutdown_pdf_executor
+
+    print("🔄 Generating corpus...")
+    corpus = [
+        generate_statute(seed, max(1, int(articles * args.scale)))
+        for seed, (_, articles) in enumerate(STATUTES)
+    ]
+    text_bytes = sum(len(text.encode("utf-8")) for text in corpus)
+    print(f"   {len(corpus)} statutes, {text_bytes / 1024 / 1024:.1f} MB")
+
+    strategies = {
+        "sliding_window": get_chunking_strategy("sliding_window"),
+        "legal_document": get_chunking_strategy("legal_document"),
+    }
+    results = {}
+
+    def reference():
+        return reference_workload(corpus)
+
+    for name, strategy in strategies.items():
+        def run(strategy=strategy):
+            return sum(sum(1 for _ in strategy.chunk_stream(segments(text), {})) for text in corpus)
+
+        print(f"⏱️  {name}...")
+        results[name] = {**measure(run, args.repeat, reference), "bytes": text_bytes}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_paths = []
+        pages = 0
+        for i, text in enumerate(corpus):
+            path = os.path.join(tmp, f"statute-{i}.pdf")
+            pages += make_pdf(text, path)
+            pdf_paths.append(path)
+        pdf_bytes = sum(os.path.getsize(path) for path in pdf_paths)
+
+        def run_pdf():
+            return sum(sum(1 for _ in iter_pdf_pages(path, workers=args.pdf_workers)) for path in pdf_paths)
+
+        print(f"⏱️  pdf_extraction ({pages} pages)...")
+        try:
+            # The first run also starts the worker pool
+            results["pdf_extraction"] = {**measure(run_pdf, args.repeat, reference), "bytes": pdf_bytes}
+        finally:
+            shutdown_pdf_executor()
+
+    for result in results.values():
+        result["chunks_per_second"] = result["chunks"] / result["seconds"]
+        result["mb_per_second"] = result["bytes"] / 1024 / 1024 / result["seconds"]
+        # Throughput in units of the reference workload (machine independent)
+        result["relative_speed"] = result["reference_seconds"] / result["seconds"]
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict, args) -> bool:
+    """Print results against the baseline; returns True if anything regressed."""
+    regressed = False
+    stored = baseline.get("results", {})
+
+    print(f"\n{'benchmark':<16} {'chunks':>8} {'chunks/s':>10} {'MB/s':>8} {'peak MB':>8}  vs baseline")
+    for name, result in results.items():
+        line = (
+            f"{name:<16} {result['chunks']:>8} {result['chunks_per_second']:>10.0f} "
+            f"{result['mb_per_second']:>8.2f} {result['peak_mb']:>8.1f}"
+        )
+        base = stored.get(name)
+        if base and "relative_speed" not in base:
+            line += "  (baseline has no relative speed, run --update-baseline)"
+        elif base:
+            speed = result["relative_speed"] / base["relative_speed"]
+            memory = result["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+            notes = [f"{speed:.2f}x speed", f"{memory:.2f}x memory"]
+            if speed < 1 - args.tolerance:
+                notes.append("❌ slower")
+                regressed = True
+            if memory > 1 + args.memory_tolerance:
+                notes.append("❌ more memory")
+                regressed = True
+            if result["chunks"] != base["chunks"]:
+                notes.append(f"⚠️  chunk count changed (was {base['chunks']})")
+            line += "  " + ", ".join(notes)
+        else:
+            line += "  (no baseline)"
+        print(line)
+
+    if baseline.get("scale") not in (None, args.scale):
+        print(f"\n⚠️  Baseline was recorded at scale {baseline['scale']}, this run used {args.scale}")
+    if baseline.get("machine") and baseline["machine"] != _machine():
+        print(
+            f"\n⚠️  Baseline was recorded on a different machine: {baseline['machine']} "
+            "(speeds are relative to the reference workload, but may still not compare)"
+        )
+    return regressed
+
+
+def _machine() -> dict:
+    """Describe the machine, to tell when a baseline is not comparable."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(terse=True),
+        "cpus": os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking and PDF extraction benchmarks")
+    parser.add_argument("--scale", type=float, default=1.0, help="Corpus size multiplier")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (best is kept)")
+    parser.add_argument("--pdf-workers", type=int, default=0, help="PDF extraction processes (0 = one per CPU)")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.3, help="Allowed drop of speed relative to the reference (0.3 = 30%%)"
+    )
+    parser.add_argument("--memory-tolerance", type=float, default=0.25, help="Allowed peak memory growth")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline JSON path")
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+
+    args = parser.parse_args()
+    args.repeat = max(1, args.repeat)
+
+    results = run_benchmarks(args)
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8")) if baseline_path.exists() else {}
+    regressed = compare(results, baseline, args)
+
+    if args.update_baseline:
+        data = {
+            "scale": args.scale,
+            "machine": _machine(),
+            "results": {
+                name: {key: round(value, 4) if isinstance(value, float) else value for key, value in result.items()}
+                for name, result in results.items()
+            },
+        }
+        baseline_path.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+        print(f"\n✅ Baseline written to {baseline_path}")
+    elif regressed:
+        print("\n❌ Regression against the baseline")
+        sys.exit(1)
+    else:
+        print("\n✅ No regression")
+
+
+if __name__ == "__main__":
+    main()
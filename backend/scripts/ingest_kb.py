@@ -1,81 +1,235 @@
 #!/usr/bin/env python3
 """
 n.process Ingestion Tool
-Ingest documents into the Knowledge Store via API.
+Ingest files and directories into the Knowledge Store via API.
+
+Directories are walked recursively. Files (text, Markdown, PDF) are
+uploaded to `/knowledge/ingest/file` concurrently over one pooled HTTP/2
+client; the server extracts and chunks them in streaming mode.
+
+A local manifest maps the SHA-256 of each uploaded file to its doc_id, so
+an interrupted run can simply be started again: files already in the
+manifest are skipped without being uploaded.
 
 Usage:
-    uv run python scripts/ingest_kb.py --token <FIREBASE_ID_TOKEN> --file <PATH_TO_FILE>
+    uv run python scripts/ingest_kb.py --token <FIREBASE_ID_TOKEN> <PATH> [<PATH> ...]
 
 Example:
-    uv run python scripts/ingest_kb.py --token "eyJ..." --file "docs/my_policy.txt"
+    uv run python scripts/ingest_kb.py --token "eyJ..." docs/policies/ docs/lgpd.pdf --strategy legal
 """
 
 import argparse
-import sys
+import asyncio
+import hashlib
+import json
 import os
-import httpx
+import sys
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
+import httpx
+
 # Use the production URL by default if deployed, else local
 API_URL = "https://nprocess-api-1040576944774.us-central1.run.app/v1"
 # API_URL = "http://localhost:8000/v1"  # Uncomment for local dev
 
-def ingest_file(token, file_path, strategy="default"):
-    path = Path(file_path)
-    if not path.exists():
-        print(f"❌ File not found: {file_path}")
-        return
-
-    content = path.read_text(encoding="utf-8")
-    
-    # Determine metadata
-    filename = path.name
-    
-    payload = {
-        "content": content,
-        "doc_type": "private",  # Ingest as private doc for the user's org
-        "strategy": strategy,
-        "metadata": {
-            "title": filename,
-            "source": "ingest_kb cli"
-        }
-    }
-    
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
-    
-    print(f"🔄 Ingesting '{filename}' into Private Knowledge Base...")
-    
-    try:
-        response = httpx.post(
-            f"{API_URL}/knowledge/ingest",
-            json=payload,
-            headers=headers,
-            timeout=60.0
-        )
-        
-        if response.status_code == 200:
-            data = response.json()
-            print(f"\n✅ Success!")
-            print(f"Document ID: {data['doc_id']}")
-            print(f"Chunks created: {data['chunks_count']}")
+DEFAULT_EXTENSIONS = (".txt", ".md", ".pdf")
+CONTENT_TYPES = {".pdf": "application/pdf", ".md": "text/markdown"}
+
+# Responses worth retrying (rate limiting, transient server errors)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class Manifest:
+    """Local record of uploaded files: SHA-256 → doc_id (JSON, rewritten atomically)."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.files: dict[str, dict] = {}
+        self._lock = asyncio.Lock()
+        if path.exists():
+            self.files = json.loads(path.read_text(encoding="utf-8")).get("files", {})
+
+    def get(self, file_hash: str, strategy: str, doc_type: str) -> dict | None:
+        """Get the entry of a file uploaded with the same options."""
+        entry = self.files.get(file_hash)
+        if entry and entry.get("strategy") == strategy and entry.get("doc_type") == doc_type:
+            return entry
+        return None
+
+    async def add(self, file_hash: str, entry: dict) -> None:
+        """Record an uploaded file and save the manifest."""
+        async with self._lock:
+            self.files[file_hash] = entry
+            data = json.dumps({"version": 1, "files": self.files}, indent=2, ensure_ascii=False)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            await asyncio.to_thread(tmp_path.write_text, data, encoding="utf-8")
+            os.replace(tmp_path, self.path)
+
+
+def iter_files(paths: list[str], extensions: tuple[str, ...]):
+    """Yield files to ingest: given files as is, directories walked recursively."""
+    for raw_path in paths:
+        path = Path(raw_path)
+        if path.is_file():
+            yield path
+        elif path.is_dir():
+            for child in sorted(path.rglob("*")):
+                if child.is_file() and child.suffix.lower() in extensions and not child.name.startswith("."):
+                    yield child
         else:
-            print(f"\n❌ Error {response.status_code}: {response.text}")
-            
-    except Exception as e:
-        print(f"\n❌ Request failed: {e}")
+            print(f"❌ Not found: {raw_path}")
+
+
+def hash_file(path: Path) -> str:
+    """Get the SHA-256 of a file (the same hash the API deduplicates on)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(1024 * 1024):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_client(args) -> httpx.AsyncClient:
+    """Create the pooled HTTP client (HTTP/2 if the h2 package is installed)."""
+    try:
+        import h2  # noqa: F401
+        http2 = True
+    except ImportError:
+        print("⚠️  h2 not installed, using HTTP/1.1 (install with: uv pip install 'httpx[http2]')")
+        http2 = False
+
+    return httpx.AsyncClient(
+        base_url=args.api_url,
+        headers={"Authorization": f"Bearer {args.token}"},
+        http2=http2,
+        limits=httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency),
+        timeout=httpx.Timeout(args.timeout, connect=10.0),
+    )
+
+
+async def upload(client: httpx.AsyncClient, path: Path, args) -> dict:
+    """Upload one file, retrying transient failures with exponential backoff."""
+    data = {
+        "doc_type": args.doc_type,
+        "strategy": args.strategy,
+        "metadata": json.dumps({"title": path.name, "source": "ingest_kb cli", "path": str(path)}),
+    }
+    content_type = CONTENT_TYPES.get(path.suffix.lower(), "text/plain")
+
+    for attempt in range(args.retries + 1):
+        try:
+            with open(path, "rb") as f:
+                response = await client.post(
+                    "/knowledge/ingest/file",
+                    data=data,
+                    files={"file": (path.name, f, content_type)},
+                )
+            if response.status_code == 200:
+                return response.json()
+            if response.status_code not in RETRY_STATUS or attempt == args.retries:
+                raise RuntimeError(f"HTTP {response.status_code}: {response.text[:300]}")
+        except httpx.TransportError as e:
+            if attempt == args.retries:
+                raise RuntimeError(f"Request failed: {e}") from e
+
+        await asyncio.sleep(2 ** attempt)
+
+    raise RuntimeError("Retries exhausted")
+
+
+async def ingest(args) -> int:
+    """Ingest all files; returns the number of failures."""
+    manifest = Manifest(Path(args.manifest))
+    extensions = tuple(f".{ext.lstrip('.').lower()}" for ext in args.extensions)
+    queue: asyncio.Queue[Path | None] = asyncio.Queue(maxsize=args.concurrency * 2)
+    stats = {"ingested": 0, "skipped": 0, "duplicates": 0, "failed": 0, "chunks": 0}
+    # Hashes seen in this run (identical files are uploaded once)
+    seen: set[str] = set()
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        while (path := await queue.get()) is not None:
+            try:
+                file_hash = await asyncio.to_thread(hash_file, path)
+                entry = manifest.get(file_hash, args.strategy, args.doc_type)
+                if entry and not args.force:
+                    stats["skipped"] += 1
+                    print(f"⏭️  {path} (already ingested as {entry['doc_id']})")
+                    continue
+                if file_hash in seen:
+                    stats["skipped"] += 1
+                    print(f"⏭️  {path} (same content as another file in this run)")
+                    continue
+                seen.add(file_hash)
+
+                start = time.perf_counter()
+                result = await upload(client, path, args)
+                elapsed = time.perf_counter() - start
+
+                await manifest.add(file_hash, {
+                    "doc_id": result["doc_id"],
+                    "path": str(path),
+                    "chunk_count": result.get("chunk_count", 0),
+                    "strategy": args.strategy,
+                    "doc_type": args.doc_type,
+                    "ingested_at": datetime.now(timezone.utc).isoformat(),
+                })
+                if result.get("file_duplicate"):
+                    stats["duplicates"] += 1
+                stats["ingested"] += 1
+                stats["chunks"] += result.get("chunk_count", 0)
+                print(f"✅ {path} → {result['doc_id']} ({result.get('chunk_count', 0)} chunks, {elapsed:.1f}s)")
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"❌ {path}: {e}")
+
+    print(f"🔄 Ingesting into {args.doc_type} knowledge base ({args.concurrency} concurrent uploads)...")
+    started = time.perf_counter()
+
+    async with make_client(args) as client:
+        workers = [asyncio.create_task(worker(client)) for _ in range(args.concurrency)]
+        for path in iter_files(args.paths, extensions):
+            await queue.put(path)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+
+    print(f"\n📊 Done in {time.perf_counter() - started:.1f}s")
+    print(f"   Ingested: {stats['ingested']} ({stats['duplicates']} already on the server)")
+    print(f"   Skipped (in manifest or repeated): {stats['skipped']}")
+    print(f"   Failed: {stats['failed']}")
+    print(f"   Chunks created: {stats['chunks']}")
+    print(f"   Manifest: {args.manifest}")
+    return stats["failed"]
+
 
 def main():
     parser = argparse.ArgumentParser(description="n.process Ingestion CLI")
+    parser.add_argument("paths", nargs="*", help="Files or directories to ingest")
     parser.add_argument("--token", required=True, help="Firebase ID Token (get from /debug/token)")
-    parser.add_argument("--file", required=True, help="Path to text document")
+    parser.add_argument("--file", action="append", default=[], help="File to ingest (same as a path argument)")
     parser.add_argument("--strategy", default="default", choices=["default", "legal"], help="Chunking strategy")
-    
+    parser.add_argument("--doc-type", default="private", choices=["private", "marketplace"], help="Document type")
+    parser.add_argument("--api-url", default=os.environ.get("NPROCESS_API_URL", API_URL), help="API base URL")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--retries", type=int, default=3, help="Retries per file on transient errors")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument(
+        "--extensions", nargs="+", default=list(DEFAULT_EXTENSIONS), help="File extensions picked up in directories"
+    )
+    parser.add_argument("--manifest", default=".ingest_kb_manifest.json", help="Resume manifest path")
+    parser.add_argument("--force", action="store_true", help="Upload files even if they are in the manifest")
+
     args = parser.parse_args()
-    
-    ingest_file(args.token, args.file, args.strategy)
+    args.paths = args.paths + args.file
+    args.concurrency = max(1, args.concurrency)
+    if not args.paths:
+        parser.error("no files or directories given")
+
+    failed = asyncio.run(ingest(args))
+    sys.exit(1 if failed else 0)
+
 
 if __name__ == "__main__":
     main()
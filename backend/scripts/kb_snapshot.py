@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Export and import knowledge base snapshots.
+
+A snapshot holds the chunks (with their embeddings) and document records
+of a tenant's private documents or of the marketplace. Importing writes
+them back with bulk writes and no embedding calls, which makes it the
+cheap way to seed an environment or move a knowledge base between
+projects.
+
+Usage:
+    uv run python scripts/kb_snapshot.py export <DIR> --doc-type private --tenant-id <TENANT>
+    uv run python scripts/kb_snapshot.py export <DIR> --doc-type marketplace
+    uv run python scripts/kb_snapshot.py import <DIR> [--doc-type ...] [--tenant-id ...] [--overwrite]
+
+Point GCP_PROJECT_ID at the source project to export and at the target
+project to import.
+"""
+
+import argparse
+import asyncio
+import sys
+
+
+async def export(args):
+    """Export a scope to a snapshot directory."""
+    from app.services.knowledge.snapshot import get_snapshot_service
+
+    scope = f"tenant {args.tenant_id}" if args.doc_type == "private" else "marketplace"
+    print(f"🔄 Exporting {scope} knowledge base to {args.path}...")
+
+    manifest = await get_snapshot_service().export_snapshot(args.path, args.doc_type, args.tenant_id)
+
+    size = sum(info["bytes"] for info in manifest["files"].values())
+    print("\n✅ Export complete!")
+    print(f"   Chunks: {manifest['chunk_count']}")
+    print(f"   Documents: {manifest['document_count']}")
+    print(f"   Embedding dimensions: {manifest['dimensions']}")
+    print(f"   Size: {size / 1024 / 1024:.1f} MB")
+
+
+async def import_(args):
+    """Import a snapshot directory."""
+    from app.services.knowledge.snapshot import get_snapshot_service
+
+    service = get_snapshot_service()
+    manifest = service.read_manifest(args.path)
+    source = manifest["source"]
+    print(
+        f"🔄 Importing {manifest['chunk_count']} chunks and {manifest['document_count']} documents "
+        f"(exported from {source['project'] or 'unknown project'}, {source['doc_type']})..."
+    )
+
+    stats = await service.import_snapshot(
+        args.path,
+        doc_type=args.doc_type,
+        tenant_id=args.tenant_id,
+        overwrite=args.overwrite,
+    )
+
+    print("\n✅ Import complete!")
+    print(f"   Chunks written: {stats['chunks_imported']} (skipped: {stats['chunks_skipped']})")
+    print(f"   Documents written: {stats['documents_imported']} (already present: {stats['documents_skipped']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Knowledge base snapshots")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a scope to a snapshot directory")
+    export_parser.add_argument("path", help="Snapshot directory")
+    export_parser.add_argument("--doc-type", default="private", choices=["private", "marketplace"])
+    export_parser.add_argument("--tenant-id", help="Tenant to export (private documents)")
+
+    import_parser = subparsers.add_parser("import", help="Import a snapshot directory")
+    import_parser.add_argument("path", help="Snapshot directory")
+    import_parser.add_argument("--doc-type", choices=["private", "marketplace"], help="Target (default: source)")
+    import_parser.add_argument("--tenant-id", help="Target tenant (default: source tenant)")
+    import_parser.add_argument("--overwrite", action="store_true", help="Rewrite documents already imported")
+
+    args = parser.parse_args()
+
+    from app.services.knowledge.snapshot import SnapshotError
+
+    try:
+        if args.command == "export":
+            if args.doc_type == "private" and not args.tenant_id:
+                parser.error("--tenant-id is required to export private documents")
+            asyncio.run(export(args))
+        else:
+            asyncio.run(import_(args))
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
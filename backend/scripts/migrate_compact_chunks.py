@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Migrate knowledge base chunks to the compact schema.
+
+Legacy chunks store a copy of their embedding and of the whole document
+metadata inside `metadata`. This rewrites them to hold only their own
+metadata plus a `doc_id`, and creates the `documents` records that hold
+the document metadata once. Already migrated chunks are skipped, so the
+script can be re-run after an interruption.
+
+Usage:
+    uv run python scripts/migrate_compact_chunks.py [--dry-run] [--batch-size 250]
+"""
+
+import argparse
+import asyncio
+
+
+async def migrate(args):
+    """Run the migration."""
+    from app.services.knowledge.service import get_knowledge_service
+
+    knowledge_service = get_knowledge_service()
+
+    mode = "Dry run" if args.dry_run else "Migration"
+    print(f"🔄 {mode} of chunks in '{knowledge_service.COLLECTION_NAME}'...")
+
+    stats = await knowledge_service.migrate_compact_schema(
+        batch_size=args.batch_size,
+        dry_run=args.dry_run,
+    )
+
+    print(f"\n✅ {mode} complete!")
+    print(f"   Chunks scanned: {stats['chunks_scanned']}")
+    print(f"   Chunks rewritten: {stats['chunks_migrated']}")
+    print(f"   Document records created: {stats['documents_registered']}")
+    if args.dry_run:
+        print("\n⚠️  Nothing was written. Run without --dry-run to migrate.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate chunks to the compact schema")
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be rewritten")
+    parser.add_argument("--batch-size", type=int, default=250, help="Chunks per batch (max 250)")
+
+    args = parser.parse_args()
+    asyncio.run(migrate(args))
+
+
+if __name__ == "__main__":
+    main()
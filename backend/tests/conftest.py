@@ -0,0 +1,27 @@
+import pytest
+
+from app.services.ingestion.service import IngestionService
+from app.services.knowledge.service import KnowledgeService
+from fakes import FakeEmbeddingService, FakeFirestore
+
+
+@pytest.fixture
+def db():
+    return FakeFirestore()
+
+
+@pytest.fixture
+def knowledge(db):
+    service = KnowledgeService()
+    service._db = db
+    return service
+
+
+@pytest.fixture
+def embedding():
+    return FakeEmbeddingService()
+
+
+@pytest.fixture
+def ingestion(embedding, knowledge):
+    return IngestionService(embedding, knowledge)
@@ -0,0 +1,303 @@
+"""
+In-memory fakes of Firestore and the embedding service.
+
+The Firestore fake implements the subset of the sync client used by
+`KnowledgeService`: documents, batches, `get_all`, and queries with
+filters, ordering, cursors, projections, counts and vector search.
+"""
+import copy
+import math
+import uuid
+
+from google.cloud import firestore
+from google.cloud.firestore_v1.vector import Vector
+
+DELETE = firestore.DELETE_FIELD
+
+
+def _get(d, path):
+    for part in path.split("."):
+        if not isinstance(d, dict) or part not in d:
+            return None
+        d = d[part]
+    return d
+
+
+def _set_path(d, path, value):
+    parts = path.split(".")
+    for p in parts[:-1]:
+        d = d.setdefault(p, {})
+    d[parts[-1]] = value
+
+
+def _apply(d, fields):
+    for k, v in fields.items():
+        name = type(v).__name__
+        if v is DELETE:
+            d.pop(k, None)
+        elif name == "ArrayUnion":
+            cur = list(_get(d, k) or [])
+            for x in v.values:
+                if x not in cur:
+                    cur.append(x)
+            _set_path(d, k, cur)
+        elif name == "ArrayRemove":
+            cur = [x for x in (_get(d, k) or []) if x not in v.values]
+            _set_path(d, k, cur)
+        elif name == "Increment":
+            _set_path(d, k, (_get(d, k) or 0) + v.value)
+        else:
+            _set_path(d, k, v)
+
+
+class Snap:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return _get(self._data, field)
+
+
+class Ref:
+    def __init__(self, coll, id):
+        self.coll = coll
+        self.id = id
+        self.path = f"{coll.name}/{id}"
+
+    def set(self, data, merge=False):
+        store = self.coll.store
+        if merge and self.id in store:
+            _apply(store[self.id], data)
+        else:
+            store[self.id] = {}
+            _apply(store[self.id], data)
+        self.coll.db.writes += 1
+
+    def update(self, data):
+        if self.id not in self.coll.store:
+            raise KeyError(f"NotFound {self.path}")
+        _apply(self.coll.store[self.id], data)
+        self.coll.db.writes += 1
+
+    def delete(self):
+        self.coll.store.pop(self.id, None)
+        self.coll.db.writes += 1
+
+    def get(self, field_paths=None):
+        self.coll.db.reads += 1
+        return Snap(self, copy.deepcopy(self.coll.store.get(self.id)))
+
+
+class Count:
+    def __init__(self, value):
+        self.value = value
+
+
+class Query:
+    def __init__(self, coll, filters=(), limit_=None, order=(), after=None, fields=None, nearest=None, offset_=0):
+        self.coll = coll
+        self.filters = list(filters)
+        self.limit_ = limit_
+        self.order = list(order)
+        self.after = after
+        self.fields = fields
+        self.nearest = nearest
+        self.offset_ = offset_
+
+    def _clone(self, **kw):
+        q = Query(self.coll, self.filters, self.limit_, self.order, self.after, self.fields, self.nearest, self.offset_)
+        for k, v in kw.items():
+            setattr(q, k, v)
+        return q
+
+    def where(self, field=None, op=None, value=None, filter=None):
+        if filter is not None:
+            field, op, value = filter.field_path, filter.op_string, filter.value
+        return self._clone(filters=self.filters + [(field, op, value)])
+
+    def limit(self, n):
+        return self._clone(limit_=n)
+
+    def offset(self, n):
+        return self._clone(offset_=n)
+
+    def order_by(self, field, direction="ASCENDING"):
+        return self._clone(order=self.order + [(field, direction)])
+
+    def start_after(self, snap):
+        return self._clone(after=snap)
+
+    def select(self, fields):
+        return self._clone(fields=list(fields))
+
+    def find_nearest(self, vector_field, query_vector, limit, distance_measure, *, distance_result_field=None, distance_threshold=None):
+        return self._clone(nearest=(vector_field, list(query_vector), limit, distance_result_field))
+
+    def count(self):
+        q = self
+
+        class Agg:
+            def get(self_):
+                return [[Count(len(q._run()))]]
+        return Agg()
+
+    def _match(self, d):
+        for field, op, value in self.filters:
+            v = _get(d, field)
+            if op == "==" and v != value:
+                return False
+            if op == "in" and v not in value:
+                return False
+            if op == "array_contains" and (not isinstance(v, list) or value not in v):
+                return False
+            if op == "array_contains_any" and (not isinstance(v, list) or not set(v) & set(value)):
+                return False
+            if op == ">=" and (v is None or v < value):
+                return False
+            if op == "<" and (v is None or v >= value):
+                return False
+            if op == "<=" and (v is None or v > value):
+                return False
+            if op == ">" and (v is None or v <= value):
+                return False
+        return True
+
+    def _key(self, item):
+        id, d = item
+        out = []
+        for field, _ in self.order:
+            out.append(id if field == "__name__" else _get(d, field))
+        if self.order and self.order[-1][0] != "__name__":
+            # Firestore breaks ties by document ID
+            out.append(id)
+        return out
+
+    def _run(self):
+        items = [(k, v) for k, v in self.coll.store.items() if self._match(v)]
+        if self.nearest:
+            field, qv, lim, res = self.nearest
+            scored = []
+            for k, v in items:
+                vec = v.get(field)
+                if vec is None:
+                    continue
+                vec = list(vec)
+                dot = sum(a * b for a, b in zip(vec, qv))
+                na = math.sqrt(sum(a * a for a in vec)) or 1
+                nb = math.sqrt(sum(b * b for b in qv)) or 1
+                scored.append((1 - dot / (na * nb), k, v))
+            scored.sort(key=lambda x: x[0])
+            items = []
+            for dist, k, v in scored[:lim]:
+                v = dict(v)
+                if res:
+                    v[res] = dist
+                items.append((k, v))
+        elif self.order:
+            desc = any(d == "DESCENDING" for _, d in self.order)
+            items.sort(key=lambda it: [(x is None, x) for x in self._key(it)], reverse=desc)
+            if self.after is not None:
+                key = self._key((self.after.id, self.after._data or {}))
+                idx = [i for i, it in enumerate(items) if self._key(it) == key]
+                items = items[idx[0] + 1:] if idx else items
+        items = items[self.offset_:]
+        if self.limit_ is not None:
+            items = items[: self.limit_]
+        return items
+
+    def stream(self):
+        self.coll.db.queries += 1
+        for k, v in self._run():
+            data = copy.deepcopy(v)
+            if self.fields is not None:
+                proj = {}
+                for f in self.fields:
+                    val = _get(data, f)
+                    if val is not None:
+                        _set_path(proj, f, val)
+                data = proj
+            self.coll.db.reads += 1
+            yield Snap(Ref(self.coll, k), data)
+
+    def get(self):
+        return list(self.stream())
+
+
+class Coll(Query):
+    def __init__(self, db, name):
+        super().__init__(self)
+        self.db = db
+        self.name = name
+        self.store = db.data.setdefault(name, {})
+
+    def document(self, id=None):
+        return Ref(self, id or str(uuid.uuid4()))
+
+
+class Batch:
+    def __init__(self, db):
+        self.db = db
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append(lambda: ref.set(data, merge=merge))
+
+    def update(self, ref, data):
+        self.ops.append(lambda: ref.update(data))
+
+    def delete(self, ref):
+        self.ops.append(ref.delete)
+
+    def create(self, ref, data):
+        def op():
+            if ref.id in ref.coll.store:
+                raise ValueError("AlreadyExists")
+            ref.set(data)
+        self.ops.append(op)
+
+    def commit(self):
+        if len(self.ops) > 500:
+            raise ValueError("too many ops in batch")
+        self.db.commits += 1
+        for op in self.ops:
+            op()
+
+
+class FakeFirestore:
+    def __init__(self):
+        self.data = {}
+        self.reads = self.writes = self.queries = self.commits = 0
+
+    def collection(self, name):
+        return Coll(self, name)
+
+    def batch(self):
+        return Batch(self)
+
+    def get_all(self, refs, field_paths=None):
+        for ref in refs:
+            yield ref.get()
+
+
+
+class FakeEmbeddingService:
+    """Embedding service returning small deterministic vectors."""
+
+    def __init__(self):
+        self.batches: list[list[str]] = []
+
+    async def embed_batch(self, texts: list[str], timeout: float | None = None) -> list[list[float]]:
+        self.batches.append(list(texts))
+        return [[float(len(text)), float(sum(map(ord, text)) % 97), 1.0] for text in texts]
+
+    async def embed(self, text: str, timeout: float | None = None) -> list[float]:
+        return (await self.embed_batch([text]))[0]
@@ -0,0 +1,85 @@
+import pytest
+
+from app.core.config import settings
+from app.services.ingestion.bulk import BulkItem
+from app.services.ingestion.chunking import SlidingWindowStrategy
+
+
+def text(name: str, paragraphs: int = 3) -> str:
+    return "\n\n".join(f"{name}: parágrafo {i} com texto suficiente para formar um trecho." for i in range(paragraphs))
+
+
+async def items(*entries):
+    for entry in entries:
+        yield entry
+
+
+async def run(ingestion, *entries):
+    results = [result async for result in ingestion.ingest_bulk(items(*entries), "t1")]
+    return {r["name"]: r for r in results[:-1]}, results[-1]["summary"]
+
+
+def live_chunks(db, doc_id):
+    return [
+        chunk for chunk in db.data["knowledge_base"].values()
+        if doc_id in chunk["doc_ids"] and not chunk.get("tombstone")
+    ]
+
+
+@pytest.fixture(autouse=True)
+def small_batches(monkeypatch):
+    monkeypatch.setattr(settings, "ingest_embed_batch_size", 1)
+
+
+async def test_documents_are_registered_after_their_chunks(ingestion, db):
+    results, summary = await run(ingestion, BulkItem("a", text("a")), BulkItem("b", text("b")))
+
+    assert summary["completed"] == 2
+    for result in results.values():
+        assert result["status"] == "completed"
+        assert result["doc_id"] in db.data["documents"]
+        assert len(live_chunks(db, result["doc_id"])) == result["chunk_count"]
+
+
+async def test_failed_batch_removes_the_document(monkeypatch, ingestion, knowledge, db):
+    store = knowledge.store_chunks_bulk
+
+    async def store_chunks_bulk(chunks):
+        if any("falha" in chunk["content"] for chunk in chunks):
+            raise RuntimeError("write failed")
+        return await store(chunks)
+
+    monkeypatch.setattr(knowledge, "store_chunks_bulk", store_chunks_bulk)
+    content = text("c", 2) + "\n\n" + "falha: este parágrafo não pode ser gravado no banco."
+    results, summary = await run(ingestion, BulkItem("c", content), BulkItem("d", text("d")))
+
+    assert results["c"]["status"] == "failed"
+    assert results["d"]["status"] == "completed"
+    assert summary["failed"] == 1
+    assert results["c"]["doc_id"] not in db.data.get("documents", {})
+    assert live_chunks(db, results["c"]["doc_id"]) == []
+
+
+async def test_document_failing_while_chunking_removes_its_chunks(monkeypatch, ingestion, db):
+    chunk = SlidingWindowStrategy.chunk
+
+    def chunk_then_fail(self, content, metadata=None):
+        yield from chunk(self, content, metadata)
+        if "quebra" in content:
+            raise ValueError("broken document")
+
+    monkeypatch.setattr(SlidingWindowStrategy, "chunk", chunk_then_fail)
+    shared = text("e")
+    results, summary = await run(
+        ingestion,
+        BulkItem("e", shared),
+        BulkItem("f", shared + "\n\n" + text("quebra")),
+    )
+
+    assert results["f"]["status"] == "failed"
+    assert results["f"]["error"] == "broken document"
+    assert results["f"]["doc_id"] not in db.data.get("documents", {})
+    assert live_chunks(db, results["f"]["doc_id"]) == []
+    # Chunks shared with a completed document are only unlinked
+    assert len(live_chunks(db, results["e"]["doc_id"])) == results["e"]["chunk_count"]
+    assert summary["completed"] == 1
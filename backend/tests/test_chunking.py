@@ -0,0 +1,110 @@
+import re
+
+import pytest
+
+from app.services.ingestion.chunking import LegalDocumentStrategy, SlidingWindowStrategy
+
+LAW = """LEI Nº 13.709, DE 14 DE AGOSTO DE 2018
+Dispõe sobre a proteção de dados pessoais.
+Art. 1º Esta Lei dispõe sobre o tratamento de dados pessoais.
+Parágrafo único. As normas gerais contidas nesta Lei são de interesse nacional.
+Art. 2º A disciplina da proteção de dados pessoais tem como fundamentos:
+I - o respeito à privacidade;
+II - a autodeterminação informativa;
+2018 - ano de publicação desta Lei, mencionado apenas como referência;
+Art. 3º Esta Lei aplica-se a qualquer operação de tratamento:
+§ 1º Consideram-se coletados no território nacional os dados pessoais:
+a) cujo titular nele se encontre;
+b) coletados no território nacional.
+Art. 1.024 Artigo com número de milhar.
+"""
+
+
+def spans(chunks):
+    return [(c.content, c.metadata.get("article"), c.metadata["char_start"]) for c in chunks]
+
+
+def test_parse_builds_structure_tree():
+    units = LegalDocumentStrategy().parse(LAW)
+
+    assert [u.kind for u in units] == ["preamble", "article", "article", "article", "article"]
+    assert [u.label for u in units[1:]] == ["1", "2", "3", "1024"]
+    assert [(c.kind, c.label) for c in units[2].children] == [("inciso", "I"), ("inciso", "II")]
+    assert [(c.kind, c.label) for c in units[3].children[0].children] == [("alinea", "a"), ("alinea", "b")]
+
+
+def test_year_lines_are_not_incisos():
+    units = LegalDocumentStrategy().parse("Art. 5º Vigência:\nI - imediata;\n2018 - ano de referência;\n")
+
+    assert [c.label for c in units[0].children] == ["I"]
+
+
+def test_streamed_chunks_match_whole_text():
+    strategy = LegalDocumentStrategy()
+    whole = strategy.chunk(LAW, {"source_doc_id": "d1"})
+
+    for size in (1, 7, 16, 64, len(LAW)):
+        segments = [LAW[i:i + size] for i in range(0, len(LAW), size)]
+        streamed = list(strategy.chunk_stream(segments, {"source_doc_id": "d1"}))
+        assert spans(streamed) == spans(whole)
+        assert [c.index for c in streamed] == list(range(len(whole)))
+
+
+def test_stream_flushes_at_indented_articles():
+    strategy = LegalDocumentStrategy()
+    consumed = []
+
+    def segments():
+        for n in range(1, 4):
+            consumed.append(n)
+            yield f"  Art. {n}º Texto do artigo {n}.\n"
+
+    stream = strategy.chunk_stream(segments())
+    first = next(stream)
+
+    assert first.metadata["article"] == "1"
+    assert consumed == [1, 2]
+
+
+SEPARATORS = [" ", "  ", "\n", "\t ", " \n\n "]
+PROSE = "\n\n  " + "".join(f"palavra{i}{SEPARATORS[i % 5]}" for i in range(53)) + " \n\t "
+
+
+def window_fields(chunks):
+    return [(c.content, c.char_start, c.char_end, dict(c.metadata)) for c in chunks]
+
+
+@pytest.mark.parametrize("chunk_size, overlap", [(10, 3), (10, 0), (1, 0), (60, 5)])
+def test_sliding_window_offsets_follow_words(chunk_size, overlap):
+    words = list(re.finditer(r"\S+", PROSE))
+    chunks = SlidingWindowStrategy(chunk_size=chunk_size, overlap=overlap).chunk(PROSE, {"source_doc_id": "d1"})
+
+    starts = list(range(0, len(words) - overlap, chunk_size - overlap)) or [0]
+    assert len(chunks) == len(starts)
+    for i, (chunk, first) in enumerate(zip(chunks, starts)):
+        last = min(first + chunk_size, len(words)) - 1
+        assert chunk.content == PROSE[chunk.char_start:chunk.char_end]
+        # Windows start and end on a word, keeping the whitespace inside
+        assert (chunk.char_start, chunk.char_end) == (words[first].start(), words[last].end())
+        assert (chunk.metadata["token_start"], chunk.metadata["token_end"]) == (first, last + 1)
+        assert chunk.metadata["chunk_index"] == chunk.index == i
+        assert chunk.metadata["source_doc_id"] == "d1"
+    assert chunks[-1].char_end == words[-1].end()
+
+
+def test_sliding_window_skips_blank_text():
+    strategy = SlidingWindowStrategy(chunk_size=10, overlap=3)
+
+    assert strategy.chunk(" \n\t ") == []
+    assert list(strategy.chunk_stream(["", "  ", "\n"])) == []
+
+
+def test_sliding_window_stream_matches_whole_text():
+    strategy = SlidingWindowStrategy(chunk_size=10, overlap=3)
+    whole = strategy.chunk(PROSE, {"source_doc_id": "d1"})
+
+    # Segment boundaries fall inside words and inside whitespace runs
+    for size in (1, 3, 8, 64, len(PROSE)):
+        segments = [PROSE[i:i + size] for i in range(0, len(PROSE), size)]
+        streamed = list(strategy.chunk_stream(segments, {"source_doc_id": "d1"}))
+        assert window_fields(streamed) == window_fields(whole)
@@ -0,0 +1,35 @@
+TEXT = "\n\n".join(f"Cláusula {i}. O fornecedor deve manter registros da operação {i} por cinco anos." for i in range(40))
+
+
+async def test_identical_chunks_are_stored_and_embedded_once(ingestion, embedding, db):
+    first = await ingestion.ingest_text(TEXT, "t1")
+    embedded = sum(len(batch) for batch in embedding.batches)
+    second = await ingestion.ingest_text(TEXT, "t1")
+
+    assert second["chunks_new"] == 0
+    assert second["chunks_reused"] == second["chunk_count"]
+    assert sum(len(batch) for batch in embedding.batches) == embedded
+    chunks = db.data["knowledge_base"].values()
+    assert len(chunks) == first["chunk_count"]
+    assert all(set(c["doc_ids"]) == {first["doc_id"], second["doc_id"]} for c in chunks)
+
+
+async def test_private_chunks_are_not_shared_across_tenants(ingestion, db):
+    first = await ingestion.ingest_text(TEXT, "t1")
+    second = await ingestion.ingest_text(TEXT, "t2")
+
+    assert second["chunks_new"] == second["chunk_count"]
+    assert len(db.data["knowledge_base"]) == first["chunk_count"] + second["chunk_count"]
+
+
+async def test_same_file_returns_existing_document(ingestion, embedding, tmp_path):
+    path = tmp_path / "contrato.txt"
+    path.write_text(TEXT, encoding="utf-8")
+    first = await ingestion.ingest_file_path(str(path), "contrato.txt", "t1")
+    calls = len(embedding.batches)
+    second = await ingestion.ingest_file_path(str(path), "contrato.txt", "t1")
+
+    assert second["file_duplicate"] is True
+    assert second["doc_id"] == first["doc_id"]
+    assert second["chunk_count"] == first["chunk_count"]
+    assert len(embedding.batches) == calls
@@ -0,0 +1,83 @@
+import pytest
+
+TEXT = "\n\n".join(f"Seção {i}. O contratante deve guardar o recibo {i} por dois anos." for i in range(20))
+
+
+async def test_delete_registered_document(ingestion, knowledge, db):
+    doc = await ingestion.ingest_text(TEXT, "t1")
+
+    assert await knowledge.delete_document(doc["doc_id"], "t1") == doc["chunk_count"]
+    assert db.data["knowledge_base"] == {}
+    assert doc["doc_id"] not in db.data["documents"]
+
+
+async def test_delete_unlinks_shared_chunks(ingestion, knowledge, db):
+    first = await ingestion.ingest_text(TEXT, "t1")
+    second = await ingestion.ingest_text(TEXT, "t1")
+
+    await knowledge.delete_document(second["doc_id"], "t1")
+
+    chunks = db.data["knowledge_base"].values()
+    assert len(chunks) == first["chunk_count"]
+    assert all(c["doc_ids"] == [first["doc_id"]] for c in chunks)
+
+
+async def test_delete_legacy_document_without_record(knowledge, db):
+    chunks = db.collection("knowledge_base")
+    for i in range(3):
+        chunks.document(f"legacy-{i}").set({
+            "content": f"trecho {i}",
+            "tenant_id": "t1",
+            "type": "private",
+            "metadata": {"source_doc_id": "legacy-doc"},
+        })
+
+    assert await knowledge.delete_document("legacy-doc", "t1") == 3
+    assert db.data["knowledge_base"] == {}
+
+
+async def test_delete_requires_ownership(ingestion, knowledge, db):
+    doc = await ingestion.ingest_text(TEXT, "t1")
+
+    with pytest.raises(LookupError):
+        await knowledge.delete_document(doc["doc_id"], "t2")
+    with pytest.raises(LookupError):
+        await knowledge.delete_document("missing", "t1")
+    assert len(db.data["knowledge_base"]) == doc["chunk_count"]
+
+
+async def test_paging_lists_every_document_once(ingestion, knowledge, db):
+    doc_ids = [(await ingestion.ingest_text(f"{TEXT}\n\nDocumento {i}.", "t1"))["doc_id"] for i in range(7)]
+    await ingestion.ingest_text(TEXT, "t2")
+    await ingestion.ingest_text(TEXT, "t1", doc_type="marketplace")
+    # Equal timestamps are ordered by document ID
+    for doc_id in doc_ids[2:5]:
+        db.data["documents"][doc_id]["created_at"] = db.data["documents"][doc_ids[2]]["created_at"]
+
+    async def list_all() -> list[str]:
+        listed, cursor = [], None
+        while True:
+            page, cursor = await knowledge.get_documents("t1", limit=3, cursor=cursor)
+            assert len(page) <= 3
+            listed.extend(doc["doc_id"] for doc in page)
+            if cursor is None:
+                return listed
+
+    listed = await list_all()
+    assert len(listed) == len(set(listed)) == await knowledge.count_documents("t1") == 7
+    assert set(listed) == set(doc_ids)
+    created = [db.data["documents"][doc_id]["created_at"] for doc_id in listed]
+    assert created == sorted(created, reverse=True)
+
+    await knowledge.delete_document(doc_ids[3], "t1")
+
+    listed = await list_all()
+    assert len(listed) == await knowledge.count_documents("t1") == 6
+    assert set(listed) == set(doc_ids) - {doc_ids[3]}
+
+
+async def test_paging_rejects_foreign_cursor(ingestion, knowledge):
+    foreign = await ingestion.ingest_text(TEXT, "t2")
+
+    with pytest.raises(ValueError):
+        await knowledge.get_documents("t1", cursor=foreign["doc_id"])
@@ -0,0 +1,210 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services.ai import embedding as embedding_module
+from app.services.ai.backends import EmbeddingBackend, HashingEmbeddingBackend
+from app.services.ai.coalescer import EmbeddingCoalescer
+from app.services.ai.embedding import EmbeddingService
+from app.services.ai.tokens import estimate_tokens
+
+
+class RecordingBackend(EmbeddingBackend):
+    """Backend returning one-dimensional vectors, recording each request."""
+
+    def __init__(self, delay: float = 0.0, failures: int = 0):
+        self.delay = delay
+        self.failures = failures
+        self.requests: list[list[str]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return "recording"
+
+    @property
+    def dimension(self) -> int:
+        return 1
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.requests.append(list(texts))
+            failing = self.failures > 0
+            self.failures -= 1
+        if failing:
+            raise RuntimeError("model unavailable")
+        threading.Event().wait(self.delay)
+        return [[float(len(text))] for text in texts]
+
+
+class ConcurrencyBackend(RecordingBackend):
+    """Recording backend that tracks the most requests run at once."""
+
+    def __init__(self, delay: float):
+        super().__init__(delay=delay)
+        self.running = 0
+        self.peak = 0
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            return super().embed_texts(texts)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+class RecordingEmbedder:
+    """Async `embed_many` returning one-dimensional vectors, recording each call."""
+
+    def __init__(self, error: Exception | None = None):
+        self.error = error
+        self.calls: list[list[str]] = []
+
+    async def __call__(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        if self.error:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def executor():
+    yield
+    embedding_module.shutdown_embedding_executor()
+
+
+async def test_failures_are_retried():
+    backend = RecordingBackend(failures=1)
+    service = EmbeddingService(backend=backend)
+
+    assert await service.embed_batch(["abc"]) == [[3.0]]
+    assert len(backend.requests) == 2
+
+
+async def test_timeouts_are_not_retried():
+    backend = RecordingBackend(delay=0.2)
+    service = EmbeddingService(backend=backend, timeout=0.01)
+
+    with pytest.raises(TimeoutError):
+        await service.embed_batch(["abc"])
+    assert len(backend.requests) == 1
+
+
+def test_hashing_backend_numpy_matches_pure_python():
+    pytest.importorskip("numpy")
+    texts = ["Art. 1º O titular tem direito à informação", "o titular TEM direito a informacao", "", "..."]
+    backend = HashingEmbeddingBackend(dimension=64)
+    vectorized = backend.embed_texts(texts)
+    backend._numpy = None
+
+    for a, b in zip(vectorized, backend.embed_texts(texts)):
+        assert a == pytest.approx(b)
+    assert vectorized[0] != vectorized[1]
+    assert sum(a * b for a, b in zip(vectorized[0], vectorized[1])) > 0.5
+    assert vectorized[2] == [0.0] * 64
+
+
+def test_pack_respects_backend_limits():
+    backend = RecordingBackend()
+    backend.max_batch = 4
+    backend.max_batch_tokens = 100
+    service = EmbeddingService(backend=backend)
+    inputs = ["palavra " * n for n in (5, 30, 60, 5, 5, 5, 5, 5, 90, 1)]
+
+    batches = service._pack(inputs)
+
+    assert batches[0][0] == 0 and batches[-1][1] == len(inputs)
+    assert all(a[1] == b[0] for a, b in zip(batches, batches[1:]))
+    for start, end in batches:
+        assert end - start <= 4
+        assert end - start == 1 or sum(estimate_tokens(text) for text in inputs[start:end]) <= 100
+
+
+async def test_batches_run_concurrently_and_keep_order(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_batch_concurrency", 3)
+    backend = ConcurrencyBackend(delay=0.02)
+    backend.max_batch = 5
+    service = EmbeddingService(backend=backend)
+    texts = ["x" * n for n in range(1, 41)]
+
+    vectors = await service.embed_batch(texts)
+
+    assert vectors == [[float(n)] for n in range(1, 41)]
+    assert len(backend.requests) == 8
+    assert backend.peak == 3
+
+
+async def test_long_texts_are_split_and_pooled():
+    backend = RecordingBackend()
+    service = EmbeddingService(backend=backend, max_tokens=20)
+
+    (vector,) = await service.embed_batch(["palavra " * 200])
+
+    assert all(estimate_tokens(text) <= 20 for batch in backend.requests for text in batch)
+    assert sum(len(batch) for batch in backend.requests) > 1
+    assert vector == pytest.approx([1.0])
+
+
+async def test_coalescer_flushes_full_batch_without_waiting():
+    embed_many = RecordingEmbedder()
+    coalescer = EmbeddingCoalescer(embed_many, window_ms=60_000, max_batch=3)
+
+    vectors = await asyncio.wait_for(
+        asyncio.gather(*(coalescer.embed(text) for text in ("a", "bb", "ccc"))), timeout=1
+    )
+
+    assert vectors == [[1.0], [2.0], [3.0]]
+    assert embed_many.calls == [["a", "bb", "ccc"]]
+
+
+async def test_coalescer_flushes_partial_batch_after_window():
+    embed_many = RecordingEmbedder()
+    coalescer = EmbeddingCoalescer(embed_many, window_ms=20, max_batch=32)
+
+    first = asyncio.ensure_future(coalescer.embed("a"))
+    second = asyncio.ensure_future(coalescer.embed("bb"))
+    await asyncio.sleep(0)
+    assert embed_many.calls == []
+
+    assert await asyncio.wait_for(asyncio.gather(first, second), timeout=1) == [[1.0], [2.0]]
+    assert embed_many.calls == [["a", "bb"]]
+
+
+async def test_coalescer_embeds_identical_texts_once():
+    embed_many = RecordingEmbedder()
+    coalescer = EmbeddingCoalescer(embed_many, window_ms=5)
+
+    vectors = await asyncio.gather(*(coalescer.embed(text) for text in ("a", "bb", "a")))
+
+    assert embed_many.calls == [["a", "bb"]]
+    assert vectors == [[1.0], [2.0], [1.0]]
+    assert vectors[0] is not vectors[2]
+
+
+async def test_coalescer_failure_fails_every_caller():
+    embed_many = RecordingEmbedder(error=RuntimeError("model unavailable"))
+    coalescer = EmbeddingCoalescer(embed_many, window_ms=5)
+
+    results = await asyncio.gather(*(coalescer.embed(text) for text in ("a", "bb", "ccc")), return_exceptions=True)
+
+    assert len(embed_many.calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_coalescer_drops_cancelled_callers():
+    embed_many = RecordingEmbedder()
+    coalescer = EmbeddingCoalescer(embed_many, window_ms=20)
+
+    kept = asyncio.ensure_future(coalescer.embed("a"))
+    cancelled = asyncio.ensure_future(coalescer.embed("bb"))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert await asyncio.wait_for(kept, timeout=1) == [1.0]
+    assert cancelled.cancelled()
+    assert embed_many.calls == [["a"]]
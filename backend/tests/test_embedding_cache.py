@@ -0,0 +1,85 @@
+import time
+import unicodedata
+
+import pytest
+
+from app.services.ai import cache as cache_module
+from app.services.ai.cache import REQUESTS, EmbeddingCache, cache_key
+
+
+class Clock:
+    """Stand-in for the `time` module with a settable wall clock."""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module, "time", clock)
+    return clock
+
+
+def test_cache_key_normalizes_text():
+    composed = "informação  pessoal"
+    decomposed = unicodedata.normalize("NFD", "informação\n\tpessoal ")
+    assert decomposed.split()[0] != composed.split()[0]
+
+    assert cache_key("m", composed) == cache_key("m", decomposed)
+    assert cache_key("m", composed) != cache_key("m", "informacao pessoal")
+    assert cache_key("m", composed) != cache_key("other", composed)
+
+
+async def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache(max_entries=2)
+    await cache.put("a", [1.0])
+    await cache.put("b", [2.0])
+    assert await cache.get("a") == [1.0]
+
+    await cache.put("c", [3.0])
+
+    assert len(cache) == 2
+    assert await cache.get("b") is None
+    assert await cache.get("a") == [1.0]
+    assert await cache.get("c") == [3.0]
+
+
+async def test_memory_entries_expire(clock):
+    cache = EmbeddingCache(ttl_seconds=60)
+    await cache.put("a", [1.0])
+
+    clock.now += 59
+    assert await cache.get("a") == [1.0]
+    clock.now += 2
+    assert await cache.get("a") is None
+    assert len(cache) == 0
+
+
+async def test_store_survives_a_new_instance(tmp_path):
+    path = str(tmp_path / "cache" / "embeddings.sqlite")
+    await EmbeddingCache(path=path).put("a", [0.5, -1.25])
+
+    cache = EmbeddingCache(path=path)
+    disk_hits = REQUESTS.value(result="disk_hit")
+    assert len(cache) == 0
+
+    assert await cache.get("a") == [0.5, -1.25]
+    assert REQUESTS.value(result="disk_hit") == disk_hits + 1
+    assert len(cache) == 1
+    assert await cache.get("b") is None
+
+
+async def test_store_entries_expire(tmp_path, clock):
+    path = str(tmp_path / "embeddings.sqlite")
+    await EmbeddingCache(ttl_seconds=60, path=path).put("a", [1.0])
+
+    clock.now += 61
+    assert await EmbeddingCache(ttl_seconds=60, path=path).get("a") is None
+
+    # Expired rows are dropped when the store is opened
+    cache = EmbeddingCache(ttl_seconds=60, path=path)
+    assert cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] == 0
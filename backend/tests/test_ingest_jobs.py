@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.routers import knowledge as knowledge_router
+from app.schemas.auth import CurrentUser
+
+RESULT = {
+    "doc_id": "doc-1",
+    "chunk_count": 2,
+    "strategy": "default",
+    "doc_type": "private",
+    "tenant_id": "t1",
+    "created_at": "2024-01-01T00:00:00",
+}
+
+
+@pytest.fixture(autouse=True)
+def jobs_db(monkeypatch, db):
+    monkeypatch.setattr(knowledge_router, "get_db", lambda: db)
+    return db
+
+
+def user(org_id: str) -> CurrentUser:
+    return CurrentUser(uid="u1", email="u1@example.com", org_id=org_id, role="developer", status="active")
+
+
+async def wait_for_jobs() -> None:
+    await asyncio.wait_for(asyncio.gather(*knowledge_router._ingest_tasks), timeout=1)
+
+
+async def test_job_runs_from_pending_to_completed(db):
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def ingest(progress):
+        started.set()
+        progress.chunks_created = progress.chunks_stored = 2
+        await release.wait()
+        return RESULT
+
+    job = await knowledge_router._start_ingest_job("knowledge_ingest", "t1", {"content_chars": 10}, ingest)
+    assert job.status == "pending"
+    assert db.data["jobs"][job.job_id]["status"] == "pending"
+
+    await started.wait()
+    polled = await knowledge_router.get_ingest_job(job.job_id, user("t1"))
+    assert polled.status == "processing"
+
+    release.set()
+    await wait_for_jobs()
+
+    polled = await knowledge_router.get_ingest_job(job.job_id, user("t1"))
+    assert polled.status == "completed"
+    assert polled.result.doc_id == "doc-1"
+    assert polled.progress.chunks_stored == 2
+    assert polled.error is None
+
+
+async def test_failed_ingest_marks_job_failed():
+    async def ingest(progress):
+        progress.pages_extracted = 3
+        raise ValueError("Unsupported file type")
+
+    job = await knowledge_router._start_ingest_job("knowledge_ingest_file", "t1", {}, ingest)
+    await wait_for_jobs()
+
+    polled = await knowledge_router.get_ingest_job(job.job_id, user("t1"))
+    assert polled.status == "failed"
+    assert polled.error == "Unsupported file type"
+    assert polled.result is None
+    assert polled.progress.pages_extracted == 3
+
+
+async def test_cancelled_job_is_marked_failed(db):
+    async def ingest(progress):
+        await asyncio.Event().wait()
+
+    job = await knowledge_router._start_ingest_job("knowledge_ingest", "t1", {}, ingest)
+    await asyncio.sleep(0.01)
+    (task,) = knowledge_router._ingest_tasks
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert db.data["jobs"][job.job_id]["status"] == "failed"
+    assert db.data["jobs"][job.job_id]["error"] == "Job cancelled before completion"
+
+
+async def test_job_reads_are_tenant_scoped(db):
+    async def ingest(progress):
+        return RESULT
+
+    job = await knowledge_router._start_ingest_job("knowledge_ingest", "t1", {}, ingest)
+    await wait_for_jobs()
+
+    with pytest.raises(HTTPException) as denied:
+        await knowledge_router.get_ingest_job(job.job_id, user("t2"))
+    assert denied.value.status_code == 403
+
+    db.collection("jobs").document("other").set({"job_id": "other", "type": "process", "tenant_id": "t1"})
+    for job_id in ("other", "missing"):
+        with pytest.raises(HTTPException) as missing:
+            await knowledge_router.get_ingest_job(job_id, user("t1"))
+        assert missing.value.status_code == 404
@@ -0,0 +1,47 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import metrics
+from app.core.config import settings
+from app.routers import health
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(health.router)
+    return TestClient(app)
+
+
+def test_metric_subclasses_must_render():
+    class Gauge(metrics._Metric):
+        kind = "gauge"
+
+    with pytest.raises(TypeError):
+        Gauge("nprocess_test_gauge", "A gauge without render")
+
+
+def test_counter_renders_prometheus_text():
+    counter = metrics.Counter("nprocess_test_requests_total", "Test requests", ("route",))
+    counter.inc(route="/a")
+    counter.inc(2, route="/a")
+
+    text = metrics.render_prometheus()
+
+    assert "# TYPE nprocess_test_requests_total counter" in text
+    assert 'nprocess_test_requests_total{route="/a"} 3' in text
+
+
+def test_metrics_are_disabled_by_default(client):
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_token(monkeypatch, client):
+    monkeypatch.setattr(settings, "metrics_enabled", True)
+    assert client.get("/metrics").status_code == 200
+
+    monkeypatch.setattr(settings, "metrics_token", "s3cret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,85 @@
+import argparse
+import copy
+
+from app.services.knowledge import service as knowledge_module
+from scripts import migrate_compact_chunks
+
+
+def seed_legacy(db):
+    """Seed two legacy documents, one of them already registered, and a compact chunk."""
+    chunks = db.collection("knowledge_base")
+    for doc_id, count in (("lei-1", 3), ("lei-2", 2)):
+        for i in range(count):
+            chunks.document(f"{doc_id}-{i}").set({
+                "content": f"Art. {i + 1}º Texto {doc_id}.",
+                "tenant_id": "t1",
+                "type": "private",
+                "embedding": [0.1, 0.2],
+                "created_at": "2024-01-02T00:00:00",
+                "metadata": {
+                    "source_doc_id": doc_id,
+                    "doc_type": "private",
+                    "embedding": [0.1, 0.2],
+                    "strategy": "legal",
+                    "chunk_index": i,
+                    "article": str(i + 1),
+                    "title": f"Lei {doc_id}",
+                    "original_size": 1000,
+                    "ingested_at": "2024-01-01T12:00:00",
+                },
+            })
+    chunks.document("compact").set({
+        "content": "Já migrado.",
+        "tenant_id": "t1",
+        "type": "private",
+        "doc_id": "lei-3",
+        "doc_ids": ["lei-3"],
+        "metadata": {"chunk_index": 0},
+    })
+    db.collection("documents").document("lei-2").set({"doc_id": "lei-2", "type": "private", "tenant_id": "t1"})
+
+
+async def test_migration_builds_records_and_strips_chunks(knowledge, db):
+    seed_legacy(db)
+
+    stats = await knowledge.migrate_compact_schema(batch_size=2)
+
+    assert stats == {"chunks_scanned": 6, "chunks_migrated": 5, "documents_registered": 1}
+    for chunk_id, chunk in db.data["knowledge_base"].items():
+        if chunk_id == "compact":
+            continue
+        doc_id = chunk_id.rsplit("-", 1)[0]
+        assert chunk["doc_id"] == doc_id
+        assert chunk["doc_ids"] == [doc_id]
+        assert set(chunk["metadata"]) == {"strategy", "chunk_index", "article"}
+
+    record = db.data["documents"]["lei-1"]
+    assert record["tenant_id"] == "t1" and record["type"] == "private"
+    assert record["strategy"] == "legal"
+    assert record["metadata"]["title"] == "Lei lei-1"
+    assert not {"embedding", "source_doc_id", "doc_type"} & record["metadata"].keys()
+    assert record["chunk_count"] == 3
+    assert record["created_at"].year == 2024
+    assert db.data["documents"]["lei-2"] == {"doc_id": "lei-2", "type": "private", "tenant_id": "t1"}
+
+
+async def test_migration_is_idempotent(knowledge, db):
+    seed_legacy(db)
+    await knowledge.migrate_compact_schema(batch_size=2)
+    migrated = copy.deepcopy(db.data)
+
+    stats = await knowledge.migrate_compact_schema(batch_size=2)
+
+    assert stats == {"chunks_scanned": 6, "chunks_migrated": 0, "documents_registered": 0}
+    assert db.data == migrated
+
+
+async def test_script_dry_run_writes_nothing(monkeypatch, knowledge, db, capsys):
+    seed_legacy(db)
+    seeded = copy.deepcopy(db.data)
+    monkeypatch.setattr(knowledge_module, "get_knowledge_service", lambda: knowledge)
+
+    await migrate_compact_chunks.migrate(argparse.Namespace(dry_run=True, batch_size=250))
+
+    assert db.data == seeded
+    assert "Chunks rewritten: 5" in capsys.readouterr().out
@@ -0,0 +1,71 @@
+from app.core.config import settings
+from app.services.ingestion import minhash
+
+LAW = (
+    "Art. 1º Esta Lei dispõe sobre o tratamento de dados pessoais, inclusive nos meios digitais, por pessoa "
+    "natural ou por pessoa jurídica de direito público ou privado, com o objetivo de proteger os direitos "
+    "fundamentais de liberdade e de privacidade.\n"
+    "Art. 2º A disciplina da proteção de dados pessoais tem como fundamentos o respeito à privacidade, a "
+    "autodeterminação informativa, a liberdade de expressão, de informação, de comunicação e de opinião.\n"
+)
+VARIANT = LAW.replace("Art. 1º", "Art. 1o").replace("privacidade.", "privacidade .").upper()
+
+
+def setup_function():
+    minhash.get_minhash_lsh.cache_clear()
+
+
+async def test_near_dedupe_is_off_by_default(ingestion, db):
+    first = await ingestion.ingest_text(LAW, "t1", strategy="legal", doc_type="marketplace")
+    second = await ingestion.ingest_text(VARIANT, "t1", strategy="legal", doc_type="marketplace")
+
+    assert second["chunks_near_duplicate"] == 0
+    assert second["chunks_new"] == second["chunk_count"]
+    chunks = db.data["knowledge_base"].values()
+    assert len(chunks) == first["chunk_count"] + second["chunk_count"]
+    assert not any("near_duplicate_of" in c for c in chunks)
+    assert not any("near_duplicate_of" in d for d in db.data["documents"].values())
+
+
+async def test_flag_marks_near_duplicates(monkeypatch, ingestion, db):
+    monkeypatch.setattr(settings, "near_dedupe_action", "flag")
+    first = await ingestion.ingest_text(LAW, "t1", strategy="legal", doc_type="marketplace")
+    second = await ingestion.ingest_text(VARIANT, "t1", strategy="legal", doc_type="marketplace")
+
+    assert first["chunks_near_duplicate"] == 0
+    assert second["chunks_near_duplicate"] == second["chunk_count"]
+    assert second["chunks_new"] == second["chunk_count"]
+    flagged = [c for c in db.data["knowledge_base"].values() if "near_duplicate_of" in c]
+    assert len(flagged) == second["chunk_count"]
+    assert {c["near_duplicate_of"]["doc_id"] for c in flagged} == {first["doc_id"]}
+
+
+async def test_skip_links_near_duplicates(monkeypatch, ingestion, db):
+    monkeypatch.setattr(settings, "near_dedupe_action", "skip")
+    first = await ingestion.ingest_text(LAW, "t1", strategy="legal", doc_type="marketplace")
+    second = await ingestion.ingest_text(VARIANT, "t1", strategy="legal", doc_type="marketplace")
+
+    assert second["chunks_new"] == 0
+    chunks = db.data["knowledge_base"].values()
+    assert len(chunks) == first["chunk_count"]
+    assert all(set(c["doc_ids"]) == {first["doc_id"], second["doc_id"]} for c in chunks)
+
+
+async def test_lookup_failure_does_not_fail_ingest(monkeypatch, ingestion, knowledge, db):
+    monkeypatch.setattr(settings, "near_dedupe_action", "flag")
+
+    async def fail(*args, **kwargs):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(knowledge, "find_near_duplicate_chunks", fail)
+    monkeypatch.setattr(knowledge, "find_near_duplicate_documents", fail)
+    result = await ingestion.ingest_text(LAW, "t1", strategy="legal", doc_type="marketplace")
+
+    assert result["chunk_count"] > 0
+    assert result["chunks_near_duplicate"] == 0
+    record = db.data["documents"][result["doc_id"]]
+    assert record["lsh_bands"]
+    assert "near_duplicate_of" not in record
+    chunks = db.data["knowledge_base"].values()
+    assert len(chunks) == result["chunk_count"]
+    assert all(c["doc_ids"] == [result["doc_id"]] for c in chunks)
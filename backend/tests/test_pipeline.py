@@ -0,0 +1,23 @@
+from app.services.ai.tokens import estimate_tokens
+from app.services.ingestion.chunking import Chunk
+from app.services.ingestion.pipeline import IngestPipeline
+
+
+def chunk(index: int, words: int) -> Chunk:
+    return Chunk(content=" ".join(f"termo{index}x{i}" for i in range(words)), index=index, metadata={})
+
+
+async def test_batches_are_bounded_by_size_and_tokens(embedding, knowledge):
+    pipeline = IngestPipeline(embedding, knowledge, batch_size=10, batch_max_tokens=300)
+    chunks = [chunk(i, words) for i, words in enumerate([40, 40, 40, 200, 10, 10] + [5] * 14)]
+
+    for item in chunks:
+        await pipeline.put(item, "private", "t1")
+    chunk_ids = await pipeline.join()
+
+    assert len(chunk_ids) == len(chunks)
+    assert len(embedding.batches) > 2  # Size alone would make two batches
+    assert [text for batch in embedding.batches for text in batch] == [c.content for c in chunks]
+    for batch in embedding.batches:
+        assert len(batch) <= 10
+        assert len(batch) == 1 or sum(estimate_tokens(text) for text in batch) <= 300
@@ -0,0 +1,26 @@
+def law(*numbers: int) -> str:
+    return "".join(f"Art. {n}º O controlador deve observar o disposto no art. 1º para a obrigação {n}.\n" for n in numbers)
+
+
+async def test_get_provisions_follows_references(ingestion, knowledge):
+    doc = await ingestion.ingest_text(law(1, 2, 3), "t1", strategy="legal", metadata={"law": "Lei 13.709"})
+    chunks = await knowledge.get_document_chunks(doc["doc_id"], "t1")
+    (second,) = [c for c in chunks if c["metadata"]["article"] == "2"]
+    references = second["metadata"]["references"]
+    assert references
+
+    found = await knowledge.get_provisions(references, "t1")
+
+    assert [hit["metadata"]["provision"] for hit in found] == references
+    assert all(hit["score"] is None for hit in found)
+
+
+async def test_get_provisions_skips_tombstoned_chunks(ingestion, knowledge):
+    doc = await ingestion.ingest_text(law(1, 2, 3), "t1", strategy="legal", metadata={"law": "Lei 13.709"})
+    chunks = await knowledge.get_document_chunks(doc["doc_id"], "t1")
+    provisions = sorted(c["metadata"]["provision"] for c in chunks)
+
+    await ingestion.update_document(doc["doc_id"], law(1, 3), "t1", strategy="legal", metadata={"law": "Lei 13.709"})
+    found = await knowledge.get_provisions(provisions, "t1")
+
+    assert sorted(hit["metadata"]["provision"] for hit in found) == [p for p in provisions if not p.endswith(":2")]
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.knowledge.service import KnowledgeService
+from app.services.knowledge.snapshot import SnapshotError, SnapshotService
+from fakes import FakeFirestore
+
+TEXT = "".join(f"Art. {i}º A empresa deve arquivar o documento {i} por cinco anos.\n" for i in range(1, 31))
+
+
+async def scope_chunks(knowledge, doc_type, tenant_id):
+    return [chunk async for page in knowledge.iter_scope_chunks(doc_type, tenant_id) for chunk in page]
+
+
+@pytest.fixture
+async def snapshot(ingestion, knowledge, tmp_path):
+    await ingestion.ingest_text(TEXT, "t1", strategy="legal")
+    await ingestion.ingest_text(TEXT + "Art. 31º Esta Lei entra em vigor na data de sua publicação.\n", "t1", strategy="legal")
+    await ingestion.ingest_text("Outro tenant com outro conteúdo.", "t2")
+    manifest = await SnapshotService(knowledge, row_group_size=4).export_snapshot(str(tmp_path), "private", "t1")
+    return tmp_path, manifest
+
+
+async def test_round_trip_restores_chunks_and_documents(snapshot, knowledge):
+    path, manifest = snapshot
+    restored = KnowledgeService()
+    restored._db = FakeFirestore()
+
+    stats = await SnapshotService(restored).import_snapshot(str(path))
+
+    original = await scope_chunks(knowledge, "private", "t1")
+    assert manifest["chunk_count"] == len(original) == stats["chunks_imported"]
+    assert stats["documents_imported"] == manifest["document_count"] == 2
+    by_id = sorted(original, key=lambda chunk: chunk["id"])
+    assert sorted(await scope_chunks(restored, "private", "t1"), key=lambda chunk: chunk["id"]) == by_id
+    assert any(len(chunk["doc_ids"]) == 2 for chunk in original)
+    assert await scope_chunks(restored, "private", "t2") == []
+    assert sorted(d["doc_id"] for d in await restored.get_scope_documents("private", "t1")) == sorted(
+        d["doc_id"] for d in await knowledge.get_scope_documents("private", "t1")
+    )
+
+
+async def test_reimport_skips_existing_documents(snapshot, knowledge):
+    path, _ = snapshot
+    restored = KnowledgeService()
+    restored._db = FakeFirestore()
+    service = SnapshotService(restored)
+    await service.import_snapshot(str(path))
+
+    stats = await service.import_snapshot(str(path))
+
+    assert stats["documents_imported"] == 0
+    assert stats["documents_skipped"] == 2
+    assert len(await scope_chunks(restored, "private", "t1")) == len(await scope_chunks(knowledge, "private", "t1"))
+
+
+async def test_import_into_another_tenant_remaps_ids(snapshot, knowledge):
+    path, _ = snapshot
+    original = await scope_chunks(knowledge, "private", "t1")
+
+    await SnapshotService(knowledge).import_snapshot(str(path), tenant_id="t9")
+
+    copied = await scope_chunks(knowledge, "private", "t9")
+    assert len(copied) == len(original)
+    assert not {c["id"] for c in copied} & {c["id"] for c in original}
+    assert not {c["doc_id"] for c in copied} & {c["doc_id"] for c in original}
+    assert sorted(c["content"] for c in copied) == sorted(c["content"] for c in original)
+    assert len(await scope_chunks(knowledge, "private", "t1")) == len(original)
+
+
+async def test_corrupt_snapshot_is_rejected(snapshot, knowledge):
+    path, _ = snapshot
+    with open(path / "embeddings.f32", "ab") as f:
+        f.write(b"\0")
+
+    with pytest.raises(SnapshotError, match="Checksum"):
+        await SnapshotService(knowledge).import_snapshot(str(path), tenant_id="t9")
@@ -0,0 +1,48 @@
+import re
+
+import pytest
+
+from app.services.ai.tokens import estimate_tokens, fits_tokens, split_by_tokens, truncate_to_tokens
+from app.services.ingestion.chunking import LegalDocumentStrategy, SlidingWindowStrategy
+
+TEXT = (
+    "Art. 5º Todos são iguais perante a lei, sem distinção de qualquer natureza (CF/88, art. 5º, caput).\n"
+    "  Inconstitucionalissimamente, o  dispositivo\tfoi revogado; ver https://www.planalto.gov.br/ccivil_03.\n"
+    + "x" * 90
+    + "\n\n"
+) * 5
+
+
+@pytest.mark.parametrize("max_tokens", [1, 7, 20, 64])
+def test_split_spans_fit_and_cover_text(max_tokens):
+    spans = split_by_tokens(TEXT, max_tokens)
+
+    assert all(fits_tokens(TEXT[start:end], max_tokens) for start, end in spans)
+    assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
+    # Only whitespace between spans is left out
+    covered = [False] * len(TEXT)
+    for start, end in spans:
+        covered[start:end] = [True] * (end - start)
+    assert all(covered[i] or TEXT[i].isspace() for i in range(len(TEXT)))
+
+
+def test_truncate_keeps_longest_fitting_prefix():
+    assert truncate_to_tokens("curto", 10) == "curto"
+
+    truncated = truncate_to_tokens(TEXT, 20)
+
+    assert TEXT.startswith(truncated)
+    assert fits_tokens(truncated, 20)
+    next_word = re.compile(r"\s*\S+").match(TEXT, len(truncated))
+    assert not fits_tokens(TEXT[:next_word.end()], 20)
+
+
+@pytest.mark.parametrize("strategy", [
+    SlidingWindowStrategy(chunk_size=40, overlap=5, max_tokens=24),
+    LegalDocumentStrategy(max_chunk_size=200, max_tokens=24),
+])
+def test_strategies_respect_max_tokens(strategy):
+    chunks = strategy.chunk(TEXT)
+
+    assert len(chunks) > 5
+    assert max(estimate_tokens(chunk.content) for chunk in chunks) <= 24
@@ -0,0 +1,58 @@
+def law(*numbers: int) -> str:
+    return "".join(f"Art. {n}º O fornecedor deve cumprir a obrigação número {n} desta lei.\n" for n in numbers)
+
+
+def live_chunks(db, doc_id):
+    return [
+        chunk for chunk in db.data["knowledge_base"].values()
+        if doc_id in chunk["doc_ids"] and not chunk.get("tombstone")
+    ]
+
+
+async def test_update_diffs_chunks(ingestion, embedding, db):
+    doc = await ingestion.ingest_text(law(1, 2, 3, 4), "t1", strategy="legal")
+    embedding.batches.clear()
+
+    result = await ingestion.update_document(doc["doc_id"], law(1, 3, 4, 5), "t1", strategy="legal")
+
+    assert result["chunks_unchanged"] == 1
+    assert result["chunks_moved"] == 2
+    assert result["chunks_added"] == 1
+    assert result["chunks_removed"] == 1
+    assert [len(batch) for batch in embedding.batches] == [1]
+    chunks = sorted(live_chunks(db, doc["doc_id"]), key=lambda c: c["chunk_index"])
+    assert [c["content"].split("º")[0] for c in chunks] == ["Art. 1", "Art. 3", "Art. 4", "Art. 5"]
+
+
+async def test_tombstoned_chunks_are_not_relinked(ingestion, db):
+    first = await ingestion.ingest_text(law(1, 2), "t1", strategy="legal")
+    await ingestion.update_document(first["doc_id"], law(1), "t1", strategy="legal")
+    tombstoned = [c for c in db.data["knowledge_base"].values() if c.get("tombstone")]
+    assert len(tombstoned) == 1
+
+    second = await ingestion.ingest_text(law(2), "t1", strategy="legal")
+
+    assert second["chunks_new"] == 1
+    (chunk,) = live_chunks(db, second["doc_id"])
+    assert chunk["embedding"] is not None
+    assert second["doc_id"] not in tombstoned[0]["doc_ids"]
+
+
+async def test_shared_chunks_are_copied_not_moved(ingestion, db):
+    first = await ingestion.ingest_text(law(1, 2, 3), "t1", strategy="legal")
+    second = await ingestion.ingest_text(law(1, 2, 3), "t1", strategy="legal")
+    before = {chunk_id: dict(chunk) for chunk_id, chunk in db.data["knowledge_base"].items()}
+
+    result = await ingestion.update_document(second["doc_id"], law(9, 1, 2, 3), "t1", strategy="legal")
+
+    assert result["chunks_moved"] == 3
+    for chunk_id, chunk in before.items():
+        stored = db.data["knowledge_base"][chunk_id]
+        assert stored["chunk_index"] == chunk["chunk_index"]
+        assert stored["doc_id"] == first["doc_id"]
+        assert stored["doc_ids"] == [first["doc_id"]]
+        assert not stored.get("tombstone")
+
+    chunks = sorted(live_chunks(db, second["doc_id"]), key=lambda c: c["chunk_index"])
+    assert [c["content"].split("º")[0] for c in chunks] == ["Art. 9", "Art. 1", "Art. 2", "Art. 3"]
+    assert all(c["embedding"] is not None and c["doc_ids"] == [second["doc_id"]] for c in chunks)
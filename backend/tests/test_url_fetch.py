@@ -0,0 +1,133 @@
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.ingestion.fetch import _check_request_host, fetch_to_disk
+from app.services.ingestion.service import IngestionService
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves `server.pages` with an ETag, answering 304 when it matches."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.path.startswith("/redirect"):
+            self.send_response(302)
+            self.send_header("Location", "/lei.txt")
+            self.end_headers()
+            return
+
+        body = self.server.pages.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.pages = {}
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+async def client():
+    async with httpx.AsyncClient(follow_redirects=True, event_hooks={"request": [_check_request_host]}) as client:
+        yield client
+
+
+def url(server, path: str) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+LAW = "Art. 1º Esta Lei dispõe sobre o tratamento de dados pessoais.\nArt. 2º A disciplina tem fundamentos.\n"
+
+
+async def test_private_hosts_are_refused(server, client):
+    server.pages["/lei.txt"] = LAW.encode()
+
+    with pytest.raises(ValueError, match="non-public address"):
+        await fetch_to_disk(url(server, "/lei.txt"), client)
+    assert server.requests == []
+
+
+async def test_redirects_are_checked_too(server, client):
+    server.pages["/lei.txt"] = LAW.encode()
+    checked = []
+
+    async def check(request):
+        checked.append(request.url.path)
+        if request.url.path == "/lei.txt":
+            raise ValueError("URL host resolves to a non-public address")
+
+    client.event_hooks["request"] = [check]
+    with pytest.raises(ValueError):
+        await fetch_to_disk(url(server, "/redirect"), client)
+    assert checked == ["/redirect", "/lei.txt"]
+
+
+async def test_fetch_is_conditional(monkeypatch, server, client):
+    monkeypatch.setattr(settings, "url_fetch_allow_private", True)
+    server.pages["/lei.txt"] = LAW.encode()
+
+    first = await fetch_to_disk(url(server, "/lei.txt"), client)
+    first.spooled.remove()
+    second = await fetch_to_disk(url(server, "/lei.txt"), client, etag=first.etag)
+
+    assert not first.not_modified and first.etag
+    assert second.not_modified and second.spooled is None
+    assert server.requests[1]["If-None-Match"] == first.etag
+
+
+async def test_fetch_enforces_size_cap(monkeypatch, server, client):
+    monkeypatch.setattr(settings, "url_fetch_allow_private", True)
+    server.pages["/lei.txt"] = LAW.encode()
+
+    with pytest.raises(ValueError, match="exceeds"):
+        await fetch_to_disk(url(server, "/lei.txt"), client, max_bytes=10)
+
+
+async def test_ingest_url_skips_unchanged_and_updates_amended_sources(
+    monkeypatch, server, client, embedding, knowledge
+):
+    monkeypatch.setattr(settings, "url_fetch_allow_private", True)
+    ingestion = IngestionService(embedding, knowledge, http_client=client)
+    server.pages["/lei.txt"] = LAW.encode()
+    source = url(server, "/lei.txt")
+
+    first = await ingestion.ingest_url(source, "t1", strategy="legal")
+    unchanged = await ingestion.ingest_url(source, "t1", strategy="legal")
+    server.pages["/lei.txt"] = (LAW + "Art. 3º Novo artigo incluído pela emenda.\n").encode()
+    amended = await ingestion.ingest_url(source, "t1", strategy="legal")
+
+    assert unchanged["unchanged"] is True
+    assert unchanged["doc_id"] == first["doc_id"]
+    assert amended["unchanged"] is False
+    assert amended["doc_id"] == first["doc_id"]
+    assert amended["chunks_new"] == 1
+    assert amended["chunk_count"] == first["chunk_count"] + 1